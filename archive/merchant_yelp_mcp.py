@@ -1,5 +1,6 @@
 import os
 import re
+import sys
 import json
 import time
 import requests
@@ -7,8 +8,13 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 from openai import OpenAI
+from pathlib import Path
 from requests.exceptions import SSLError, ConnectionError, ReadTimeout
 
+# Shared on-disk lookup cache (lives with the current enrichment pipeline)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "finance-agent-v2" / "rag" / "enrichment"))
+from lookup_cache import MISS, LookupCache
+
 # ------------------------------------------
 # 0) ENVIRONMENT & CLIENTS
 # ------------------------------------------
@@ -32,6 +38,12 @@ HOME_CITIES = [c.strip() for c in os.getenv(
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
+# Cache entries are per home region: the same name can match differently elsewhere
+YELP_REGION = HOME_COORDINATES or ",".join(HOME_ZIPCODES)
+LLM_REGION = "93021"  # the LLM prompt is pinned to Moorpark
+lookup_cache = LookupCache()
+yelp_errors = 0  # failed Yelp calls; a miss seen with errors is not cached
+
 # ------------------------------------------
 # 1) DATABASE CONNECTION
 # ------------------------------------------
@@ -119,11 +131,14 @@ def yelp_search(term: str, location: str = None, lat: float = None, lon: float =
         params["longitude"] = lon
         params["radius"] = radius or HOME_RADIUS_METERS
 
+    global yelp_errors
     r = safe_get(YELP_API_URL, headers=YELP_HEADERS, params=params)
     if not r:
+        yelp_errors += 1
         return None
     if r.status_code != 200:
         print(f"⚠️ Yelp error {r.status_code} for term='{term}', loc='{location}'")
+        yelp_errors += 1
         return None
 
     data = r.json()
@@ -141,6 +156,20 @@ def yelp_search(term: str, location: str = None, lat: float = None, lon: float =
     return None
 
 def query_yelp_multi(merchant_name: str):
+    """Cached multi-pass Yelp search; clean misses are cached as well."""
+    cached = lookup_cache.get("yelp", merchant_name, YELP_REGION)
+    if cached is not MISS:
+        print(f"🗃 Yelp cache {'hit' if cached else 'miss'} for '{merchant_name}'")
+        return tuple(cached) if cached else (None, None, None)
+
+    errors = yelp_errors
+    hit, term, loc = _query_yelp_multi(merchant_name)
+    if hit or yelp_errors == errors:
+        lookup_cache.put("yelp", merchant_name, YELP_REGION, raw=hit,
+                         result=[hit, term, loc] if hit else None)
+    return hit, term, loc
+
+def _query_yelp_multi(merchant_name: str):
     """Multi-pass Yelp search: lat/lon → ZIP → city → California."""
     base = normalize_name(merchant_name)
     variants = term_variants(base)
@@ -195,6 +224,10 @@ def query_yelp_multi(merchant_name: str):
 # 5) LLM FALLBACK
 # ------------------------------------------
 def infer_from_llm(merchant_name: str):
+    cached = lookup_cache.get("llm", merchant_name, LLM_REGION)
+    if cached is not MISS:
+        return cached
+
     prompt = f"""
     The user's home region is Moorpark, California (ZIP 93021).
     Merchant name: "{merchant_name}"
@@ -212,9 +245,12 @@ def infer_from_llm(merchant_name: str):
         content = resp.choices[0].message.content.strip()
         print(f"🤖 LLM inference for {merchant_name}: {content}")
         try:
-            return json.loads(content)
+            inferred = json.loads(content)
         except Exception:
-            return {"cuisine": "Unknown", "location": None}
+            inferred = {"cuisine": "Unknown", "location": None}
+        lookup_cache.put("llm", merchant_name, LLM_REGION, raw=content, result=inferred,
+                         found=inferred.get("cuisine", "Unknown") != "Unknown")
+        return inferred
     except Exception as e:
         print(f"❌ LLM inference failed for {merchant_name}: {e}")
         return None
@@ -223,6 +259,19 @@ def infer_from_llm(merchant_name: str):
 # 6) HYBRID ENRICHMENT
 # ------------------------------------------
 def hybrid_enrich(merchant_name: str):
+    """Cached classification of a merchant ("missing" results, from failed calls, are not cached)."""
+    cached = lookup_cache.get("hybrid", merchant_name, YELP_REGION)
+    if cached is not MISS:
+        return cached
+
+    errors = yelp_errors
+    data = _hybrid_enrich(merchant_name)
+    if data.get("enrichment_status") != "missing" and yelp_errors == errors:
+        lookup_cache.put("hybrid", merchant_name, YELP_REGION, result=data,
+                         found=data.get("enrichment_status") == "enriched")
+    return data
+
+def _hybrid_enrich(merchant_name: str):
     hit, term_used, loc_used = query_yelp_multi(merchant_name)
     if hit:
         return {
@@ -322,6 +371,7 @@ def main():
         print(f"✅ {name} → {data.get('enrichment_status')} (conf={data.get('confidence')})")
 
     conn.close()
+    print(lookup_cache.summary())
     print("\n🏁 Enrichment completed.")
 
 if __name__ == "__main__":
@@ -1,9 +1,245 @@
 from fastapi import FastAPI, Request
-import subprocess
+from fastapi.responses import Response, StreamingResponse
+from collections import deque
+from itertools import islice
+from pathlib import Path
+import asyncio
 import os
+import re
+import signal
+import sys
+import time
+import uuid
+
+import orjson
 
 app = FastAPI(title="Enrichment MCP", version="1.0.0")
 
+ENRICHMENT_SCRIPT = os.getenv(
+    "ENRICHMENT_SCRIPT",
+    str(Path(__file__).resolve().parents[3] / "rag" / "enrichment" / "merchant_mcp.py"))
+ENRICH_JOB_HISTORY = int(os.getenv("ENRICH_JOB_HISTORY", "50"))      # finished jobs kept
+ENRICH_JOB_LOG_LINES = int(os.getenv("ENRICH_JOB_LOG_LINES", "5000"))  # log lines kept per job
+ENRICH_JOB_KILL_GRACE = float(os.getenv("ENRICH_JOB_KILL_GRACE", "30"))  # seconds after cancel
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def json_response(content, status_code: int = 200) -> Response:
+    return Response(dumps(content), status_code=status_code, media_type="application/json")
+
+
+# ---------------------------------------------------------------------
+# Jobs
+# ---------------------------------------------------------------------
+# run_enrichment returns a job id at once; the job runs merchant_mcp.py
+# in a child process, one job at a time (the rest wait queued): every run
+# shares the script's checkpoint file and transaction sync snapshot, so
+# two at once would overwrite each other's progress. A run_enrichment with
+# the same settings as a queued or running job returns that job instead
+# of starting another.
+#
+# Progress comes from the script's own output (lookups planned, checkpoint
+# lines, final counts). Cancelling sends SIGINT, so the script saves its
+# checkpoint and the next run resumes; it is killed if still running after
+# ENRICH_JOB_KILL_GRACE.
+
+ACTIVE = ("queued", "running")
+
+PROGRESS_PATTERNS = [
+    (re.compile(r"🔍 (\d+) lookups to run"), ("lookups_total",)),
+    (re.compile(r"Checkpoint: (\d+)/(\d+) lookups done"), ("lookups_done", "lookups_total")),
+    (re.compile(r"(\d+) merchants added/updated \((\d+) transactions\), (\d+) failed"),
+     ("merchants_added", "transactions_covered", "failed")),
+]
+
+
+def job_settings(payload) -> dict:
+    """Job payload → environment overrides for the enrichment script."""
+    settings = {}
+    scope = payload.get("scope")
+    if scope:
+        settings["ENRICH_CATEGORIES"] = ",".join(scope) if isinstance(scope, list) else str(scope)
+    if payload.get("zip_code"):
+        settings["ZIP_CODE"] = str(payload["zip_code"])
+    if payload.get("full_scan") or payload.get("mode") == "full":
+        settings["ENRICH_FULL_SCAN"] = "1"
+    return settings
+
+
+class Job:
+    def __init__(self, settings: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = tuple(sorted(settings.items()))
+        self.settings = settings
+        self.status = "queued"
+        self.created = time.time()
+        self.started = self.finished = None
+        self.returncode = None
+        self.progress = {}
+        self.lines = deque(maxlen=ENRICH_JOB_LOG_LINES)
+        self.line_count = 0  # lines ever written; the deque keeps the tail
+        self.changed = asyncio.Condition()
+        self.proc = None
+        self.cancel_requested = False
+
+    @property
+    def done(self) -> bool:
+        return self.status not in ACTIVE
+
+    async def log(self, text: str) -> None:
+        for pattern, fields in PROGRESS_PATTERNS:
+            m = pattern.search(text)
+            if m:
+                self.progress.update(zip(fields, map(int, m.groups())))
+        async with self.changed:
+            self.lines.append(text)
+            self.line_count += 1
+            self.changed.notify_all()
+
+    async def finish(self, status: str) -> None:
+        async with self.changed:
+            self.status = status
+            self.finished = time.time()
+            self.changed.notify_all()
+
+    def as_dict(self) -> dict:
+        end = self.finished or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "settings": self.settings,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "elapsed_s": round(end - self.started, 3) if self.started else None,
+            "returncode": self.returncode,
+            "progress": self.progress,
+            "log_lines": self.line_count,
+            "last_line": self.lines[-1] if self.lines else None,
+        }
+
+
+jobs = {}          # job id → Job, oldest first
+active_keys = {}   # settings key → id of the queued/running job
+_slot = None       # asyncio.Lock held by the running job, created on the server loop
+
+
+def submit(settings: dict):
+    """Start (or join) a job; returns (job, deduplicated)."""
+    global _slot
+    key = tuple(sorted(settings.items()))
+    existing = jobs.get(active_keys.get(key))
+    if existing is not None and not existing.done:
+        return existing, True
+
+    if _slot is None:
+        _slot = asyncio.Lock()
+    job = Job(settings)
+    jobs[job.id] = job
+    active_keys[key] = job.id
+    _evict()
+    asyncio.create_task(run_job(job))
+    return job, False
+
+
+def _evict():
+    finished = [j for j in jobs.values() if j.done]
+    for job in finished[:max(0, len(finished) - ENRICH_JOB_HISTORY)]:
+        del jobs[job.id]
+
+
+async def run_job(job: Job) -> None:
+    async with _slot:
+        if job.cancel_requested:
+            return
+        print(f"🚀 Enrichment job {job.id} starting: {job.settings or 'defaults'}")
+        env = {**os.environ, **job.settings, "ENRICH_JOB_ID": job.id, "PYTHONUNBUFFERED": "1"}
+        status = "failed"
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.proc = await asyncio.create_subprocess_exec(
+                sys.executable, ENRICHMENT_SCRIPT,
+                cwd=str(Path(ENRICHMENT_SCRIPT).parent),
+                env=env,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            if job.cancel_requested:  # cancelled while spawning
+                job.proc.send_signal(signal.SIGINT)
+            async for raw in job.proc.stdout:
+                await job.log(raw.decode("utf-8", "replace").rstrip("\n"))
+            job.returncode = await job.proc.wait()
+            if job.cancel_requested:
+                status = "cancelled"
+            elif job.returncode == 0:
+                status = "succeeded"
+        except Exception as e:
+            print(f"❌ Enrichment job {job.id} error: {e}")
+            await job.log(f"[ERROR] {e}")
+        finally:
+            if active_keys.get(job.key) == job.id:
+                del active_keys[job.key]
+            await job.finish(status)
+            icon = "✅" if status == "succeeded" else "⚠️" if status == "cancelled" else "❌"
+            print(f"{icon} Enrichment job {job.id} {status} (returncode {job.returncode}).")
+
+
+async def cancel(job: Job) -> None:
+    if job.done:
+        return
+    job.cancel_requested = True
+    if job.status == "queued":
+        # Never starts
+        if active_keys.get(job.key) == job.id:
+            del active_keys[job.key]
+        await job.finish("cancelled")
+        return
+    print(f"🛑 Cancelling enrichment job {job.id}")
+    if job.proc is None:
+        return  # still spawning; run_job signals it once started
+    try:
+        job.proc.send_signal(signal.SIGINT)  # lets the script save its checkpoint
+    except ProcessLookupError:
+        return
+
+    async def kill_later(proc):
+        try:
+            await asyncio.wait_for(proc.wait(), ENRICH_JOB_KILL_GRACE)
+        except asyncio.TimeoutError:
+            proc.kill()
+    asyncio.create_task(kill_later(job.proc))
+
+
+async def follow_log(job: Job, offset: int, follow: bool):
+    """NDJSON log lines from offset on; with follow, until the job ends."""
+    while True:
+        async with job.changed:
+            if follow:
+                await job.changed.wait_for(lambda: job.line_count > offset or job.done)
+            first = job.line_count - len(job.lines)  # oldest line still kept
+            start = max(offset, first)
+            lines = list(islice(job.lines, start - first, None))
+            offset, finished = job.line_count, job.done
+        for i, text in enumerate(lines, start=start):
+            yield dumps({"line": i, "text": text}) + b"\n"
+        if finished or not follow:
+            yield dumps({"event": "done", **job.as_dict()}) + b"\n"
+            return
+
+
+def job_or_404(job_id):
+    job = jobs.get(job_id or "")
+    if job is None:
+        return None, json_response(status_code=404, content={"status": "error", "message": f"Unknown job: {job_id}"})
+    return job, None
+
+# ---------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------
 @app.post("/mcp/enrichment")
 async def handle_enrichment_intent(req: Request):
     body = await req.json()
@@ -14,16 +250,57 @@ async def handle_enrichment_intent(req: Request):
     print(f"🔹 Payload: {payload}")
 
     if intent == "run_enrichment":
-        print("🚀 Launching merchant enrichment job...")
-        result = subprocess.run(
-            ["python3", "merchant_yelp_enrichment.py"],
-            capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            print("✅ Enrichment completed successfully.")
-            return {"status": "success", "log": result.stdout}
-        else:
-            print("❌ Enrichment failed.")
-            return {"status": "error", "log": result.stderr}
+        job, deduplicated = submit(job_settings(payload))
+        if deduplicated:
+            print(f"🔁 Joined running enrichment job {job.id}")
+        return json_response(status_code=202, content={
+            "status": "accepted",
+            "job_id": job.id,
+            "deduplicated": deduplicated,
+            "job": job.as_dict(),
+        })
+
+    if intent in ("get_enrichment_status", "cancel_enrichment"):
+        job, error = job_or_404(payload.get("job_id"))
+        if error:
+            return error
+        if intent == "cancel_enrichment":
+            await cancel(job)
+        return json_response({"status": "success", "job": job.as_dict()})
 
     return {"status": "error", "message": f"Unsupported intent: {intent}"}
+
+@app.get("/jobs")
+def list_jobs():
+    return json_response({"jobs": [j.as_dict() for j in reversed(jobs.values())]})
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job, error = job_or_404(job_id)
+    return error or json_response(job.as_dict())
+
+@app.get("/jobs/{job_id}/logs")
+def job_logs(job_id: str, offset: int = 0, follow: bool = True):
+    job, error = job_or_404(job_id)
+    if error:
+        return error
+    return StreamingResponse(follow_log(job, max(0, offset), follow), media_type="application/x-ndjson")
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job, error = job_or_404(job_id)
+    if error:
+        return error
+    await cancel(job)
+    return json_response(job.as_dict())
+
+@app.on_event("shutdown")
+async def stop_jobs():
+    running = [j.proc for j in jobs.values() if j.proc is not None and not j.done]
+    for job in list(jobs.values()):
+        await cancel(job)
+    for proc in running:
+        try:
+            await asyncio.wait_for(proc.wait(), ENRICH_JOB_KILL_GRACE)
+        except asyncio.TimeoutError:
+            proc.kill()
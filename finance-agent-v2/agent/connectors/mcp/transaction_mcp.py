@@ -1,11 +1,213 @@
 from fastapi import FastAPI, Request
-import requests
+from fastapi.responses import Response, StreamingResponse
+import asyncio
+import base64
+import bisect
+import json
 import os
+import threading
+from collections import OrderedDict
+
+import orjson
+
+from rag.http_client import aclose_async_client, async_client, stats as http_stats
+from rag.transaction_sync import TransactionSync
 
 app = FastAPI(title="Transaction MCP", version="1.0.0")
 
 TRANSACTION_API = os.getenv("TRANSACTION_API_BASE_URL", "https://get-transaction-wmco.onrender.com")
 
+# Filters the upstream API understands and should receive ("category",
+# "date_range" → start_date/end_date). Filters are always re-applied here,
+# so pushing one down only saves transfer.
+TRANSACTION_API_PUSHDOWN = {
+    f.strip() for f in os.getenv("TRANSACTION_API_PUSHDOWN", "").split(",") if f.strip()
+}
+TXN_PAGE_SIZE_MAX = int(os.getenv("TXN_PAGE_SIZE_MAX", "5000"))
+TXN_VIEW_CACHE = int(os.getenv("TXN_VIEW_CACHE", "8"))  # filtered, sorted views kept
+NDJSON_CHUNK = 256  # transactions encoded per streamed chunk
+
+# Unfiltered requests are served from an incrementally synced snapshot
+# (conditional GET / since-id deltas, see rag/transaction_sync.py);
+# TXN_SYNC_MIN_INTERVAL lets consecutive pages skip the upstream check.
+transaction_sync = TransactionSync(f"{TRANSACTION_API}/transactions", name="transaction_mcp")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def json_response(content, status_code: int = 200) -> Response:
+    return Response(dumps(content), status_code=status_code, media_type="application/json")
+
+
+# ---------------------------------------------------------------------
+# Filters
+# ---------------------------------------------------------------------
+# payload.filters:
+#   category    "Food & Drink" or a list of categories
+#   date_range  "YYYY-MM-DD:YYYY-MM-DD", inclusive; either side may be empty
+#   cursor      next_cursor from the previous page
+#   page_size   transactions per page (at most TXN_PAGE_SIZE_MAX);
+#               without it, every matching transaction in one response
+# payload.stream (or Accept: application/x-ndjson) streams NDJSON: one
+# transaction per line, then {"event": "done", "count", "next_cursor"}.
+#
+# Pages are ordered by (transaction date, id) and the cursor is the key
+# of the last transaction sent, so new upstream rows never shift a page.
+# The filtered, sorted rows of a snapshot are kept (TXN_VIEW_CACHE views),
+# so paging through an unchanged snapshot filters and sorts it once.
+
+class BadFilter(ValueError):
+    pass
+
+
+def txn_date(t) -> str:
+    return str(t.get("transactionDate") or t.get("date") or t.get("transaction_date") or "")[:10]
+
+
+def _id_key(value):
+    # ints before strings; keeps keys comparable whatever the id type
+    return (0, value, "") if isinstance(value, int) else (1, 0, str(value))
+
+
+def txn_key(t):
+    return (txn_date(t), _id_key(t.get("id")))
+
+
+def encode_cursor(key) -> str:
+    raw = json.dumps([key[0], list(key[1])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        date, (kind, num, text) = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(date, str) or kind not in (0, 1) or not isinstance(text, str):
+            raise ValueError
+        return (date, (kind, int(num), text))
+    except Exception:
+        raise BadFilter(f"Invalid cursor: {cursor!r}")
+
+
+def parse_filters(payload):
+    filters = payload.get("filters") or {}
+
+    category = filters.get("category") or []
+    categories = {category} if isinstance(category, str) else set(category)
+
+    start = end = None
+    date_range = filters.get("date_range") or ""
+    if date_range:
+        start, sep, end = str(date_range).partition(":")
+        if not sep:
+            raise BadFilter("date_range must be 'YYYY-MM-DD:YYYY-MM-DD'")
+        for d in (start, end):
+            if d and (len(d) != 10 or d[4] != "-" or d[7] != "-"):
+                raise BadFilter(f"Invalid date in date_range: {d!r}")
+        start, end = start or None, end or None
+
+    cursor = filters.get("cursor") or payload.get("cursor")
+    page_size = filters.get("page_size", payload.get("page_size"))
+    if page_size is not None:
+        try:
+            page_size = int(page_size)
+        except (TypeError, ValueError):
+            raise BadFilter(f"Invalid page_size: {page_size!r}")
+        if page_size < 1:
+            raise BadFilter("page_size must be positive")
+        page_size = min(page_size, TXN_PAGE_SIZE_MAX)
+
+    return {
+        "categories": categories,
+        "start": start,
+        "end": end,
+        "after": decode_cursor(cursor) if cursor else None,
+        "page_size": page_size,  # None → everything
+    }
+
+
+def upstream_params(f):
+    params = {}
+    if "category" in TRANSACTION_API_PUSHDOWN and len(f["categories"]) == 1:
+        params["category"] = next(iter(f["categories"]))
+    if "date_range" in TRANSACTION_API_PUSHDOWN:
+        if f["start"]:
+            params["start_date"] = f["start"]
+        if f["end"]:
+            params["end_date"] = f["end"]
+    return params
+
+
+_views = OrderedDict()  # (id(txns), filters) → (txns, rows, keys), LRU
+_views_lock = threading.Lock()
+
+
+def view(txns, f):
+    """Rows of txns matching the filters, ordered by txn_key, and their keys."""
+    cats, start, end = f["categories"], f["start"], f["end"]
+    cache_key = (id(txns), frozenset(cats), start, end)
+    with _views_lock:
+        hit = _views.get(cache_key)
+        if hit is not None and hit[0] is txns:
+            _views.move_to_end(cache_key)
+            return hit[1], hit[2]
+
+    rows = [
+        t for t in txns
+        if (not cats or t.get("category") in cats)
+        and (not start or txn_date(t) >= start)
+        and (not end or txn_date(t) <= end)
+    ]
+    rows.sort(key=txn_key)
+    keys = [txn_key(t) for t in rows]
+
+    with _views_lock:
+        # Holding txns keeps id(txns) from being reused while cached
+        _views[cache_key] = (txns, rows, keys)
+        while len(_views) > max(0, TXN_VIEW_CACHE):
+            _views.popitem(last=False)
+    return rows, keys
+
+
+def select(txns, f):
+    """Filter, order and cut one page; returns (page, next_cursor)."""
+    rows, keys = view(txns, f)
+
+    lo = 0
+    if f["after"] is not None:
+        lo = bisect.bisect_right(keys, f["after"])
+    size = f["page_size"]
+    hi = len(rows) if size is None else min(len(rows), lo + size)
+    page = rows[lo:hi]
+    next_cursor = encode_cursor(txn_key(page[-1])) if page and hi < len(rows) else None
+    return page, next_cursor
+
+
+async def fetch_upstream(params):
+    if not params:
+        return (await transaction_sync.async_sync()).rows
+    resp = await async_client().get(f"{TRANSACTION_API}/transactions", params=params or None)
+    resp.raise_for_status()
+    # Decode off the event loop: the full history can be large
+    data = await asyncio.to_thread(resp.json)
+    if isinstance(data, dict) and "items" in data:
+        data = data["items"]
+    if not isinstance(data, list):
+        raise ValueError("Unexpected response from Transaction API")
+    return data
+
+
+def _ndjson(rows) -> bytes:
+    return b"".join(dumps(t) + b"\n" for t in rows)
+
+
+def wants_stream(req: Request, payload) -> bool:
+    return bool(payload.get("stream")) or "application/x-ndjson" in req.headers.get("accept", "")
+
+# ---------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------
 @app.post("/mcp/transactions")
 async def handle_transaction_intent(req: Request):
     body = await req.json()
@@ -16,13 +218,40 @@ async def handle_transaction_intent(req: Request):
     print(f"🔹 Payload: {payload}")
 
     if intent == "get_transactions":
-        category = payload.get("filters", {}).get("category", "")
-        resp = requests.get(f"{TRANSACTION_API}/transactions")
-        txns = resp.json()
+        stream = wants_stream(req, payload)
+        try:
+            f = parse_filters(payload)
+        except BadFilter as e:
+            return json_response(status_code=400, content={"status": "error", "message": str(e)})
+
+        try:
+            txns = await fetch_upstream(upstream_params(f))
+        except Exception as e:
+            print(f"❌ Transaction API error: {e}")
+            return json_response(status_code=502, content={"status": "error", "message": f"Transaction API error: {e}"})
 
-        if category:
-            txns = [t for t in txns if t.get("category") == category]
+        page, next_cursor = await asyncio.to_thread(select, txns, f)
 
-        return {"status": "success", "count": len(txns), "transactions": txns}
+        if stream:
+            async def lines():
+                for i in range(0, len(page), NDJSON_CHUNK):
+                    yield await asyncio.to_thread(_ndjson, page[i:i + NDJSON_CHUNK])
+                yield dumps({"event": "done", "count": len(page), "next_cursor": next_cursor}) + b"\n"
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+        return json_response({
+            "status": "success",
+            "count": len(page),
+            "next_cursor": next_cursor,
+            "transactions": page,
+        })
 
     return {"status": "error", "message": f"Unsupported intent: {intent}"}
+
+@app.get("/metrics/http")
+def outbound_http_metrics():
+    return http_stats()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await aclose_async_client()
@@ -1,13 +1,36 @@
 import os
-from typing import Optional
+import asyncio
+import hmac
+import time
+from typing import List, Optional
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 from orchestrator.orchestrator import FinanceAgent
+from orchestrator.executor import BoundedExecutor, ExecutorSaturated, ASK_RETRY_AFTER
+from orchestrator.response import VIEW_SLIM, dumps, json_response, project, response_view, slim_data
+from rag.registry import DEFAULT_TENANT, UnknownTenant, tenant_dir
+from rag.timing import Trace, call_with_trace, stage_histograms
+from rag import http_client
+
+ASK_BATCH_MAX = int(os.getenv("ASK_BATCH_MAX", "32"))
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+TENANT_HEADER = "x-tenant-id"
+API_KEY_HEADER = "x-api-key"
+# Tenant access: "key1:acme,key2:globex". A request reads only the tenant
+# its API key (Authorization: Bearer <key> or X-API-Key) maps to; without
+# a key, only the default tenant is served.
+TENANT_API_KEYS = dict(
+    pair.strip().split(":", 1)
+    for pair in os.getenv("TENANT_API_KEYS", "").split(",")
+    if ":" in pair
+)
+TIMINGS_HEADER = "x-debug-timings"
 
 app = FastAPI(title="Finance-Agent Unified", version="1.0")
 
@@ -19,8 +42,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# NDJSON streams must reach the client line by line; gzip would buffer them
+GZIP_EXCLUDE_PATHS = {"/ask/stream"}
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that passes GZIP_EXCLUDE_PATHS through untouched."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in GZIP_EXCLUDE_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress JSON bodies above GZIP_MIN_SIZE bytes when the client accepts gzip
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+
 print("[INIT] Bootstrapping FinanceAgent...")
 agent = FinanceAgent()
+ask_executor = BoundedExecutor()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
@@ -37,28 +76,249 @@ class AskIn(BaseModel):
     message: Optional[str] = None
     text: Optional[str] = None
 
+class AskBatchIn(BaseModel):
+    questions: List[str]
+
+class TenantForbidden(PermissionError):
+    """The caller's API key does not grant the requested tenant."""
+
+def key_tenant(request: Request) -> Optional[str]:
+    """Tenant of the request's API key; None without a key."""
+    auth = request.headers.get("authorization", "")
+    key = auth[7:].strip() if auth[:7].lower() == "bearer " else request.headers.get(API_KEY_HEADER, "")
+    if not key:
+        return None
+    for known, tenant in TENANT_API_KEYS.items():
+        if hmac.compare_digest(known.encode(), key.encode()):
+            return tenant.strip()
+    raise TenantForbidden("Invalid API key.")
+
+def authorize_tenant(request: Request, tenant: Optional[str]) -> Optional[str]:
+    """Tenant to serve for a requested one (None → the caller's own or the default)."""
+    owner = key_tenant(request)
+    if owner is None:
+        if tenant and tenant != DEFAULT_TENANT:
+            raise TenantForbidden(f"An API key is required for tenant {tenant!r}.")
+        return tenant
+    if tenant and tenant != owner:
+        raise TenantForbidden(f"API key is not valid for tenant {tenant!r}.")
+    return owner
+
+def request_tenant(request: Request) -> Optional[str]:
+    """Tenant from the X-Tenant-Id header or ?tenant=, checked against the API key."""
+    requested = request.headers.get(TENANT_HEADER) or request.query_params.get("tenant") or None
+    return authorize_tenant(request, requested)
+
+def unknown_tenant(e: UnknownTenant):
+    return json_response(
+        status_code=404,
+        content={"intent":"error","answer":str(e.args[0] if e.args else e),"chart":None,"data":{}},
+    )
+
+def forbidden_tenant(e: TenantForbidden):
+    return json_response(
+        status_code=403,
+        content={"intent":"error","answer":str(e.args[0] if e.args else e),"chart":None,"data":{}},
+    )
+
+def wants_timings(request: Request) -> bool:
+    """_timings in the body on ?timings=1 or an X-Debug-Timings header."""
+    return request.query_params.get("timings") in ("1", "true") or bool(request.headers.get(TIMINGS_HEADER))
+
+def traced_response(content, trace: Trace, intent: str, timings: bool = False):
+    """JSON response with a Server-Timing header; records the request's stages."""
+    if timings:
+        content = {**content, "_timings": trace.as_dict()}
+    started = time.perf_counter()
+    response = json_response(content)
+    trace.add("serialize", time.perf_counter() - started)
+    total = trace.elapsed()
+    response.headers["Server-Timing"] = trace.server_timing(total)
+    stage_histograms.observe(intent, trace, total)
+    return response
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    ask_executor.shutdown(wait=False)
+    agent.retrievers.shutdown(wait=False)
+
 @app.post("/ask")
-def ask(payload: AskIn):
+async def ask(payload: AskIn, request: Request):
+    view = response_view(request)
+    try:
+        tenant = request_tenant(request)
+        tenant_dir(tenant)
+    except TenantForbidden as e:
+        return forbidden_tenant(e)
+    except UnknownTenant as e:
+        return unknown_tenant(e)
     try:
         q = payload.question or payload.input or payload.message or payload.text
         if not q:
-            return JSONResponse(
+            return json_response(
                 status_code=400,
                 content={"intent":"error","answer":"Missing question. Send {question: \"...\"}.","chart":None,"data":{}},
             )
 
-        result = agent.analyze(q)
+        trace = Trace()
+        try:
+            future = ask_executor.submit(call_with_trace, trace, agent.analyze, q, tenant)
+        except ExecutorSaturated:
+            return json_response(
+                status_code=503,
+                headers={"Retry-After": str(ASK_RETRY_AFTER)},
+                content={"intent":"error","answer":"The agent is busy, please retry shortly.","chart":None,"data":{}},
+            )
+
+        result = await asyncio.wrap_future(future)
 
         if isinstance(result, dict):
-            return JSONResponse(status_code=200, content=result)
-        return JSONResponse(status_code=200, content={"intent":"answer","answer":str(result),"chart":None,"data":{}})
+            return traced_response(project(result, view), trace, result.get("intent"), wants_timings(request))
+        return traced_response({"intent":"answer","answer":str(result),"chart":None,"data":{}}, trace, "answer")
 
     except Exception as e:
-        return JSONResponse(
+        return json_response(
             status_code=500,
             content={"intent":"error","answer":"Internal error while processing question.","details":{"error":str(e)},"chart":None,"data":{}},
         )
 
+@app.post("/ask/stream")
+async def ask_stream(payload: AskIn, request: Request):
+    """
+    NDJSON stream: one JSON object per line (intent, answer, details, chart, data, done).
+    Headers go out before the work is done, so stage timings are sent in
+    the done event (with ?timings=1) rather than as Server-Timing.
+    """
+    q = payload.question or payload.input or payload.message or payload.text
+    if not q:
+        return json_response(
+            status_code=400,
+            content={"intent":"error","answer":"Missing question. Send {question: \"...\"}.","chart":None,"data":{}},
+        )
+
+    view = response_view(request)
+    try:
+        tenant = request_tenant(request)
+        tenant_dir(tenant)
+    except TenantForbidden as e:
+        return forbidden_tenant(e)
+    except UnknownTenant as e:
+        return unknown_tenant(e)
+
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue()
+    trace = Trace()
+    timings = wants_timings(request)
+
+    def produce():
+        intent = "error"
+        try:
+            for event in agent.analyze_stream(q, tenant):
+                if event.get("event") == "intent":
+                    intent = event.get("intent") or intent
+                if view == VIEW_SLIM and event.get("event") == "data":
+                    event = {"event":"data","data":slim_data(event.get("data"))}
+                if timings and event.get("event") == "done":
+                    event = {**event, "_timings":trace.as_dict()}
+                loop.call_soon_threadsafe(lines.put_nowait, dumps(event) + b"\n")
+        except Exception as e:
+            error = {"event":"error","intent":"error","answer":"Internal error while processing question.","details":{"error":str(e)}}
+            loop.call_soon_threadsafe(lines.put_nowait, dumps(error) + b"\n")
+        finally:
+            loop.call_soon_threadsafe(lines.put_nowait, None)
+            stage_histograms.observe(intent, trace, trace.elapsed())
+
+    try:
+        ask_executor.submit(call_with_trace, trace, produce)
+    except ExecutorSaturated:
+        return json_response(
+            status_code=503,
+            headers={"Retry-After": str(ASK_RETRY_AFTER)},
+            content={"intent":"error","answer":"The agent is busy, please retry shortly.","chart":None,"data":{}},
+        )
+
+    async def body():
+        while True:
+            line = await lines.get()
+            if line is None:
+                break
+            yield line
+
+    # Not compressed (GZIP_EXCLUDE_PATHS): lines reach the client as they are produced
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@app.post("/ask/batch")
+async def ask_batch(payload: AskBatchIn, request: Request):
+    view = response_view(request)
+    try:
+        tenant = request_tenant(request)
+        tenant_dir(tenant)
+    except TenantForbidden as e:
+        return json_response(status_code=403, content={"error":str(e.args[0] if e.args else e),"results":[]})
+    except UnknownTenant as e:
+        return json_response(status_code=404, content={"error":str(e.args[0] if e.args else e),"results":[]})
+    questions = [q for q in payload.questions if q and q.strip()]
+    if not questions:
+        return json_response(
+            status_code=400,
+            content={"error":"Missing questions. Send {questions: [\"...\"]}.","results":[]},
+        )
+    if len(questions) > ASK_BATCH_MAX:
+        return json_response(
+            status_code=413,
+            content={"error":f"Too many questions (max {ASK_BATCH_MAX}).","results":[]},
+        )
+
+    trace = Trace()
+    try:
+        future = ask_executor.submit(call_with_trace, trace, agent.analyze_batch, questions, tenant)
+    except ExecutorSaturated:
+        return json_response(
+            status_code=503,
+            headers={"Retry-After": str(ASK_RETRY_AFTER)},
+            content={"error":"The agent is busy, please retry shortly.","results":[]},
+        )
+
+    try:
+        results = await asyncio.wrap_future(future)
+    except Exception as e:
+        return json_response(
+            status_code=500,
+            content={"error":f"Internal error while processing batch: {e}","results":[]},
+        )
+
+    return traced_response(
+        {"count":len(results), "results":[project(r, view) for r in results]},
+        trace, "batch", wants_timings(request),
+    )
+
 @app.get("/health")
 def health():
     return {"status":"ok", "ui":"online", "agent":"ready"}
+
+@app.post("/tenants/{tenant}/prefetch")
+def prefetch_tenant(tenant: str, request: Request):
+    """Called on login: start loading the tenant's index before the first question."""
+    try:
+        scheduled = agent.retrievers.prefetch(authorize_tenant(request, tenant))
+    except TenantForbidden as e:
+        return json_response(status_code=403, content={"tenant":tenant,"error":str(e.args[0] if e.args else e)})
+    except UnknownTenant as e:
+        return json_response(status_code=404, content={"tenant":tenant,"error":str(e.args[0] if e.args else e)})
+    return json_response(status_code=202, content={"tenant":tenant,"scheduled":scheduled})
+
+@app.get("/metrics/executor")
+def executor_metrics():
+    return ask_executor.stats()
+
+@app.get("/metrics/retrievers")
+def retriever_metrics():
+    return agent.retrievers.stats()
+
+@app.get("/metrics")
+def stage_metrics():
+    """Per-intent, per-stage latency histograms and outbound HTTP reuse, in Prometheus text format."""
+    return PlainTextResponse(
+        stage_histograms.render() + http_client.render(),
+        media_type="text/plain; version=0.0.4",
+    )
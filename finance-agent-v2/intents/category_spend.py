@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any
 
 INTENT_NAME = "category_spend"
 KEYWORDS = [
@@ -15,25 +15,30 @@ KEYWORDS = [
     "travel",
 ]
 
+GROUPS = {
+    "top_restaurants": "merchant",
+    "top_categories": "category",
+    "top_cuisines": "cuisine",
+}
 
-def _normalize_pairs(pairs: List[Any], key_name: str) -> List[Dict[str, Any]]:
-    normalized: List[Dict[str, Any]] = []
-    for item in pairs:
-        if isinstance(item, dict):
-            if key_name in item and "total_spend" in item:
-                normalized.append(item)
-            continue
-        if isinstance(item, (list, tuple)) and len(item) >= 2:
-            name, amt = item[0], item[1]
-            try:
-                amount = float(amt)
-            except Exception:
-                continue
-            normalized.append({key_name: str(name), "total_spend": round(amount, 2)})
-    return normalized
-
-
-def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, Any]:
+
+def _category_label(details: Dict[str, Any], plan) -> str:
+    # Category name from the parsed plan (same canonical map the retriever filters on)
+    if plan.categories:
+        return ", ".join(plan.categories)
+    if details.get("top_categories"):
+        return details["top_categories"][0]["category"]
+    return "the selected category"
+
+
+def _answer(details: Dict[str, Any], category_label: str) -> str:
+    return (
+        f"You spent ${details['total_spend']:,.2f} in {category_label} "
+        f"across {details['matches']} transactions."
+    )
+
+
+def handle(question: str, intent_name: str, metadata, retriever, plan) -> Dict[str, Any]:
     """
     Category spend intent.
 
@@ -43,40 +48,14 @@ def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, An
       "What did I spend on Groceries in May?"
     """
 
-    # Use same query pipeline; retriever will apply category filter based on question
-    data = retriever.query(question)
-
-    total = float(data.get("total_spend", 0.0))
-    matches = int(data.get("matches", 0))
-
-    top_merchants_raw = data.get("top_merchants", [])
-    top_categories_raw = data.get("top_categories", [])
-    top_cuisines_raw = data.get("top_cuisines", [])
+    # Retriever applies the category filter based on the question
+    details = retriever.aggregate(plan, groups=GROUPS)
 
-    top_restaurants = _normalize_pairs(top_merchants_raw, "merchant")
-    top_categories = _normalize_pairs(top_categories_raw, "category")
-    top_cuisines = _normalize_pairs(top_cuisines_raw, "cuisine")
+    top_restaurants = details["top_restaurants"]
+    top_categories = details["top_categories"]
 
-    # Try to infer category name from canonical map used by retriever
-    requested_cats = retriever._requested_categories(question)  # type: ignore[attr-defined]
-    if requested_cats:
-        category_label = ", ".join(requested_cats)
-    elif top_categories:
-        category_label = top_categories[0]["category"]
-    else:
-        category_label = "the selected category"
-
-    answer = (
-        f"You spent ${total:,.2f} in {category_label} across {matches} transactions."
-    )
-
-    details: Dict[str, Any] = {
-        "matches": matches,
-        "total_spend": round(total, 2),
-        "top_restaurants": top_restaurants,  # merchants
-        "top_categories": top_categories,
-        "top_cuisines": top_cuisines,
-    }
+    category_label = _category_label(details, plan)
+    answer = _answer(details, category_label)
 
     # Chart: for a single category, merchant breakdown is usually more interesting
     chart = None
@@ -95,16 +74,17 @@ def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, An
             "values": [c["total_spend"] for c in top_categories],
         }
 
-    full_data = dict(data)
-    full_data["total_spend"] = round(total, 2)
-    full_data["top_restaurants"] = top_restaurants
-    full_data["top_categories"] = top_categories
-    full_data["top_cuisines"] = top_cuisines
-
     return {
         "intent": INTENT_NAME,
         "answer": answer,
         "details": details,
         "chart": chart,
-        "data": full_data,
+        "data": details,
     }
+
+
+def handle_stream(question: str, intent_name: str, metadata, retriever, plan):
+    """Headline totals first (top category only, for the label), then the full result."""
+    totals = retriever.aggregate(plan, groups={"top_categories": "category"}, top_n=1)
+    yield {"intent": INTENT_NAME, "answer": _answer(totals, _category_label(totals, plan))}
+    yield handle(question, intent_name, metadata, retriever, plan)
@@ -1,8 +1,82 @@
-import json
-INTENT_NAME="compare_months"
-KEYWORDS=["compare","vs","difference"]
-def handle(question, intent_name, metadata, retriever):
-    raw=retriever.query(question)
-    data= raw if isinstance(raw,dict) else json.loads(raw)
-    answer="Comparison complete."
-    return {"intent":INTENT_NAME,"answer":answer,"details":{},"chart":None,"data":data}
+from typing import Dict, Any, List
+
+INTENT_NAME = "compare_months"
+KEYWORDS = ["compare", "vs", "versus", "difference", "month over month"]
+
+
+def _fmt_change(delta: float, pct) -> str:
+    direction = "more" if delta >= 0 else "less"
+    text = f"${abs(delta):,.2f} {direction}"
+    if pct is not None:
+        text += f" ({pct:+.1f}%)"
+    return text
+
+
+def handle(question: str, intent_name: str, metadata, retriever, plan) -> Dict[str, Any]:
+    """
+    Month / quarter comparison intent.
+
+    Examples:
+      "Compare my spending in January and February 2025."
+      "Did I spend more in August or September 2025?"
+      "Groceries Q1 vs Q2 2025"
+    """
+    data = retriever.compare_periods(plan)
+
+    periods: List[Dict[str, Any]] = data.get("periods", [])
+    category_deltas = data.get("category_deltas", [])
+    merchant_deltas = data.get("merchant_deltas", [])
+    scope = ", ".join(data.get("categories") or []) or "total"
+
+    if len(periods) < 2:
+        answer = "I couldn't find two periods with data to compare."
+    else:
+        first, last = periods[0], periods[-1]
+        spent = "; ".join(
+            f"${p['total_spend']:,.2f} in {p['period']}" for p in periods
+        )
+        answer = (
+            f"Your {scope} spend was {spent}. "
+            f"{last['period']} was {_fmt_change(data.get('delta', 0.0), data.get('pct_change'))} "
+            f"than {first['period']}."
+        )
+        if category_deltas:
+            top = category_deltas[0]
+            answer += (
+                f" The biggest change was {top['category']} "
+                f"({'+' if top['delta'] >= 0 else '-'}${abs(top['delta']):,.2f})."
+            )
+
+    details: Dict[str, Any] = {
+        "periods": periods,
+        "category_deltas": category_deltas,
+        "merchant_deltas": merchant_deltas,
+        "top_categories": [  # spend in the latest period; the change is in "delta"
+            {"category": c["category"], "total_spend": c["to"], "delta": c["delta"]}
+            for c in category_deltas
+        ],
+    }
+
+    chart = None
+    if category_deltas and len(periods) >= 2:
+        chart = {
+            "title": f"Change by category ({periods[0]['period']} → {periods[-1]['period']})",
+            "type": "bar",
+            "labels": [c["category"] for c in category_deltas],
+            "values": [c["delta"] for c in category_deltas],
+        }
+    elif periods:
+        chart = {
+            "title": "Spend by period",
+            "type": "bar",
+            "labels": [p["period"] for p in periods],
+            "values": [p["total_spend"] for p in periods],
+        }
+
+    return {
+        "intent": INTENT_NAME,
+        "answer": answer,
+        "details": details,
+        "chart": chart,
+        "data": data,
+    }
@@ -1,8 +1,8 @@
 from typing import Dict, Any
 INTENT_NAME = "fallback"
 KEYWORDS = []
-def handle(question: str, intent_name: str, metadata, retriever):
-    raw = retriever.query(question)
+def handle(question: str, intent_name: str, metadata, retriever, plan):
+    raw = retriever.query(plan)
     import json
     data = raw if isinstance(raw, dict) else json.loads(raw)
     total = data.get("total_spend") or data.get("total") or 0.0
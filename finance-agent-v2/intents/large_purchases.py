@@ -1,8 +1,83 @@
-import json
-INTENT_NAME="large_purchases"
-KEYWORDS=["large","big","expensive","high value"]
-def handle(question, intent_name, metadata, retriever):
-    raw=retriever.query(question)
-    data= raw if isinstance(raw,dict) else json.loads(raw)
-    answer="Large purchases identified."
-    return {"intent":INTENT_NAME,"answer":answer,"details":{},"chart":None,"data":data}
+from typing import Dict, Any
+
+INTENT_NAME = "large_purchases"
+KEYWORDS = [
+    "largest purchases",
+    "largest transactions",
+    "biggest purchases",
+    "biggest transactions",
+    "big purchases",
+    "large purchases",
+    "expensive",
+    "high value",
+    "purchases above",
+    "purchases over",
+    "transactions above",
+    "transactions over",
+    "percentile",
+]
+
+
+def handle(question: str, intent_name: str, metadata, retriever, plan) -> Dict[str, Any]:
+    """
+    Large purchases intent.
+
+    Examples:
+      "What were my largest transactions in May 2025?"
+      "Show purchases above $500 in FY25."
+      "Purchases over my 95th percentile in Q2 2025"
+    """
+    data = retriever.large_purchases(plan)
+
+    purchases = data.get("purchases", [])
+    matches = int(data.get("matches", 0))
+    total = float(data.get("total_spend", 0.0))
+    window = data.get("window") or []
+    period = window[0] if window else "this period"
+
+    mode = data.get("mode")
+    if not purchases:
+        answer = f"I found no large purchases in {period}."
+    elif mode == "threshold":
+        answer = (
+            f"You made {matches} purchases above ${data['threshold']:,.2f} in {period}, "
+            f"totaling ${total:,.2f}."
+        )
+    elif mode == "percentile":
+        answer = (
+            f"{matches} purchases in {period} were above your {data['percentile']:g}th percentile "
+            f"(${data['threshold']:,.2f}), totaling ${total:,.2f}."
+        )
+    else:
+        top = purchases[0]
+        answer = (
+            f"Your largest purchase in {period} was ${top['amount']:,.2f} at {top['merchant']} "
+            f"on {top['date']}. Your top {matches} purchases total ${total:,.2f}."
+        )
+
+    details: Dict[str, Any] = {
+        "matches": matches,
+        "total_spend": round(total, 2),
+        "purchases": purchases,
+        "top_restaurants": [  # merchants, in the slot the UI lists
+            {"merchant": f"{p['merchant']} ({p['date']})", "total_spend": p["amount"]}
+            for p in purchases[:10]
+        ],
+    }
+
+    chart = None
+    if purchases:
+        chart = {
+            "title": f"Largest purchases in {period}",
+            "type": "bar",
+            "labels": [f"{p['merchant']} ({p['date']})" for p in purchases[:10]],
+            "values": [p["amount"] for p in purchases[:10]],
+        }
+
+    return {
+        "intent": INTENT_NAME,
+        "answer": answer,
+        "details": details,
+        "chart": chart,
+        "data": data,
+    }
@@ -1,5 +1,4 @@
-from typing import Dict, Any, List
-import re
+from typing import Dict, Any
 
 INTENT_NAME = "monthly_summary"
 KEYWORDS = [
@@ -11,48 +10,21 @@ KEYWORDS = [
 ]
 
 
-MONTHS = {
-    "january": "January",
-    "february": "February",
-    "march": "March",
-    "april": "April",
-    "may": "May",
-    "june": "June",
-    "july": "July",
-    "august": "August",
-    "september": "September",
-    "october": "October",
-    "november": "November",
-    "december": "December",
+GROUPS = {
+    "top_restaurants": "merchant",
+    "top_categories": "category",
+    "top_cuisines": "cuisine",
 }
 
 
-def _normalize_pairs(pairs: List[Any], key_name: str) -> List[Dict[str, Any]]:
-    normalized: List[Dict[str, Any]] = []
-    for item in pairs:
-        if isinstance(item, dict):
-            if key_name in item and "total_spend" in item:
-                normalized.append(item)
-            continue
-        if isinstance(item, (list, tuple)) and len(item) >= 2:
-            name, amt = item[0], item[1]
-            try:
-                amount = float(amt)
-            except Exception:
-                continue
-            normalized.append({key_name: str(name), "total_spend": round(amount, 2)})
-    return normalized
-
-
-def _extract_month_label(question: str) -> str:
-    q = question.lower()
-    for key, label in MONTHS.items():
-        if re.search(rf"\b{key}\b", q):
-            return label
-    return "this period"
+def _answer(totals: Dict[str, Any], month_label: str) -> str:
+    return (
+        f"In {month_label}, you spent ${totals['total_spend']:,.2f} across {totals['matches']} transactions. "
+        "Here’s a breakdown by category and merchant."
+    )
 
 
-def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, Any]:
+def handle(question: str, intent_name: str, metadata, retriever, plan) -> Dict[str, Any]:
     """
     Monthly summary intent.
 
@@ -61,33 +33,13 @@ def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, An
       "What is my August breakdown?"
       "Monthly overview for September?"
     """
-    data = retriever.query(question)
-
-    total = float(data.get("total_spend", 0.0))
-    matches = int(data.get("matches", 0))
-
-    top_merchants_raw = data.get("top_merchants", [])
-    top_categories_raw = data.get("top_categories", [])
-    top_cuisines_raw = data.get("top_cuisines", [])
-
-    top_restaurants = _normalize_pairs(top_merchants_raw, "merchant")
-    top_categories = _normalize_pairs(top_categories_raw, "category")
-    top_cuisines = _normalize_pairs(top_cuisines_raw, "cuisine")
+    details = retriever.aggregate(plan, groups=GROUPS)
 
-    month_label = _extract_month_label(question)
+    top_restaurants = details["top_restaurants"]
+    top_categories = details["top_categories"]
 
-    answer = (
-        f"In {month_label}, you spent ${total:,.2f} across {matches} transactions. "
-        "Here’s a breakdown by category and merchant."
-    )
-
-    details: Dict[str, Any] = {
-        "matches": matches,
-        "total_spend": round(total, 2),
-        "top_restaurants": top_restaurants,  # merchants
-        "top_categories": top_categories,
-        "top_cuisines": top_cuisines,
-    }
+    month_label = plan.window.label
+    answer = _answer(details, month_label)
 
     chart = None
     if top_categories:
@@ -105,16 +57,16 @@ def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, An
             "values": [m["total_spend"] for m in top_restaurants],
         }
 
-    full_data = dict(data)
-    full_data["total_spend"] = round(total, 2)
-    full_data["top_restaurants"] = top_restaurants
-    full_data["top_categories"] = top_categories
-    full_data["top_cuisines"] = top_cuisines
-
     return {
         "intent": INTENT_NAME,
         "answer": answer,
         "details": details,
         "chart": chart,
-        "data": full_data,
+        "data": details,
     }
+
+
+def handle_stream(question: str, intent_name: str, metadata, retriever, plan):
+    """Headline totals first (no group-bys), then the full result."""
+    yield {"intent": INTENT_NAME, "answer": _answer(retriever.aggregate(plan), plan.window.label)}
+    yield handle(question, intent_name, metadata, retriever, plan)
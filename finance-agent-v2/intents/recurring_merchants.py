@@ -1,8 +1,59 @@
-import json
-INTENT_NAME="recurring_merchants"
-KEYWORDS=["recurring","repeat","subscription"]
-def handle(question, intent_name, metadata, retriever):
-    raw=retriever.query(question)
-    data= raw if isinstance(raw,dict) else json.loads(raw)
-    answer="Recurring merchants detected."
-    return {"intent":INTENT_NAME,"answer":answer,"details":{},"chart":None,"data":data}
+from typing import Dict, Any
+
+INTENT_NAME = "recurring_merchants"
+KEYWORDS = ["recurring", "repeat", "subscription", "subscriptions", "next charge"]
+
+
+def handle(question: str, intent_name: str, metadata, retriever, plan) -> Dict[str, Any]:
+    """
+    Recurring merchants / subscriptions intent.
+
+    Examples:
+      "Which recurring payments do I have in FY25?"
+      "List subscriptions between May and July 2025."
+    """
+    data = retriever.recurring_merchants(plan)
+
+    recurring = data.get("recurring", [])
+    monthly = float(data.get("total_monthly", 0.0))
+
+    if recurring:
+        names = ", ".join(
+            f"{r['merchant']} ({r['cadence']}, ~${r['average_amount']:,.2f})"
+            for r in recurring[:3]
+        )
+        answer = (
+            f"I found {len(recurring)} recurring charges costing about ${monthly:,.2f} per month: "
+            f"{names}."
+        )
+        nxt = min(recurring, key=lambda r: r["next_expected"])
+        answer += f" Next expected: {nxt['merchant']} on {nxt['next_expected']}."
+    else:
+        answer = "I didn't find any recurring charges for this period."
+
+    details: Dict[str, Any] = {
+        "matches": len(recurring),
+        "total_monthly": monthly,
+        "recurring": recurring,
+        "top_restaurants": [  # merchants, in the slot the UI lists
+            {"merchant": f"{r['merchant']} ({r['cadence']})", "total_spend": r["average_amount"]}
+            for r in recurring[:5]
+        ],
+    }
+
+    chart = None
+    if recurring:
+        chart = {
+            "title": "Recurring charges (annualized)",
+            "type": "bar",
+            "labels": [r["merchant"] for r in recurring[:10]],
+            "values": [r["annualized"] for r in recurring[:10]],
+        }
+
+    return {
+        "intent": INTENT_NAME,
+        "answer": answer,
+        "details": details,
+        "chart": chart,
+        "data": data,
+    }
@@ -11,14 +11,21 @@ KEYWORDS = [
 ]
 
 
-def handle(question: str, intent: str, metadata: List[Any], retriever) -> Dict[str, Any]:
+def _answer(total_spend: float, total_visits: int) -> str:
+    return (
+        f"You spent ${total_spend:,.2f} at restaurants "
+        f"across {total_visits} visits."
+    )
+
+
+def handle(question: str, intent: str, metadata: List[Any], retriever, plan) -> Dict[str, Any]:
     """
     Handles restaurant spending queries.
     Standardized return shape for UI compatibility.
     """
 
     # Pull structured restaurant data from retriever
-    data = retriever.get_restaurant_spend(question)
+    data = retriever.get_restaurant_spend(plan)
 
     # Extract known fields (retriever_v2 uses these names)
     total_spend = data.get("total_restaurant_spend", 0.0)
@@ -28,10 +35,7 @@ def handle(question: str, intent: str, metadata: List[Any], retriever) -> Dict[s
     top_categories = data.get("top_categories", [])
 
     # UI summary answer
-    answer = (
-        f"You spent ${total_spend:,.2f} at restaurants "
-        f"across {total_visits} visits."
-    )
+    answer = _answer(total_spend, total_visits)
 
     # Details block for UI
     details = {
@@ -60,3 +64,9 @@ def handle(question: str, intent: str, metadata: List[Any], retriever) -> Dict[s
         "data": data
     }
 
+
+def handle_stream(question: str, intent: str, metadata: List[Any], retriever, plan):
+    """Headline totals first (no group-bys), then the full result."""
+    totals = retriever.aggregate(plan, restaurant_only=True)
+    yield {"intent": INTENT_NAME, "answer": _answer(totals["total_spend"], totals["matches"])}
+    yield handle(question, intent, metadata, retriever, plan)
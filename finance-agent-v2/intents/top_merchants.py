@@ -1,4 +1,4 @@
-from typing import Dict, Any, List
+from typing import Dict, Any
 
 INTENT_NAME = "top_merchants"
 KEYWORDS = [
@@ -10,25 +10,33 @@ KEYWORDS = [
     "top spend",
 ]
 
+GROUPS = {
+    "top_restaurants": "merchant",
+    "top_categories": "category",
+    "top_cuisines": "cuisine",
+}
 
-def _normalize_pairs(pairs: List[Any], key_name: str) -> List[Dict[str, Any]]:
-    normalized: List[Dict[str, Any]] = []
-    for item in pairs:
-        if isinstance(item, dict):
-            if key_name in item and "total_spend" in item:
-                normalized.append(item)
-            continue
-        if isinstance(item, (list, tuple)) and len(item) >= 2:
-            name, amt = item[0], item[1]
-            try:
-                amount = float(amt)
-            except Exception:
-                continue
-            normalized.append({key_name: str(name), "total_spend": round(amount, 2)})
-    return normalized
 
+def _answer(totals: Dict[str, Any]) -> str:
+    total = totals["total_spend"]
+    matches = totals["matches"]
+    top_restaurants = totals["top_restaurants"]
 
-def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, Any]:
+    # Build a human-friendly list of top names
+    if top_restaurants:
+        names = [m["merchant"] for m in top_restaurants[:3]]
+        name_list = ", ".join(names)
+        return (
+            f"Your top merchants by spend are {name_list}, "
+            f"with a total of ${total:,.2f} across {matches} transactions."
+        )
+    return (
+        f"I found ${total:,.2f} in spend across {matches} transactions, "
+        "but could not identify distinct top merchants."
+    )
+
+
+def handle(question: str, intent_name: str, metadata, retriever, plan) -> Dict[str, Any]:
     """
     Top merchants intent.
 
@@ -37,40 +45,10 @@ def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, An
       "Top merchants in August?"
       "Who did I spend the most with in June?"
     """
-    data = retriever.query(question)
-
-    total = float(data.get("total_spend", 0.0))
-    matches = int(data.get("matches", 0))
-
-    top_merchants_raw = data.get("top_merchants", [])
-    top_categories_raw = data.get("top_categories", [])
-    top_cuisines_raw = data.get("top_cuisines", [])
-
-    top_restaurants = _normalize_pairs(top_merchants_raw, "merchant")
-    top_categories = _normalize_pairs(top_categories_raw, "category")
-    top_cuisines = _normalize_pairs(top_cuisines_raw, "cuisine")
+    details = retriever.aggregate(plan, groups=GROUPS)
 
-    # Build a human-friendly list of top names
-    if top_restaurants:
-        names = [m["merchant"] for m in top_restaurants[:3]]
-        name_list = ", ".join(names)
-        answer = (
-            f"Your top merchants by spend are {name_list}, "
-            f"with a total of ${total:,.2f} across {matches} transactions."
-        )
-    else:
-        answer = (
-            f"I found ${total:,.2f} in spend across {matches} transactions, "
-            "but could not identify distinct top merchants."
-        )
-
-    details: Dict[str, Any] = {
-        "matches": matches,
-        "total_spend": round(total, 2),
-        "top_restaurants": top_restaurants,  # merchants
-        "top_categories": top_categories,
-        "top_cuisines": top_cuisines,
-    }
+    top_restaurants = details["top_restaurants"]
+    answer = _answer(details)
 
     chart = None
     if top_restaurants:
@@ -81,17 +59,17 @@ def handle(question: str, intent_name: str, metadata, retriever) -> Dict[str, An
             "values": [m["total_spend"] for m in top_restaurants],
         }
 
-    full_data = dict(data)
-    full_data["total_spend"] = round(total, 2)
-    full_data["top_restaurants"] = top_restaurants
-    full_data["top_categories"] = top_categories
-    full_data["top_cuisines"] = top_cuisines
-
     return {
         "intent": INTENT_NAME,
         "answer": answer,
         "details": details,
         "chart": chart,
-        "data": full_data,
+        "data": details,
     }
 
+
+def handle_stream(question: str, intent_name: str, metadata, retriever, plan):
+    """Headline (totals and the top three merchants) first, then the full result."""
+    totals = retriever.aggregate(plan, groups={"top_restaurants": "merchant"}, top_n=3)
+    yield {"intent": INTENT_NAME, "answer": _answer(totals)}
+    yield handle(question, intent_name, metadata, retriever, plan)
@@ -0,0 +1,119 @@
+# orchestrator/executor.py
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# ---------------------------------------------------------------------
+# Sizing (override per deployment)
+# ---------------------------------------------------------------------
+ASK_WORKERS = int(os.getenv("ASK_WORKERS", str(min(4, os.cpu_count() or 1))))
+ASK_QUEUE_SIZE = int(os.getenv("ASK_QUEUE_SIZE", "16"))
+ASK_RETRY_AFTER = int(os.getenv("ASK_RETRY_AFTER", "1"))
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class BoundedExecutor:
+    """
+    Dedicated, sized thread pool for retrieval work (encode, FAISS search,
+    filter scan) with admission control.
+
+    At most `max_workers` jobs run and at most `max_queue` wait. Anything
+    beyond that is rejected immediately with ExecutorSaturated so the API
+    can shed load (503) instead of letting latency grow without bound.
+
+    Threads (not processes) are used because the retriever state is large
+    and in-memory; FAISS and the encoder release the GIL while working.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = ASK_WORKERS,
+        max_queue: int = ASK_QUEUE_SIZE,
+        name: str = "ask",
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.name = name
+
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"{name}-worker",
+        )
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+
+        self._inflight = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    # -----------------------------------------------------------------
+    # Submission
+    # -----------------------------------------------------------------
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorSaturated(
+                f"{self.name} executor saturated "
+                f"({self.max_workers} running, {self.max_queue} queued)"
+            )
+
+        with self._lock:
+            self._inflight += 1
+            self._submitted += 1
+
+        def _run():
+            with self._lock:
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        try:
+            future = self._pool.submit(_run)
+        except Exception:
+            self._release(None)
+            raise
+
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self._inflight -= 1
+            if future is not None and not future.cancelled() and future.exception() is None:
+                self._completed += 1
+            else:
+                self._failed += 1
+        self._slots.release()
+
+    # -----------------------------------------------------------------
+    # Introspection
+    # -----------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._inflight - self._running,
+                "inflight": self._inflight,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
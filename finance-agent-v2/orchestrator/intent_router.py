@@ -2,7 +2,9 @@
 
 import os
 import importlib
-from typing import Dict, List, Callable, Any
+from typing import Dict, List, Callable, Any, Optional
+
+from rag.query_plan import QueryPlan
 
 
 class IntentRouter:
@@ -14,8 +16,14 @@ class IntentRouter:
         KEYWORDS = ["restaurant", "dining"]
         def handle(question, ...) -> dict
 
-    Router exposes two dicts:
+    and may define a two-phase variant for streaming:
+        def handle_stream(question, ...) -> iterator of dicts
+            (first {"intent", "answer"} from the headline totals,
+             then the full handle() result)
+
+    Router exposes three dicts:
         self.handlers[intent_name]  → handler function
+        self.streamers[intent_name] → handle_stream (only if defined)
         self.intent_keywords[intent_name] → list[str]
     """
 
@@ -23,6 +31,7 @@ class IntentRouter:
         print("[INIT] Loading python-based intents (v3)...")
 
         self.handlers: Dict[str, Callable] = {}
+        self.streamers: Dict[str, Callable] = {}
         self.intent_keywords: Dict[str, List[str]] = {}
 
         intents_dir = os.path.join(
@@ -55,6 +64,9 @@ class IntentRouter:
 
             # Register handler + keywords
             self.handlers[intent_name] = handler
+            streamer = getattr(module, "handle_stream", None)
+            if callable(streamer):
+                self.streamers[intent_name] = streamer
             self.intent_keywords[intent_name] = [k.lower() for k in keywords]
 
             print(f"  ✓ Loaded intent: {intent_name}")
@@ -65,8 +77,8 @@ class IntentRouter:
     # ------------------------------------------------------------
     # Intent detection using keyword scoring
     # ------------------------------------------------------------
-    def detect(self, question: str) -> str:
-        q = question.lower()
+    def detect(self, question: str, plan: Optional[QueryPlan] = None) -> str:
+        q = plan.text if plan is not None else question.lower()
         best_intent = "fallback"
         best_score = 0
 
@@ -2,34 +2,55 @@
 
 import json
 import inspect
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
 
-from rag.retriever_v2 import RAGRetriever  # MUST exist as class name
+from rag.engine import create_registry
+from rag.registry import DEFAULT_TENANT, UnknownTenant
+from rag.timing import span
+from rag.query_plan import QueryPlan, parse_plan
 from orchestrator.intent_router import IntentRouter
 
+# Intents answered by scanning columns rather than FAISS candidates
+SCAN_ONLY_INTENTS = {"restaurant_spend"}
+
 
 class FinanceAgent:
     """
     FinanceAgent orchestrates:
       • Intent detection (IntentRouter)
       • Dispatch to per-intent handlers (intents/*.py)
-      • Shared FAISS retriever for category/restaurant analysis
+      • Per-tenant FAISS retrievers for category/restaurant analysis
+        (self.retrievers, loaded lazily and evicted LRU)
 
     Handlers may use ANY of these signatures:
       1) handle(question)
       2) handle(question, retriever)
-      3) handle(question, intent_name, metadata, retriever)   ← newest standard
+      3) handle(question, intent_name, metadata, retriever)
+      4) handle(question, intent_name, metadata, retriever, plan)   ← newest standard
+
+    Each question is parsed once into a QueryPlan (memoized by text)
+    that is shared by the router, the handler and the retriever.
     """
 
     def __init__(self):
         print("[INIT] Starting FinanceAgent orchestrator (python-intents + RAG)...")
 
-        # Shared FAISS retriever
-        self.retriever = RAGRetriever()
+        # Per-tenant FAISS retrievers (in-process, or process-pool proxies
+        # when QUERY_ENGINE=process)
+        self.retrievers = create_registry()
+        try:
+            self.retrievers.get(DEFAULT_TENANT)
+        except UnknownTenant:
+            print("[INIT] No default tenant index; tenants load on first use.")
 
         # Load handlers (names, keywords)
         self.router = IntentRouter()
 
+    @property
+    def retriever(self):
+        """Default tenant's retriever (single-tenant callers)."""
+        return self.retrievers.get(DEFAULT_TENANT)
+
     # ----------------------------------------------------------------------
     # Build details from data payload for UI
     # ----------------------------------------------------------------------
@@ -114,9 +135,10 @@ class FinanceAgent:
     # ----------------------------------------------------------------------
     # Generic fallback if handler fails or missing
     # ----------------------------------------------------------------------
-    def _generic_rag_fallback(self, intent_name: str, question: str) -> Dict[str, Any]:
+    def _generic_rag_fallback(self, intent_name: str, question: str,
+                              plan: QueryPlan = None, retriever=None) -> Dict[str, Any]:
         try:
-            raw = self.retriever.query(question)
+            raw = (retriever or self.retriever).query(plan or question)
 
             # Accept dict or JSON string
             if isinstance(raw, str):
@@ -157,22 +179,27 @@ class FinanceAgent:
             }
 
     # ----------------------------------------------------------------------
-    # Safe universal handler invocation (supports 1, 2, or 4 args)
+    # Safe universal handler invocation (supports 1, 2, 4 or 5 args)
     # ----------------------------------------------------------------------
-    def _invoke_handler(self, handler, question, intent_name):
+    def _invoke_handler(self, handler, question, intent_name, plan=None, retriever=None):
         sig = inspect.signature(handler)
         param_count = len(sig.parameters)
+        retriever = retriever or self.retriever
 
         # metadata passed to new handlers
-        metadata = getattr(self.retriever, "metadata", [])
+        metadata = getattr(retriever, "metadata", [])
 
-        if param_count == 4:
-            # New standard signature
-            return handler(question, intent_name, metadata, self.retriever)
+        if param_count == 5:
+            # New standard signature: parsed plan passed along
+            return handler(question, intent_name, metadata, retriever,
+                           plan or parse_plan(question))
+
+        elif param_count == 4:
+            return handler(question, intent_name, metadata, retriever)
 
         elif param_count == 2:
             # Old signature: handle(question, retriever)
-            return handler(question, self.retriever)
+            return handler(question, retriever)
 
         elif param_count == 1:
             # Very old signature: handle(question)
@@ -186,9 +213,14 @@ class FinanceAgent:
     # ----------------------------------------------------------------------
     # Main API entry (called by FastAPI endpoint)
     # ----------------------------------------------------------------------
-    def analyze(self, question: str) -> Dict[str, Any]:
+    def analyze(self, question: str, tenant: Optional[str] = None) -> Dict[str, Any]:
+        with span("retriever"):
+            retriever = self.retrievers.get(tenant)
         try:
-            intent_name = self.router.detect(question)
+            with span("plan"):
+                plan = parse_plan(question)
+            with span("route"):
+                intent_name = self.router.detect(question, plan)
         except Exception as e:
             print("[ERROR] Intent detection failed:", e)
             return {
@@ -201,18 +233,153 @@ class FinanceAgent:
 
         print(f"[ROUTER] Intent → {intent_name}")
 
+        return self._run_intent(intent_name, question, plan, retriever)
+
+    def _run_intent(self, intent_name: str, question: str,
+                    plan: QueryPlan = None, retriever=None) -> Dict[str, Any]:
         # Resolve handler for intent
         handler = self.router.handlers.get(intent_name)
 
         if handler is None:
             print(f"[WARN] No handler found for '{intent_name}'. Using RAG fallback.")
-            return self._generic_rag_fallback(intent_name, question)
+            return self._generic_rag_fallback(intent_name, question, plan, retriever)
 
         # Invoke handler safely
         try:
-            raw_result = self._invoke_handler(handler, question, intent_name)
+            with span("handler"):
+                raw_result = self._invoke_handler(handler, question, intent_name, plan, retriever)
             return self._normalize_result(intent_name, raw_result)
 
         except Exception as e:
             print(f"[ERROR] Handler '{intent_name}' failed:", e)
-            return self._generic_rag_fallback(intent_name, question)
+            return self._generic_rag_fallback(intent_name, question, plan, retriever)
+
+    # ----------------------------------------------------------------------
+    # Streaming API entry (intent → answer → details → chart → data)
+    # ----------------------------------------------------------------------
+    def analyze_stream(self, question: str,
+                       tenant: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the response in the order the UI can use it.
+
+        The intent is emitted as soon as routing finishes (before any
+        retrieval), then the headline answer, and only then the larger
+        details / chart / data blocks. Intents with a handle_stream()
+        compute the headline totals first, so the answer goes out before
+        the group-bys behind details and chart have run; the others
+        answer once handle() returns.
+        """
+        with span("retriever"):
+            retriever = self.retrievers.get(tenant)
+        try:
+            with span("plan"):
+                plan = parse_plan(question)
+            with span("route"):
+                intent_name = self.router.detect(question, plan)
+        except Exception as e:
+            print("[ERROR] Intent detection failed:", e)
+            yield {"event": "error", "intent": "error",
+                   "answer": f"Could not detect intent ({e})."}
+            return
+
+        print(f"[ROUTER] Intent → {intent_name}")
+        yield {"event": "intent", "intent": intent_name}
+
+        result = None
+        answered = False
+        streamer = self.router.streamers.get(intent_name)
+        if streamer is not None:
+            try:
+                with span("handler"):
+                    for part in self._invoke_handler(streamer, question, intent_name, plan, retriever):
+                        if not answered:
+                            yield {"event": "answer", "intent": part.get("intent", intent_name),
+                                   "answer": part.get("answer", "")}
+                            answered = True
+                        result = part
+                result = self._normalize_result(intent_name, result)
+            except Exception as e:
+                print(f"[ERROR] Streaming handler '{intent_name}' failed:", e)
+                if answered:
+                    # The headline is already out; re-running the intent would
+                    # send details that need not match it, so end here.
+                    yield {"event": "error", "intent": "error",
+                           "answer": "Internal error while processing question.",
+                           "details": {"error": str(e)}}
+                    return
+                result = None
+
+        if result is None:
+            result = self._run_intent(intent_name, question, plan, retriever)
+        if not answered:
+            yield {"event": "answer", "intent": result["intent"], "answer": result["answer"]}
+        yield {"event": "details", "details": result["details"]}
+        yield {"event": "chart", "chart": result["chart"]}
+        yield {"event": "data", "data": result["data"]}
+        yield {"event": "done"}
+
+    # ----------------------------------------------------------------------
+    # Batch API entry (many questions, one round-trip)
+    # ----------------------------------------------------------------------
+    def analyze_batch(self, questions: List[str],
+                      tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Answer several questions at once, in order.
+
+        Questions are grouped by detected intent: everything that goes
+        through the semantic search is encoded and searched in a single
+        FAISS call up front, while restaurant questions share the
+        retriever's precomputed restaurant rows. A failure on one
+        question never affects the others.
+        """
+        with span("retriever"):
+            retriever = self.retrievers.get(tenant)
+        plans: List[Any] = []
+        intents: List[Any] = []
+        for q in questions:
+            try:
+                with span("plan"):
+                    plan = parse_plan(q)
+                plans.append(plan)
+                with span("route"):
+                    intents.append(self.router.detect(q, plan))
+            except Exception as e:
+                print("[ERROR] Intent detection failed:", e)
+                plans.append(None)
+                intents.append(e)
+
+        semantic = [
+            q for q, intent in zip(questions, intents)
+            if isinstance(intent, str) and intent not in SCAN_ONLY_INTENTS
+        ]
+        prefetch = getattr(retriever, "prefetch", None)
+        if semantic and callable(prefetch):
+            try:
+                prefetch(semantic)
+            except Exception as e:
+                # Not fatal: each query() will search on its own.
+                print("[WARN] Batch prefetch failed:", e)
+
+        results: List[Dict[str, Any]] = []
+        for q, plan, intent in zip(questions, plans, intents):
+            if not isinstance(intent, str):
+                results.append({
+                    "intent": "error",
+                    "answer": f"Could not detect intent ({intent}).",
+                    "details": {},
+                    "chart": None,
+                    "data": {},
+                })
+                continue
+            try:
+                results.append(self._run_intent(intent, q, plan, retriever))
+            except Exception as e:
+                print(f"[ERROR] Batch item failed ({intent}):", e)
+                results.append({
+                    "intent": intent,
+                    "answer": "Something went wrong while answering this request.",
+                    "details": {"error": str(e)},
+                    "chart": None,
+                    "data": {},
+                })
+        return results
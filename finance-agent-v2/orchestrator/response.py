@@ -0,0 +1,88 @@
+# orchestrator/response.py
+
+import json
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+# ---------------------------------------------------------------------
+# Response projection
+# ---------------------------------------------------------------------
+# "full" returns everything the handlers produce. "slim" keeps only what
+# static/app.js renders: intent, answer, details, chart and the scalar
+# totals it reads from data as a fallback. The top-N lists inside data
+# duplicate details and are dropped.
+VIEW_FULL = "full"
+VIEW_SLIM = "slim"
+VIEW_HEADER = "x-response-view"
+
+SLIM_DATA_FIELDS = (
+    "total_spend",
+    "total",
+    "total_restaurant_spend",
+    "total_visits",
+    "matches",
+)
+
+
+def response_view(request) -> str:
+    """?view=slim or an X-Response-View: slim header selects the slim view."""
+    view = request.query_params.get("view") or request.headers.get(VIEW_HEADER) or VIEW_FULL
+    return VIEW_SLIM if view.strip().lower() == VIEW_SLIM else VIEW_FULL
+
+
+def slim_data(data: Any) -> Dict[str, Any]:
+    if not isinstance(data, dict):
+        return {}
+    return {k: data[k] for k in SLIM_DATA_FIELDS if k in data}
+
+
+def project(result: Dict[str, Any], view: str) -> Dict[str, Any]:
+    if view != VIEW_SLIM or not isinstance(result, dict):
+        return result
+    slim = {
+        "intent": result.get("intent"),
+        "answer": result.get("answer"),
+        "details": result.get("details") or {},
+        "chart": result.get("chart"),
+        "data": slim_data(result.get("data")),
+    }
+    # Keep any diagnostic extras (e.g. _timings) the caller asked for
+    for k, v in result.items():
+        if k.startswith("_"):
+            slim[k] = v
+    return slim
+
+
+# ---------------------------------------------------------------------
+# Fast JSON encoding
+# ---------------------------------------------------------------------
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200,
+                  headers: Optional[Dict[str, str]] = None) -> FastJSONResponse:
+    return FastJSONResponse(status_code=status_code, content=content, headers=headers)
@@ -1,11 +1,30 @@
 import os
+import sys
 import json
-import requests
+import shutil
+import argparse
+from pathlib import Path
 import numpy as np
 import faiss
 from sentence_transformers import SentenceTransformer
 from dotenv import load_dotenv
 
+# Run as a script (python rag/builder_v2.py): make the rag package importable
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from rag.columns import parse_day
+from rag.transaction_sync import TransactionSync
+from rag.shards import (
+    SHARD_MANIFEST,
+    SHARDS_FORMAT,
+    UNDATED_SHARD,
+    partition_key,
+    read_manifest,
+    shards_root,
+    write_manifest,
+)
+
 load_dotenv()
 
 # ---------------------------------------------------------------------
@@ -15,6 +34,9 @@ TRANSACTION_API_URL = os.getenv("TRANSACTION_MCP_URL", "http://127.0.0.1:8080/tr
 INDEX_DIR = "rag/index"
 os.makedirs(INDEX_DIR, exist_ok=True)
 
+# "" → one faiss.index; "year" / "quarter" → time-partitioned shards
+INDEX_SHARDS = os.getenv("INDEX_SHARDS", "")
+
 # ---------------------------------------------------------------------
 # Embedding Model (small and free for local testing)
 # ---------------------------------------------------------------------
@@ -43,16 +65,12 @@ class RAGBuilder:
         self.embeddings = []
 
     def fetch_transactions(self):
-        print(f"📡 Fetching transactions from {TRANSACTION_API_URL} ...")
-        resp = requests.get(TRANSACTION_API_URL)
-        resp.raise_for_status()
-        data = resp.json()
-        print(f"✅ Retrieved {len(data)} transactions.")
-        return data
-
-    def build_index(self):
-        data = self.fetch_transactions()
+        print(f"📡 Syncing transactions from {TRANSACTION_API_URL} ...")
+        result = TransactionSync(TRANSACTION_API_URL, name="builder").sync()
+        print(f"✅ {result.summary()}")
+        return result.rows
 
+    def _write_index(self, data, index_path):
         print("🧠 Generating text representations ...")
         texts = [format_transaction(t) for t in data]
 
@@ -64,7 +82,17 @@ class RAGBuilder:
         index = faiss.IndexFlatL2(dimension)
         index.add(np.array(vectors, dtype=np.float32))
 
-        faiss.write_index(index, f"{INDEX_DIR}/faiss.index")
+        faiss.write_index(index, index_path)
+
+    def build_index(self):
+        data = self.fetch_transactions()
+
+        self._write_index(data, f"{INDEX_DIR}/faiss.index")
+
+        # A stale shard manifest would take precedence over the new index
+        manifest = os.path.join(shards_root(INDEX_DIR), SHARD_MANIFEST)
+        if os.path.exists(manifest):
+            os.remove(manifest)
 
         # Save metadata (so we can look up transaction info later)
         with open(f"{INDEX_DIR}/metadata.json", "w") as f:
@@ -73,9 +101,84 @@ class RAGBuilder:
         print(f"✅ FAISS index created with {len(data)} records.")
         print(f"📂 Saved to {INDEX_DIR}/faiss.index and metadata.json")
 
+    def build_shards(self, partition="year", full=False):
+        """
+        One FAISS index per year/quarter plus a manifest (see rag/shards.py).
+
+        Shards before the current (latest) partition are sealed: when a
+        previous build already wrote one with the same row count it is
+        reused untouched, so a routine rebuild only re-encodes the
+        current period. full=True re-encodes everything.
+        """
+        data = self.fetch_transactions()
+
+        groups = {}
+        for t in data:
+            key = partition_key(parse_day(t.get("transactionDate")), partition)
+            groups.setdefault(key, []).append(t)
+
+        dated = sorted(k for k in groups if k != UNDATED_SHARD)
+        keys = dated + ([UNDATED_SHARD] if UNDATED_SHARD in groups else [])
+        current = dated[-1] if dated else None
+
+        previous = None if full else read_manifest(INDEX_DIR)
+        if previous and previous.get("partition") != partition:
+            previous = None
+        sealed_before = {
+            e["key"]: e for e in (previous or {}).get("shards", []) if e.get("sealed")
+        }
+
+        root = shards_root(INDEX_DIR)
+        os.makedirs(root, exist_ok=True)
+
+        shards = []
+        combined = []
+        for key in keys:
+            rows = groups[key]
+            shard_dir = os.path.join(root, key)
+            sealed = key not in (current, UNDATED_SHARD)
+            prev = sealed_before.get(key)
+
+            if prev and prev["rows"] == len(rows) and os.path.exists(os.path.join(shard_dir, "faiss.index")):
+                # Immutable: keep the shard's own row order (it matches its FAISS ids)
+                with open(os.path.join(shard_dir, "metadata.json"), "r") as f:
+                    rows = json.load(f)
+                print(f"⏭  Shard {key}: sealed, reusing {len(rows)} records")
+            else:
+                print(f"🧱 Shard {key}: {len(rows)} records")
+                os.makedirs(shard_dir, exist_ok=True)
+                self._write_index(rows, os.path.join(shard_dir, "faiss.index"))
+                with open(os.path.join(shard_dir, "metadata.json"), "w") as f:
+                    json.dump(rows, f, indent=2)
+
+            shards.append({"key": key, "rows": len(rows), "offset": len(combined), "sealed": sealed})
+            combined.extend(rows)
+
+        # Shards no longer produced (e.g. after switching partition)
+        for name in os.listdir(root):
+            if os.path.isdir(os.path.join(root, name)) and name not in groups:
+                shutil.rmtree(os.path.join(root, name))
+
+        # Combined metadata (column store source), then the manifest last
+        with open(f"{INDEX_DIR}/metadata.json", "w") as f:
+            json.dump(combined, f, indent=2)
+        write_manifest(INDEX_DIR, {"format": SHARDS_FORMAT, "partition": partition, "shards": shards})
+
+        print(f"✅ {len(shards)} FAISS shards ({partition}) with {len(combined)} records.")
+        print(f"📂 Saved to {root}/manifest.json")
+
 # ---------------------------------------------------------------------
 # Entry Point
 # ---------------------------------------------------------------------
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the FAISS index from the transaction API.")
+    parser.add_argument("--shards", choices=["year", "quarter"], default=INDEX_SHARDS or None,
+                        help="write one shard per year/quarter instead of a single index")
+    parser.add_argument("--full", action="store_true", help="re-encode sealed shards too")
+    args = parser.parse_args()
+
     builder = RAGBuilder()
-    builder.build_index()
+    if args.shards:
+        builder.build_shards(args.shards, full=args.full)
+    else:
+        builder.build_index()
@@ -0,0 +1,651 @@
+import os
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag.merchant_index import MerchantIndex
+from rag.query_parsing import CUISINE_KEYWORDS
+
+# ---------------------------------------------------------------------
+# Column cache layout
+# ---------------------------------------------------------------------
+COLUMNS_FORMAT = 2
+MANIFEST_NAME = "columns.json"
+VOCAB_NAME = "vocab.json"
+MERCHANT_INDEX_NAME = "merchant_index.json"
+
+RESTAURANT_TERMS = [
+    "restaurant", "cafe", "bar", "grill", "taco", "pizza",
+    "pizzeria", "kitchen", "eatery", "burger", "bbq",
+    "brunch", "bistro", "brew", "donut", "doughnut"
+]
+
+
+# ---------------------------------------------------------------------
+# Record classification (evaluated once per record at build time)
+# ---------------------------------------------------------------------
+def is_restaurant(record: Dict[str, Any]) -> bool:
+    desc = (record.get("description") or "").lower()
+    cat = (record.get("category") or "").lower()
+
+    # Category-based
+    if "food" in cat or "drink" in cat:
+        return True
+
+    # Enriched merchantType (from merchant table)
+    rt = record.get("restaurantType")
+    if isinstance(rt, list) and rt:
+        return True
+    if isinstance(rt, str) and rt.strip():
+        return True
+
+    # Fallback keyword sniffing on description
+    return any(t in desc for t in RESTAURANT_TERMS)
+
+
+def matches_cuisine(record: Dict[str, Any], cuisines: List[str]) -> bool:
+    if not cuisines:
+        return True
+
+    desc = (record.get("description") or "").lower()
+    rt = record.get("restaurantType")
+
+    if any(c in desc for c in cuisines):
+        return True
+
+    if isinstance(rt, str):
+        rts = [rt.lower()]
+    elif isinstance(rt, list):
+        rts = [str(x).lower() for x in rt]
+    else:
+        rts = []
+
+    for c in cuisines:
+        if any(c in t for t in rts):
+            return True
+
+    return False
+
+
+def cuisine_bits(cuisines: List[str]) -> int:
+    """Bitmask over CUISINE_KEYWORDS for the requested cuisines."""
+    bits = 0
+    for c in cuisines:
+        if c in CUISINE_KEYWORDS:
+            bits |= 1 << CUISINE_KEYWORDS.index(c)
+    return bits
+
+
+def restaurant_type_labels(record: Dict[str, Any]) -> List[str]:
+    """Labels a record contributes to the by-cuisine breakdown."""
+    rt = record.get("restaurantType")
+    if isinstance(rt, list):
+        return [str(t) for t in rt]
+    if isinstance(rt, str) and rt.strip():
+        return [rt]
+    return []
+
+
+def parse_day(date_raw: Optional[str]) -> int:
+    """transactionDate → proleptic ordinal, or -1 when missing/invalid."""
+    if not date_raw:
+        return -1
+    try:
+        return datetime.strptime(date_raw.split("T")[0], "%Y-%m-%d").toordinal()
+    except Exception:
+        return -1
+
+
+# ---------------------------------------------------------------------
+# Aggregation helpers
+# ---------------------------------------------------------------------
+def top_rows(
+    codes: np.ndarray,
+    weights: np.ndarray,
+    labels: List[str],
+    key: str,
+    n: int = 5,
+    default: str = "",
+    measures: Tuple[str, ...] = ("total_spend",),
+) -> List[Dict[str, Any]]:
+    """
+    Sum weights per code and return the n largest groups as ready-to-
+    serialize rows: {key: label, "total_spend": 12.34[, "matches": 3]
+    [, "average_spend": 4.11]} — already rounded, no tuple stage.
+    """
+    if not len(codes):
+        return []
+    sums = np.bincount(codes, weights=weights, minlength=len(labels))
+    counts = np.bincount(codes, minlength=len(labels))
+    present = np.flatnonzero(counts)
+    order = present[np.argsort(-sums[present], kind="stable")][:n]
+
+    rows = []
+    for c in order.tolist():
+        row = {key: labels[c] or default}
+        for m in measures:
+            if m == "total_spend":
+                row[m] = round(float(sums[c]), 2)
+            elif m == "matches":
+                row[m] = int(counts[c])
+            elif m == "average_spend":
+                row[m] = round(float(sums[c]) / int(counts[c]), 2)
+        rows.append(row)
+    return rows
+
+
+class ColumnStore:
+    """
+    Date-sorted, NumPy-backed view of metadata.json.
+
+    Every per-record value the retriever filters or aggregates on is
+    derived once (date ordinal, amount, category/merchant codes,
+    restaurant flag, cuisine bitmask, restaurant-type labels) and saved
+    as .npy files next to the FAISS index. Loading with mmap=True lets
+    several processes share one copy of the columns through the page
+    cache instead of each parsing the JSON.
+
+    Rows are sorted by transaction date. `row_id` maps a position back
+    to the metadata/FAISS row and `position` is its inverse. `merchant`
+    holds canonical merchant ids from a MerchantIndex built over the raw
+    names, so store numbers and spelling variants aggregate together;
+    `merchant_raw` keeps each row's own spelling for per-row listings.
+    """
+
+    ARRAYS = (
+        "row_id", "position", "day", "ym", "amount",
+        "category", "merchant", "merchant_raw", "restaurant", "cuisine_mask",
+        "rtype_offsets", "rtype_codes",
+    )
+
+    def __init__(self, arrays: Dict[str, np.ndarray], vocab: Dict[str, List[str]],
+                 source: Optional[Dict[str, Any]] = None,
+                 merchant_index: Optional[MerchantIndex] = None):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.categories: List[str] = vocab["categories"]
+        self.merchants: List[str] = vocab["merchants"]
+        self.raw_merchants: List[str] = vocab["raw_merchants"]
+        self.rtypes: List[str] = vocab["rtypes"]
+        self.source = source or {}
+        self.merchant_index = merchant_index
+        self.patches = 0  # merchant patches applied on top of the source data
+        self._category_codes: Dict[Tuple[str, ...], np.ndarray] = {}
+        self._monthly: Optional["MonthlyRollup"] = None
+        self._amounts: Optional["AmountIndex"] = None
+
+    def __len__(self) -> int:
+        return len(self.row_id)
+
+    @property
+    def version(self) -> str:
+        """Stable identifier of the source data the columns were built from."""
+        base = f"{self.source.get('size', 0)}-{self.source.get('mtime_ns', 0)}"
+        return f"{base}+p{self.patches}" if self.patches else base
+
+    # -----------------------------------------------------------------
+    # Build / persist
+    # -----------------------------------------------------------------
+    @classmethod
+    def build(cls, metadata: List[Dict[str, Any]],
+              source: Optional[Dict[str, Any]] = None) -> "ColumnStore":
+        n = len(metadata)
+        days = np.fromiter((parse_day(r.get("transactionDate")) for r in metadata),
+                           dtype=np.int32, count=n)
+        order = np.argsort(days, kind="stable").astype(np.int32)
+        position = np.empty(n, dtype=np.int32)
+        position[order] = np.arange(n, dtype=np.int32)
+
+        cat_codes: Dict[str, int] = {}
+        names = [r.get("merchantName") or r.get("description") or "Unknown" for r in metadata]
+        merchant_index = MerchantIndex.build(names)
+        raw_codes = {name: i for i, name in enumerate(merchant_index.aliases)}
+        rtype_codes: Dict[str, int] = {}
+
+        amount = np.full(n, np.nan, dtype=np.float64)
+        category = np.empty(n, dtype=np.int32)
+        merchant = np.empty(n, dtype=np.int32)
+        merchant_raw = np.empty(n, dtype=np.int32)
+        restaurant = np.zeros(n, dtype=bool)
+        cmask = np.zeros(n, dtype=np.uint32)
+        rt_lists: List[List[int]] = []
+
+        # Vocabularies are assigned in metadata order so tie-breaks match
+        # the order records were originally seen in.
+        for i, r in enumerate(metadata):
+            try:
+                amount[i] = float(r.get("amount", 0))
+            except Exception:
+                pass
+
+            cat = r.get("category") or ""
+            category[i] = cat_codes.setdefault(cat, len(cat_codes))
+
+            merchant[i] = merchant_index.aliases[names[i]]
+            merchant_raw[i] = raw_codes[names[i]]
+
+            restaurant[i] = is_restaurant(r)
+            bits = 0
+            for b, c in enumerate(CUISINE_KEYWORDS):
+                if matches_cuisine(r, [c]):
+                    bits |= 1 << b
+            cmask[i] = bits
+
+            rt_lists.append([
+                rtype_codes.setdefault(t, len(rtype_codes))
+                for t in restaurant_type_labels(r)
+            ])
+
+        sorted_lists = [rt_lists[i] for i in order]
+        offsets = np.zeros(n + 1, dtype=np.int32)
+        offsets[1:] = np.cumsum([len(x) for x in sorted_lists])
+        flat = np.fromiter((c for x in sorted_lists for c in x),
+                           dtype=np.int32, count=int(offsets[-1]))
+
+        ym = np.full(n, -1, dtype=np.int32)
+        valid = days >= 0
+        if valid.any():
+            ym[valid] = [
+                d.year * 12 + d.month - 1
+                for d in map(datetime.fromordinal, days[valid].tolist())
+            ]
+
+        arrays = {
+            "row_id": order,
+            "position": position,
+            "day": days[order],
+            "ym": ym[order],
+            "amount": amount[order],
+            "category": category[order],
+            "merchant": merchant[order],
+            "merchant_raw": merchant_raw[order],
+            "restaurant": restaurant[order],
+            "cuisine_mask": cmask[order],
+            "rtype_offsets": offsets,
+            "rtype_codes": flat,
+        }
+        vocab = {
+            "categories": list(cat_codes),
+            "merchants": merchant_index.names,
+            "raw_merchants": list(raw_codes),
+            "rtypes": list(rtype_codes),
+        }
+        return cls(arrays, vocab, source, merchant_index)
+
+    def save(self, cache_dir: str) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in self.ARRAYS:
+            tmp = os.path.join(cache_dir, f".{name}.tmp.npy")
+            np.save(tmp, np.asarray(getattr(self, name)))
+            os.replace(tmp, os.path.join(cache_dir, f"{name}.npy"))
+
+        _write_json(os.path.join(cache_dir, VOCAB_NAME), {
+            "categories": self.categories,
+            "merchants": self.merchants,
+            "raw_merchants": self.raw_merchants,
+            "rtypes": self.rtypes,
+        })
+        if self.merchant_index is not None:
+            _write_json(os.path.join(cache_dir, MERCHANT_INDEX_NAME), self.merchant_index.to_dict())
+        # Manifest last: its presence marks a complete cache.
+        _write_json(os.path.join(cache_dir, MANIFEST_NAME), {
+            "format": COLUMNS_FORMAT,
+            "rows": len(self),
+            "source": self.source,
+        })
+
+    @classmethod
+    def load(cls, cache_dir: str, mmap: bool = True) -> "ColumnStore":
+        with open(os.path.join(cache_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(os.path.join(cache_dir, VOCAB_NAME), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        merchant_index = None
+        index_path = os.path.join(cache_dir, MERCHANT_INDEX_NAME)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                merchant_index = MerchantIndex.from_dict(json.load(f))
+
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode=mode)
+            for name in cls.ARRAYS
+        }
+        return cls(arrays, vocab, manifest.get("source"), merchant_index)
+
+    @classmethod
+    def load_or_build(
+        cls,
+        meta_path: str,
+        cache_dir: str,
+        mmap: bool = True,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+    ) -> "ColumnStore":
+        """Reuse the on-disk columns when they match meta_path, else rebuild."""
+        source = source_stamp(meta_path)
+        manifest_path = os.path.join(cache_dir, MANIFEST_NAME)
+
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+                if manifest.get("format") == COLUMNS_FORMAT and manifest.get("source") == source:
+                    return cls.load(cache_dir, mmap=mmap)
+            except Exception as e:
+                print(f"[WARN] Column cache unreadable, rebuilding: {e}")
+
+        if metadata is None:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+
+        print(f"[INIT] Building column store ({len(metadata)} rows) → {cache_dir}")
+        store = cls.build(metadata, source)
+        try:
+            store.save(cache_dir)
+        except OSError as e:
+            print(f"[WARN] Could not persist column store ({e}); using in-memory columns.")
+            return store
+
+        return cls.load(cache_dir, mmap=mmap) if mmap else store
+
+    # -----------------------------------------------------------------
+    # Lookups
+    # -----------------------------------------------------------------
+    def category_codes(self, cats: List[str]) -> np.ndarray:
+        """Codes whose raw category contains any requested category name."""
+        key = tuple(sorted(c.lower() for c in cats))
+        codes = self._category_codes.get(key)
+        if codes is None:
+            codes = np.array(
+                [i for i, name in enumerate(self.categories)
+                 if any(c in name.lower() for c in key)],
+                dtype=np.int32,
+            )
+            self._category_codes[key] = codes
+        return codes
+
+    def monthly_rollup(self) -> "MonthlyRollup":
+        """Per-(year, month) debit aggregates, computed once per store."""
+        if self._monthly is None:
+            self._monthly = MonthlyRollup(self)
+        return self._monthly
+
+    def amount_index(self) -> "AmountIndex":
+        """Per-month debits sorted by size + quantile sketches, built once."""
+        if self._amounts is None:
+            self._amounts = AmountIndex(self)
+        return self._amounts
+
+    def apply_merchant_patches(
+        self, patches: Dict[str, Dict[str, Any]]
+    ) -> Tuple["ColumnStore", int]:
+        """
+        Copy of the store with enrichment patches (normalized merchant →
+        {merchant_name, merchant_type, cuisine}, see rag/merchant_patches.py)
+        applied to the merchant dictionary and the restaurant, cuisine and
+        restaurant-type columns. Patch keys resolve to merchant ids through
+        the merchant index, so one patch covers every spelling of the
+        merchant. Returns (store, rows patched); the store is self when
+        nothing matched. Untouched arrays are shared.
+        """
+        if self.merchant_index is None:
+            return self, 0
+        hits: Dict[int, Dict[str, Any]] = {}
+        for key, p in patches.items():
+            code = self.merchant_index.lookup(key)
+            if code is not None:
+                hits[code] = p
+        if not hits:
+            return self, 0
+
+        merchants = list(self.merchants)
+        index: Dict[str, int] = {}
+        for code, name in enumerate(merchants):
+            index.setdefault(name, code)
+        rtypes = list(self.rtypes)
+        rtype_index = {t: i for i, t in enumerate(rtypes)}
+
+        nm = len(merchants)
+        remap = np.arange(nm, dtype=np.int32)
+        is_rest = np.zeros(nm, dtype=bool)
+        bits = np.zeros(nm, dtype=np.uint32)
+        label = np.full(nm, -1, dtype=np.int32)
+        for code, p in hits.items():
+            # Enriched display name; rows of merchants that now share a
+            # name are merged into one code
+            name = p.get("merchant_name")
+            if name and name != merchants[code]:
+                target = index.get(name)
+                if target is None or target == code:
+                    merchants[code] = name
+                    index[name] = code
+                else:
+                    remap[code] = target
+            is_rest[code] = p.get("merchant_type") == "Restaurant"
+            cuisine = p.get("cuisine")
+            if cuisine:
+                record = {"restaurantType": cuisine}
+                bits[code] = sum(1 << b for b, c in enumerate(CUISINE_KEYWORDS)
+                                 if matches_cuisine(record, [c]))
+                if cuisine not in rtype_index:
+                    rtype_index[cuisine] = len(rtypes)
+                    rtypes.append(cuisine)
+                label[code] = rtype_index[cuisine]
+
+        rows = np.flatnonzero(np.isin(self.merchant, np.fromiter(hits, dtype=np.int32)))
+        codes = self.merchant[rows]
+
+        restaurant = np.array(self.restaurant)
+        restaurant[rows] |= is_rest[codes]
+        cuisine_mask = np.array(self.cuisine_mask)
+        cuisine_mask[rows] |= bits[codes]
+
+        # Restaurant-type labels only for rows that had none
+        offsets, flat = self.rtype_offsets, self.rtype_codes
+        counts = np.diff(offsets)
+        add = rows[(counts[rows] == 0) & (label[codes] >= 0)]
+        if len(add):
+            flat = np.insert(np.asarray(flat), np.asarray(offsets)[add], label[self.merchant[add]])
+            counts = counts.copy()
+            counts[add] = 1
+            offsets = np.zeros_like(np.asarray(offsets))
+            offsets[1:] = np.cumsum(counts)
+
+        merged = bool((remap != np.arange(nm)).any())
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        arrays.update(
+            merchant=remap[self.merchant] if merged else self.merchant,
+            restaurant=restaurant,
+            cuisine_mask=cuisine_mask,
+            rtype_offsets=offsets,
+            rtype_codes=flat,
+        )
+        store = ColumnStore(
+            arrays,
+            {"categories": self.categories, "merchants": merchants,
+             "raw_merchants": self.raw_merchants, "rtypes": rtypes},
+            self.source,
+            self.merchant_index,
+        )
+        store.patches = self.patches + 1
+        # Derived tables that do not depend on the patched columns
+        store._category_codes = self._category_codes
+        store._amounts = self._amounts
+        if not merged:
+            store._monthly = self._monthly
+        return store, len(rows)
+
+    def rtype_pairs(self, positions: np.ndarray, weights: np.ndarray):
+        """Expand selected rows into (restaurant-type code, weight) pairs."""
+        starts = self.rtype_offsets[positions]
+        counts = self.rtype_offsets[positions + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        # Index of every label slot: start of its row + offset within the row
+        row_start = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        idx = row_start + np.arange(total)
+        return self.rtype_codes[idx], np.repeat(weights, counts)
+
+
+class MonthlyRollup:
+    """
+    Debit spend aggregated by (year, month): overall, per category and per
+    merchant. Month-level questions (comparisons, trends) read a handful of
+    rows from these tables instead of rescanning the columns.
+
+    `months` holds the sorted ym keys (year * 12 + month - 1) present in
+    the data; every table is indexed by position in `months`.
+    """
+
+    def __init__(self, cols: ColumnStore):
+        valid = (cols.ym >= 0) & (cols.amount < 0)
+        ym = cols.ym[valid]
+        spend = -cols.amount[valid]
+
+        self.months, m = np.unique(ym, return_inverse=True)
+        k = len(self.months)
+        nc = len(cols.categories)
+        nm = len(cols.merchants)
+
+        self.total = np.bincount(m, weights=spend, minlength=k)
+        self.count = np.bincount(m, minlength=k)
+
+        cat_key = m * nc + cols.category[valid]
+        self.by_category = np.bincount(cat_key, weights=spend, minlength=k * nc).reshape(k, nc)
+        self.count_by_category = np.bincount(cat_key, minlength=k * nc).reshape(k, nc)
+
+        merch_key = m * nm + cols.merchant[valid]
+        self.by_merchant = np.bincount(merch_key, weights=spend, minlength=k * nm).reshape(k, nm)
+
+    def rows(self, yms: List[int]) -> np.ndarray:
+        """Table rows for the given ym keys (months without data are skipped)."""
+        yms = np.asarray(yms, dtype=self.months.dtype)
+        idx = np.searchsorted(self.months, yms)
+        inside = idx < len(self.months)
+        # A month without data lands on the next month's row: keep exact hits only
+        return idx[inside][self.months[idx[inside]] == yms[inside]]
+
+
+class AmountIndex:
+    """
+    Debits grouped by month (contiguous, since columns are date-sorted) and
+    sorted largest-first inside each month, plus a quantile sketch per month.
+
+    Top-N for a window only looks at the first N entries of each month;
+    "above $X" is a binary search per month; percentiles come from the
+    sketches, so none of them sorts the window at query time.
+    """
+
+    QUANTILES = np.linspace(0.0, 1.0, 101)
+
+    def __init__(self, cols: ColumnStore):
+        positions = np.flatnonzero((cols.ym >= 0) & (cols.amount < 0))
+        ym = cols.ym[positions]
+        spend = -cols.amount[positions]
+
+        self.months, starts = np.unique(ym, return_index=True)
+        self.bounds = np.append(starts, len(positions))
+        counts = np.diff(self.bounds)
+
+        month_idx = np.repeat(np.arange(len(self.months)), counts)
+        order = np.lexsort((-spend, month_idx))
+        self.positions = positions[order]
+        self.spend = spend[order]
+        self.counts = counts
+
+        self.sketches = np.array([
+            np.quantile(self.spend[b0:b1], self.QUANTILES)
+            for b0, b1 in zip(self.bounds[:-1], self.bounds[1:])
+        ]).reshape(len(self.months), len(self.QUANTILES))
+
+    def _month_rows(self, yms: List[int]) -> np.ndarray:
+        yms = np.asarray(yms, dtype=self.months.dtype)
+        idx = np.searchsorted(self.months, yms)
+        inside = idx < len(self.months)
+        return idx[inside][self.months[idx[inside]] == yms[inside]]
+
+    def top(self, yms: List[int], n: int) -> np.ndarray:
+        """Positions of the n largest debits in the window, largest first."""
+        slots = [np.arange(self.bounds[i], min(self.bounds[i] + n, self.bounds[i + 1]))
+                 for i in self._month_rows(yms)]
+        if not slots:
+            return np.empty(0, dtype=np.int64)
+        cand = np.concatenate(slots)
+        if len(cand) > n:
+            cand = cand[np.argpartition(-self.spend[cand], n - 1)[:n]]
+        cand = cand[np.argsort(-self.spend[cand], kind="stable")]
+        return self.positions[cand]
+
+    def above(self, yms: List[int], threshold: float) -> np.ndarray:
+        """Positions of every debit strictly above threshold, largest first."""
+        slots = []
+        for i in self._month_rows(yms):
+            b0, b1 = self.bounds[i], self.bounds[i + 1]
+            # spend is descending within the month → search on the negation
+            k = np.searchsorted(-self.spend[b0:b1], -threshold, side="left")
+            slots.append(np.arange(b0, b0 + k))
+        if not slots:
+            return np.empty(0, dtype=np.int64)
+        cand = np.concatenate(slots)
+        cand = cand[np.argsort(-self.spend[cand], kind="stable")]
+        return self.positions[cand]
+
+    def percentile(self, yms: List[int], p: float) -> Optional[float]:
+        """
+        Approximate p-th percentile of debit size over the window, merged
+        from the per-month sketches weighted by each month's count.
+        """
+        rows = self._month_rows(yms)
+        if not len(rows):
+            return None
+        if len(rows) == 1:
+            return float(np.interp(p / 100.0, self.QUANTILES, self.sketches[rows[0]]))
+
+        values = self.sketches[rows].ravel()
+        weights = np.repeat(self.counts[rows] / len(self.QUANTILES), len(self.QUANTILES))
+        order = np.argsort(values, kind="stable")
+        cdf = np.cumsum(weights[order])
+        cdf /= cdf[-1]
+        return float(np.interp(p / 100.0, cdf, values[order]))
+
+
+# ---------------------------------------------------------------------
+# Index location helpers
+# ---------------------------------------------------------------------
+def resolve_index_paths(base_dir: Optional[str] = None) -> Tuple[str, str]:
+    """(faiss.index, metadata.json) — supports both flat and nested layouts."""
+    base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+
+    flat_index = os.path.join(base_dir, "faiss.index")
+    flat_meta = os.path.join(base_dir, "metadata.json")
+    nested_index = os.path.join(base_dir, "index", "faiss.index")
+    nested_meta = os.path.join(base_dir, "index", "metadata.json")
+
+    index_path = flat_index if os.path.exists(flat_index) else nested_index
+    meta_path = flat_meta if os.path.exists(flat_meta) else nested_meta
+    return index_path, meta_path
+
+
+def column_cache_dir(index_path: str) -> str:
+    return os.path.join(os.path.dirname(index_path), "columns")
+
+
+def ensure_columns(base_dir: Optional[str] = None) -> None:
+    """Build the on-disk column cache if missing or stale (no model/index load)."""
+    index_path, meta_path = resolve_index_paths(base_dir)
+    ColumnStore.load_or_build(meta_path, column_cache_dir(index_path), mmap=True)
+
+
+def source_stamp(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    return {"path": os.path.basename(path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _write_json(path: str, payload: Any) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
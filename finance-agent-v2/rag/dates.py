@@ -0,0 +1,354 @@
+"""
+Date expressions → day ranges.
+
+The time window of a question is parsed once into a DateExpr (part of
+the QueryPlan) and compiled against an anchor day — the "as of" date —
+into a half-open [start_day, end_day) range of date ordinals. The column
+store is sorted by day, so every window is one contiguous slice of it,
+whether it was phrased as "June", "Q2 2025", "last 3 months",
+"between May and July", "this summer" or "so far in FY25".
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
+
+from rag.query_parsing import MONTH_LABELS, MONTHS
+
+# ---------------------------------------------------------------------
+# Fiscal year configuration
+# ---------------------------------------------------------------------
+# Fiscal years are named by the calendar year they end in: with
+# FISCAL_YEAR_START_MONTH=10, FY25 runs Oct 2024 – Sep 2025.
+FISCAL_YEAR_START_MONTH = int(os.getenv("FISCAL_YEAR_START_MONTH", "1"))
+# Window used when a question names no time period
+DEFAULT_FISCAL_YEAR = int(os.getenv("DEFAULT_FISCAL_YEAR", "2025"))
+# Fixed "today" (YYYY-MM-DD) for relative expressions; when unset the
+# retriever anchors on the last transaction date in the data.
+AS_OF_DATE = os.getenv("AS_OF_DATE", "")
+
+SEASONS = {
+    # name → (first month, months); winter starts in December of the prior year
+    "spring": (3, 3),
+    "summer": (6, 3),
+    "fall": (9, 3),
+    "autumn": (9, 3),
+    "winter": (12, 3),
+}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+
+ORDINAL_QUARTERS = {"first": 1, "second": 2, "third": 3, "fourth": 4}
+
+_MONTH = (
+    r"(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|"
+    r"aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+)
+_YEAR = r"(?:\s*,?\s*(\d{4}))?"
+
+_ISO_RANGE_RE = re.compile(
+    r"(\d{4}-\d{2}-\d{2})\s*(?:to|through|thru|until|and|-|–)\s*(\d{4}-\d{2}-\d{2})"
+)
+_MONTH_RANGE_RE = re.compile(
+    rf"\b(?:between\s+|from\s+)?{_MONTH}\b{_YEAR}\s*(?:and|to|through|thru|until|-|–)\s*{_MONTH}\b{_YEAR}"
+)
+_SINCE_RE = re.compile(rf"\bsince\s+{_MONTH}\b{_YEAR}")
+_FISCAL_RE = re.compile(r"\b(?:fy\s?'?(\d{4}|\d{2})|fiscal(?:\s+year)?\s+(\d{4}))\b")
+_SEASON_RE = re.compile(
+    r"\b(?:(this|last)\s+|((?:in|during|over)\s+(?:the\s+)?))?"
+    r"(spring|summer|fall|autumn|winter)\b(?:\s+(?:of\s+)?(\d{4}))?"
+)
+_QUARTER_RE = re.compile(r"\b(?:q([1-4])|(first|second|third|fourth)\s+quarter)\b(?:\s*,?\s*(?:of\s+)?(\d{4}))?")
+_TRAILING_RE = re.compile(
+    r"\b(?:last|past|previous|prior|trailing)\s+(\d{1,3}|" + "|".join(NUMBER_WORDS) +
+    r")\s+(day|week|month|quarter|year)s?\b"
+)
+_RELATIVE_RE = re.compile(
+    r"\b(this|current|last|previous|prior)\s+(fiscal\s+year|day|week|month|quarter|year)\b"
+)
+_TO_DATE_RE = re.compile(r"\b(?:ytd|year to date|to date|so far)\b")
+_MONTH_RE = re.compile(rf"\b{_MONTH}\b{_YEAR}")
+_YEAR_RE = re.compile(r"\b(?:in|for|during|of)\s+(\d{4})\b")
+
+
+# ---------------------------------------------------------------------
+# Calendar helpers
+# ---------------------------------------------------------------------
+def month_number(token: str) -> int:
+    return next(v for k, v in MONTHS.items() if k.startswith(token[:3]))
+
+
+def month_start(year: int, month: int) -> int:
+    """Ordinal of the first day of a month; month may run past 1..12."""
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, 1).toordinal()
+
+
+def add_months(day: int, months: int) -> int:
+    """Same day-of-month `months` later (clamped to the month's length)."""
+    d = date.fromordinal(day)
+    first = date.fromordinal(month_start(d.year, d.month + months))
+    last = date.fromordinal(month_start(first.year, first.month + 1) - 1)
+    return first.replace(day=min(d.day, last.day)).toordinal()
+
+
+def fiscal_year_range(fy: int) -> Tuple[int, int]:
+    """[start_day, end_day) of fiscal year fy."""
+    start_year = fy if FISCAL_YEAR_START_MONTH == 1 else fy - 1
+    start = month_start(start_year, FISCAL_YEAR_START_MONTH)
+    return start, month_start(start_year, FISCAL_YEAR_START_MONTH + 12)
+
+
+def fiscal_year_of(day: int) -> int:
+    d = date.fromordinal(day)
+    if FISCAL_YEAR_START_MONTH == 1 or d.month < FISCAL_YEAR_START_MONTH:
+        return d.year
+    return d.year + 1
+
+
+def fiscal_label(fy: int) -> str:
+    return f"FY{fy % 100:02d}"
+
+
+def default_year(month: int) -> int:
+    """Calendar year of `month` inside the default fiscal year."""
+    start, _ = fiscal_year_range(DEFAULT_FISCAL_YEAR)
+    first = date.fromordinal(start)
+    return first.year if month >= first.month else first.year + 1
+
+
+def anchor_from_env() -> Optional[int]:
+    if not AS_OF_DATE:
+        return None
+    try:
+        return date.fromisoformat(AS_OF_DATE).toordinal()
+    except ValueError:
+        print(f"[WARN] Ignoring invalid AS_OF_DATE={AS_OF_DATE!r}")
+        return None
+
+
+# ---------------------------------------------------------------------
+# Date expressions
+# ---------------------------------------------------------------------
+@dataclass(frozen=True)
+class DateExpr:
+    """
+    A parsed time window. Absolute windows carry start/end ordinals;
+    relative ones (unit set) are resolved against the anchor day by
+    compile(). to_date clips the end at the anchor.
+    """
+    label: str
+    start: Optional[int] = None
+    end: Optional[int] = None
+    unit: str = ""      # "day" | "week" | "month" | "quarter" | "year" | "fiscal_year" | "season"
+    count: int = 0      # trailing units ("last 3 months"); 0 → a calendar unit
+    offset: int = 0     # calendar unit: 0 = current, 1 = previous
+    month: int = 0      # season: first month
+    to_date: bool = False
+    default: bool = False
+
+    def compile(self, anchor: int) -> Tuple[int, int]:
+        """[start_day, end_day) for this window as of the anchor day."""
+        today_end = anchor + 1
+
+        if not self.unit:
+            start = self.start
+            end = self.end if self.end is not None else today_end
+            if self.to_date:
+                end = min(end, today_end)
+            return start, end
+
+        if self.count:
+            if self.unit == "day":
+                return today_end - self.count, today_end
+            if self.unit == "week":
+                return today_end - 7 * self.count, today_end
+            months = {"month": 1, "quarter": 3, "year": 12}[self.unit] * self.count
+            return add_months(today_end, -months), today_end
+
+        d = date.fromordinal(anchor)
+        if self.unit == "day":
+            start, end = anchor - self.offset, anchor - self.offset + 1
+        elif self.unit == "week":
+            monday = anchor - d.weekday()
+            start, end = monday - 7 * self.offset, monday - 7 * self.offset + 7
+        elif self.unit == "month":
+            start = month_start(d.year, d.month - self.offset)
+            end = month_start(d.year, d.month - self.offset + 1)
+        elif self.unit == "quarter":
+            first = (d.month - 1) // 3 * 3 + 1 - 3 * self.offset
+            start, end = month_start(d.year, first), month_start(d.year, first + 3)
+        elif self.unit == "year":
+            start = month_start(d.year - self.offset, 1)
+            end = month_start(d.year - self.offset + 1, 1)
+        elif self.unit == "fiscal_year":
+            start, end = fiscal_year_range(fiscal_year_of(anchor) - self.offset)
+        else:  # season: "this" = latest started, "last" = latest finished
+            year = d.year if month_start(d.year, self.month) <= anchor else d.year - 1
+            if self.offset and month_start(year, self.month + 3) > anchor:
+                year -= 1
+            start = month_start(year, self.month)
+            end = month_start(year, self.month + 3)
+
+        return start, min(end, today_end)
+
+
+def default_window() -> DateExpr:
+    start, end = fiscal_year_range(DEFAULT_FISCAL_YEAR)
+    return DateExpr(label=fiscal_label(DEFAULT_FISCAL_YEAR), start=start, end=end, default=True)
+
+
+def _count(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def _explicit_year(text: str) -> Optional[int]:
+    years = re.findall(r"\b(\d{4})\b", text)
+    return int(years[0]) if years else None
+
+
+def _fiscal_year(text: str) -> Optional[int]:
+    m = _FISCAL_RE.search(text)
+    if not m:
+        return None
+    token = m.group(1) or m.group(2)
+    return int(token) if len(token) == 4 else 2000 + int(token)
+
+
+def _season(text: str) -> Optional[re.Match]:
+    """
+    First season mention. A bare "fall" is usually the verb ("did dining
+    fall in March"), so it only counts after this/last/in/during/over or
+    before a year.
+    """
+    for m in _SEASON_RE.finditer(text):
+        if m.group(3) != "fall" or m.group(1) or m.group(2) or m.group(4):
+            return m
+    return None
+
+
+def parse_window(text: str) -> DateExpr:
+    """
+    Time window of a lower-cased question. Most specific phrasing wins;
+    a question without one gets the default fiscal year.
+    """
+    to_date = bool(_TO_DATE_RE.search(text))
+    year = _explicit_year(text)
+    fy = _fiscal_year(text)
+
+    # 2025-03-01 to 2025-04-15
+    m = _ISO_RANGE_RE.search(text)
+    if m:
+        try:
+            start = date.fromisoformat(m.group(1)).toordinal()
+            end = date.fromisoformat(m.group(2)).toordinal() + 1
+        except ValueError:
+            # 2025-02-30: not a date; fall through to the other phrasings
+            print(f"[WARN] Ignoring invalid date range: {m.group(0)!r}")
+        else:
+            return DateExpr(label=f"{m.group(1)} – {m.group(2)}", start=start, end=end)
+
+    # between May and July 2025 / March to June
+    m = _MONTH_RANGE_RE.search(text)
+    if m:
+        m1, m2 = month_number(m.group(1)), month_number(m.group(3))
+        y2 = int(m.group(4)) if m.group(4) else (int(m.group(2)) if m.group(2) else (year or default_year(m2)))
+        y1 = int(m.group(2)) if m.group(2) else (y2 if m1 <= m2 else y2 - 1)
+        return DateExpr(
+            label=f"{MONTH_LABELS[m1]} {y1} – {MONTH_LABELS[m2]} {y2}",
+            start=month_start(y1, m1),
+            end=month_start(y2, m2 + 1),
+        )
+
+    # since March
+    m = _SINCE_RE.search(text)
+    if m:
+        mo = month_number(m.group(1))
+        y = int(m.group(2)) if m.group(2) else (year or default_year(mo))
+        return DateExpr(label=f"since {MONTH_LABELS[mo]} {y}", start=month_start(y, mo), to_date=True)
+
+    # this summer / FY25 summer / summer 2025
+    m = _season(text)
+    if m:
+        name = m.group(3)
+        first, _ = SEASONS[name]
+        y = int(m.group(4)) if m.group(4) else (year or fy)
+        if y is not None:
+            start_year = y - 1 if first == 12 else y
+            return DateExpr(
+                label=f"{name} {y}",
+                start=month_start(start_year, first),
+                end=month_start(start_year, first + 3),
+            )
+        return DateExpr(label=f"{m.group(1) or 'this'} {name}", unit="season", month=first,
+                        offset=1 if m.group(1) == "last" else 0)
+
+    # Q2 / Q2 2025 / second quarter
+    quarters = _QUARTER_RE.findall(text)
+    if quarters:
+        spans = []
+        for qn, word, qy in quarters:
+            n = int(qn) if qn else ORDINAL_QUARTERS[word]
+            y = int(qy) if qy else (year or default_year(n * 3))
+            spans.append((month_start(y, (n - 1) * 3 + 1), month_start(y, n * 3 + 1), f"Q{n} {y}"))
+        return DateExpr(
+            label=spans[0][2] if len(spans) == 1 else f"{spans[0][2]} – {spans[-1][2]}",
+            start=min(s for s, _, _ in spans),
+            end=max(e for _, e, _ in spans),
+        )
+
+    # last 3 months / past 30 days
+    m = _TRAILING_RE.search(text)
+    if m:
+        n = _count(m.group(1))
+        unit = m.group(2)
+        return DateExpr(label=f"the last {n} {unit}{'s' if n != 1 else ''}", unit=unit, count=n)
+
+    # FY25 / fiscal 2025 (optionally "to date")
+    if fy is not None:
+        start, end = fiscal_year_range(fy)
+        label = fiscal_label(fy) + (" to date" if to_date else "")
+        return DateExpr(label=label, start=start, end=end, to_date=to_date)
+
+    # this quarter / last month / this fiscal year
+    m = _RELATIVE_RE.search(text)
+    if m:
+        which, unit = m.group(1), m.group(2)
+        unit = "fiscal_year" if unit.startswith("fiscal") else unit
+        offset = 0 if which in ("this", "current") else 1
+        return DateExpr(label=f"{'this' if offset == 0 else 'last'} {unit.replace('_', ' ')}",
+                        unit=unit, offset=offset)
+    if re.search(r"\btoday\b", text):
+        return DateExpr(label="today", unit="day")
+    if re.search(r"\byesterday\b", text):
+        return DateExpr(label="yesterday", unit="day", offset=1)
+
+    # June / June 2025 / January and February (spanning every month named)
+    months: List[Tuple[int, int]] = []
+    for token, y in _MONTH_RE.findall(text):
+        mo = month_number(token)
+        months.append((int(y) if y else (year or default_year(mo)), mo))
+    if months and not to_date:
+        first, last = min(months), max(months)
+        label = f"{MONTH_LABELS[first[1]]} {first[0]}"
+        if last != first:
+            label += f" – {MONTH_LABELS[last[1]]} {last[0]}"
+        return DateExpr(label=label, start=month_start(*first), end=month_start(last[0], last[1] + 1))
+
+    # ytd / year to date / so far → fiscal year containing the anchor
+    if to_date:
+        return DateExpr(label="this fiscal year to date", unit="fiscal_year")
+
+    # in 2024
+    m = _YEAR_RE.search(text)
+    if m:
+        y = int(m.group(1))
+        return DateExpr(label=str(y), start=month_start(y, 1), end=month_start(y + 1, 1))
+
+    return default_window()
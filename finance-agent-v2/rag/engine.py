@@ -0,0 +1,205 @@
+"""
+Query engine selection.
+
+QUERY_ENGINE=inline (default)
+    A RetrieverRegistry of per-tenant RAGRetrievers in the API process.
+
+QUERY_ENGINE=process
+    A pool of QUERY_ENGINE_WORKERS processes, each with its own
+    RetrieverRegistry whose retrievers attach to the shared memory-mapped
+    column stores and FAISS files. The API process never loads the
+    model, index or metadata; it only routes questions and formats
+    handler output, so pure-Python and NumPy work scales with cores
+    while the data is paged in once.
+
+Either way create_registry() returns an object with get(tenant),
+prefetch(tenant), stats() and shutdown().
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+from rag.query_parsing import QueryParsingMixin
+from rag.query_plan import QueryPlan
+from rag.registry import DEFAULT_TENANT, RetrieverRegistry, UnknownTenant, tenant_dir
+from rag.timing import Trace, activate, current_trace
+
+QUERY_ENGINE = os.getenv("QUERY_ENGINE", "inline").lower()
+QUERY_ENGINE_WORKERS = int(os.getenv("QUERY_ENGINE_WORKERS", str(os.cpu_count() or 1)))
+
+
+# ---------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------
+_worker_registry = None
+
+
+def _load_mmap_retriever(index_dir: Optional[str]):
+    from rag.retriever_v2 import RAGRetriever
+    return RAGRetriever(index_dir=index_dir, mmap=True)
+
+
+def _init_worker():
+    """Runs once in every pool process: keep each worker single-threaded."""
+    global _worker_registry
+
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    import faiss
+
+    faiss.omp_set_num_threads(1)
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except Exception:
+        pass
+
+    _worker_registry = RetrieverRegistry(_load_mmap_retriever)
+    try:
+        _worker_registry.get(DEFAULT_TENANT)
+    except UnknownTenant:
+        pass
+
+
+def _call(tenant: str, method: str, *args, **kwargs):
+    """Run a retriever method; returns (result, stage spans) for the caller's trace."""
+    trace = Trace()
+    with activate(trace):
+        result = getattr(_worker_registry.get(tenant), method)(*args, **kwargs)
+    return result, trace.spans
+
+
+def _warm(tenant: str) -> None:
+    _worker_registry.get(tenant)
+
+
+def _worker_stats() -> Dict[str, Any]:
+    return {"pid": os.getpid(), **_worker_registry.stats()}
+
+
+# ---------------------------------------------------------------------
+# API-process proxy
+# ---------------------------------------------------------------------
+class ProcessRetriever(QueryParsingMixin):
+    """
+    Drop-in stand-in for one tenant's RAGRetriever that forwards the
+    public query methods to the process pool. Question-parsing helpers
+    run locally.
+    """
+
+    metadata: List[Dict[str, Any]] = []
+
+    def __init__(self, pool: ProcessPoolExecutor, tenant: str = DEFAULT_TENANT):
+        self.pool = pool
+        self.tenant = tenant
+
+    # Questions may be passed as QueryPlans: they pickle as plain data, so
+    # workers reuse the API process's parse instead of redoing it.
+    def _submit(self, method: str, *args, **kwargs):
+        result, spans = self.pool.submit(_call, self.tenant, method, *args, **kwargs).result()
+        trace = current_trace()
+        if trace is not None:
+            trace.extend(spans)
+        return result
+
+    def query(self, question: Union[str, QueryPlan], top_k: int = 300) -> Dict[str, Any]:
+        return self._submit("query", question, top_k=top_k)
+
+    def aggregate(self, question: Union[str, QueryPlan], **spec) -> Dict[str, Any]:
+        return self._submit("aggregate", question, **spec)
+
+    def get_restaurant_spend(self, question: Union[str, QueryPlan]) -> Dict[str, Any]:
+        return self._submit("get_restaurant_spend", question)
+
+    def compare_periods(self, question: Union[str, QueryPlan], top_n: int = 5) -> Dict[str, Any]:
+        return self._submit("compare_periods", question, top_n=top_n)
+
+    def large_purchases(self, question: Union[str, QueryPlan], top_n: int = 10) -> Dict[str, Any]:
+        return self._submit("large_purchases", question, top_n=top_n)
+
+    def recurring_merchants(self, question: Union[str, QueryPlan]) -> Dict[str, Any]:
+        return self._submit("recurring_merchants", question)
+
+
+class ProcessRegistry:
+    """
+    API-process side of QUERY_ENGINE=process: hands out tenant-bound
+    ProcessRetriever proxies over one worker pool. Loading and LRU
+    eviction happen inside each worker's own RetrieverRegistry.
+    """
+
+    def __init__(self, workers: int = QUERY_ENGINE_WORKERS):
+        self.workers = max(1, workers)
+        self._proxies: Dict[str, ProcessRetriever] = {}
+        self._lock = threading.Lock()
+
+        # Build (or validate) the default column cache up front so the
+        # workers all attach to the same files instead of racing to build.
+        try:
+            self._ensure_columns(DEFAULT_TENANT)
+        except UnknownTenant:
+            pass
+
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        print(f"[INIT] Query engine: {self.workers} worker processes (mmap)")
+
+    @staticmethod
+    def _ensure_columns(tenant: str) -> None:
+        from rag.columns import ensure_columns
+        ensure_columns(tenant_dir(tenant))
+
+    def get(self, tenant: Optional[str] = None) -> ProcessRetriever:
+        tenant = tenant or DEFAULT_TENANT
+        with self._lock:
+            proxy = self._proxies.get(tenant)
+        if proxy is None:
+            self._ensure_columns(tenant)
+            with self._lock:
+                proxy = self._proxies.setdefault(tenant, ProcessRetriever(self.pool, tenant))
+        return proxy
+
+    def prefetch(self, tenant: Optional[str] = None) -> bool:
+        """Warm one worker for the tenant (the others load on first use)."""
+        tenant = tenant or DEFAULT_TENANT
+        self.get(tenant)
+        self.pool.submit(_warm, tenant)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-worker registry stats (best effort: sampled across the pool)."""
+        futures = [self.pool.submit(_worker_stats) for _ in range(self.workers)]
+        workers = {}
+        for f in futures:
+            try:
+                st = f.result(timeout=5)
+            except Exception:
+                continue
+            workers[st["pid"]] = st
+        return {
+            "mode": "process",
+            "workers": list(workers.values()),
+            "resident_bytes": sum(w["resident_bytes"] for w in workers.values()),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.pool.shutdown(wait=wait)
+
+
+def _load_retriever(index_dir: Optional[str]):
+    from rag.retriever_v2 import RAGRetriever
+    return RAGRetriever(index_dir=index_dir)
+
+
+def create_registry():
+    """Per-tenant retrievers for FinanceAgent according to QUERY_ENGINE."""
+    if QUERY_ENGINE == "process":
+        return ProcessRegistry()
+    return RetrieverRegistry(_load_retriever)
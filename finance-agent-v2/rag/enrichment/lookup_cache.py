@@ -0,0 +1,149 @@
+"""
+lookup_cache.py
+-------------------------------------
+On-disk cache of external merchant lookups (Google Places, Yelp, LLM
+inference), keyed by source + normalized merchant name + ZIP/region.
+
+Each entry keeps the raw API result and the classification derived from
+it. Negative results ("no match", "not a restaurant") are cached too —
+those merchants never reach bian.merchants, so without the cache every
+run would pay for them again. Entries expire after ENRICH_CACHE_TTL_DAYS
+(ENRICH_CACHE_NEGATIVE_TTL_DAYS for misses, so new businesses are picked
+up sooner). Errors are never cached.
+
+SQLite in WAL mode; one connection shared by the lookup threads behind a
+lock.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+ENRICH_CACHE_PATH = os.getenv(
+    "ENRICH_CACHE_PATH", str(Path(__file__).parent / ".lookup_cache.sqlite"))
+ENRICH_CACHE_TTL_DAYS = float(os.getenv("ENRICH_CACHE_TTL_DAYS", "30"))
+ENRICH_CACHE_NEGATIVE_TTL_DAYS = float(os.getenv("ENRICH_CACHE_NEGATIVE_TTL_DAYS", "7"))
+ENRICH_CACHE_DISABLED = os.getenv("ENRICH_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lookups (
+    source  TEXT NOT NULL,
+    key     TEXT NOT NULL,
+    zip     TEXT NOT NULL,
+    found   INTEGER NOT NULL,
+    raw     TEXT,
+    result  TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (source, key, zip)
+)
+"""
+
+MISS = object()
+
+
+def cache_key(name: str) -> str:
+    """Spelling-insensitive merchant key: "Joe's Pizza #12" → "JOES PIZZA 12"."""
+    s = re.sub(r"[^A-Za-z0-9 ]+", "", name or "").upper()
+    return re.sub(r"\s+", " ", s).strip()
+
+
+class LookupCache:
+    def __init__(self, path: str = ENRICH_CACHE_PATH,
+                 ttl_days: float = ENRICH_CACHE_TTL_DAYS,
+                 negative_ttl_days: float = ENRICH_CACHE_NEGATIVE_TTL_DAYS,
+                 enabled: bool = not ENRICH_CACHE_DISABLED):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        if enabled:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(SCHEMA)
+            self._db.commit()
+            self.prune()
+
+    def get(self, source: str, name: str, zip_code: str = ""):
+        """Cached classification, or MISS (None is a cached negative result)."""
+        if not self.enabled:
+            return MISS
+        with self._lock:
+            row = self._db.execute(
+                "SELECT found, result, created FROM lookups WHERE source=? AND key=? AND zip=?",
+                (source, cache_key(name), zip_code or ""),
+            ).fetchone()
+            if row is None or time.time() - row[2] > (self.ttl if row[0] else self.negative_ttl):
+                self.misses += 1
+                return MISS
+            self.hits += 1
+            if not row[0]:
+                self.negative_hits += 1
+            return json.loads(row[1]) if row[1] is not None else None
+
+    def put(self, source: str, name: str, zip_code: str = "", raw=None, result=None, found=None):
+        """
+        Store a lookup. found defaults to "result is not None"; pass it
+        explicitly when a result exists but means "no" (e.g. not a
+        restaurant), so it gets the negative TTL.
+        """
+        if not self.enabled:
+            return
+        if found is None:
+            found = result is not None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO lookups (source, key, zip, found, raw, result, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (source, cache_key(name), zip_code or "", int(bool(found)),
+                 json.dumps(raw, default=str) if raw is not None else None,
+                 json.dumps(result, default=str) if result is not None else None,
+                 time.time()),
+            )
+            self._db.commit()
+            self.writes += 1
+
+    def prune(self) -> int:
+        """Drop expired entries."""
+        if not self.enabled:
+            return 0
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM lookups WHERE (found = 1 AND created < ?) OR (found = 0 AND created < ?)",
+                (now - self.ttl, now - self.negative_ttl),
+            )
+            self._db.commit()
+            return cur.rowcount
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"🗃 Lookup cache: {s['hits']} hits ({s['negative_hits']} negative), "
+                f"{s['misses']} misses, hit ratio {s['hit_ratio']:.0%}")
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+                self.enabled = False
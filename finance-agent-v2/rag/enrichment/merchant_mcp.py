@@ -6,19 +6,52 @@ merchant_google_enrichment.py
 3. Identifies restaurants and infers cuisine type
 4. Updates Neon merchants table
 5. Skips merchants outside the beta region (ZIP filter)
+
+Places lookups run in a thread pool (ENRICH_CONCURRENCY) behind a token
+bucket sized to the Places quota (PLACES_QPS / PLACES_BURST), with
+jittered exponential backoff on 429/5xx/OVER_QUERY_LIMIT/UNKNOWN_ERROR;
+any other error status fails the lookup uncached. Upserts stay on
+the main thread. Finished merchants are checkpointed to ENRICH_CHECKPOINT
+so an interrupted run resumes where it stopped; the file is removed after
+a complete run.
+
+Lookups (hits, misses and non-restaurants) are cached on disk by
+lookup_cache.py, so re-runs only call Places for new or expired names.
+
+Transactions are grouped by canonical merchant id (rag/merchant_index.py),
+so spellings of one merchant ("KROGER #569", "KROGER #587") share a
+lookup. Stored merchants are also appended to the merchant patch feed
+(rag/merchant_patches.py), which running retrievers apply to their
+restaurant/cuisine columns without a rebuild.
+
+Local testing: run rag/enrichment/stub_places.py and point
+PLACES_API_URL at it.
 """
 
+import sys
+from pathlib import Path
+
+# Run as a script from rag/enrichment/ (or imported from elsewhere): make
+# this folder's modules and the project packages importable
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(1, str(Path(__file__).resolve().parents[2]))
+
 import os
-import re
 import json
+import random
+import threading
+import time
 import requests
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from urllib.parse import urlencode
-from dotenv import load_dotenv
-from pathlib import Path
+from psycopg2.extras import RealDictCursor, execute_values
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
 from dotenv import load_dotenv
-import os
+from lookup_cache import MISS, LookupCache
+from rag.http_client import session, stats as http_stats
+from rag.merchant_index import MerchantIndex
+from rag.merchant_patches import append_patches, normalize_merchant
+from rag.transaction_sync import TransactionSync
 # ---------------------------------------------
 # 1. LOAD ENVIRONMENT VARIABLES
 # ---------------------------------------------
@@ -26,7 +59,8 @@ import os
 # 1. LOAD ENVIRONMENT VARIABLES (explicit .env path)
 # ---------------------------------------------
 env_path = Path(__file__).parent / ".env"
-load_dotenv(dotenv_path=env_path, override=True)
+# Under the enrichment MCP job runner, the job's settings win over .env
+load_dotenv(dotenv_path=env_path, override=not os.getenv("ENRICH_JOB_ID"))
 print(f"🔹 Loaded .env from {env_path.resolve()}")
 
 # --- Read environment variables ---
@@ -37,7 +71,22 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 ZIP_CODE = os.getenv("ZIP_CODE", "93021")
 ENRICH_CATEGORIES = os.getenv("ENRICH_CATEGORIES", "Food & Drink").split(",")
 HOME_ZIPCODES = [z.strip() for z in os.getenv("HOME_ZIPCODES", "93021").split(",")]
-TXN_SINCE_DAYS = int(os.getenv("TXN_SINCE_DAYS", "7"))
+TXN_SINCE_DAYS = int(os.getenv("TXN_SINCE_DAYS", "7"))  # overlap of since= delta fetches
+ENRICH_FULL_SCAN = os.getenv("ENRICH_FULL_SCAN", "").lower() in ("1", "true", "yes")
+
+# --- Places lookups: parallelism, quota, retries, checkpoints ---
+PLACES_API_URL = os.getenv(
+    "PLACES_API_URL", "https://maps.googleapis.com/maps/api/place/findplacefromtext/json")
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "8"))
+PLACES_QPS = float(os.getenv("PLACES_QPS", "10"))            # 0 = unlimited
+PLACES_BURST = float(os.getenv("PLACES_BURST", str(max(1.0, PLACES_QPS))))
+PLACES_MAX_RETRIES = int(os.getenv("PLACES_MAX_RETRIES", "4"))
+PLACES_BACKOFF_BASE = float(os.getenv("PLACES_BACKOFF_BASE", "0.5"))  # seconds
+PLACES_BACKOFF_MAX = float(os.getenv("PLACES_BACKOFF_MAX", "30"))
+ENRICH_CHECKPOINT = os.getenv(
+    "ENRICH_CHECKPOINT", str(Path(__file__).parent / ".enrich_checkpoint.json"))
+CHECKPOINT_EVERY = int(os.getenv("ENRICH_CHECKPOINT_EVERY", "25"))
+ENRICH_UPSERT_BATCH = int(os.getenv("ENRICH_UPSERT_BATCH", "200"))
 
 # --- Validate required vars ---
 REQUIRED = ["DB_CONN", "TRANSACTION_API_BASE", "GOOGLE_API_KEY"]
@@ -62,8 +111,8 @@ print("TRANSACTION_API_BASE_URL =", os.getenv("TRANSACTION_API_BASE_URL"))
 # 2. HELPER FUNCTIONS
 # ---------------------------------------------
 def normalize_name(name: str) -> str:
-    """Normalize merchant name for deduplication."""
-    return re.sub(r"[^A-Za-z0-9 ]+", "", name or "").strip().upper()
+    """Normalize merchant name for deduplication (same key the retriever patches by)."""
+    return normalize_merchant(name)
 
 def db():
     """Connect to Postgres (Neon) with autocommit enabled."""
@@ -71,29 +120,28 @@ def db():
     conn.autocommit = True  # ✅ ensures all inserts/updates are immediately saved
     return conn
 
+transaction_sync = None
+
 def fetch_transactions():
-    """Fetch all transactions (or by category if API supports it)."""
-    global TRANSACTION_API_BASE, TRANSACTION_API_KEY, ENRICH_CATEGORIES
+    """
+    New or changed transactions since the last complete run (all of them
+    with ENRICH_FULL_SCAN), in the enrichment categories. The sync
+    watermark only advances once main() finishes without failures.
+    """
+    global TRANSACTION_API_BASE, TRANSACTION_API_KEY, ENRICH_CATEGORIES, transaction_sync
 
-    category = ENRICH_CATEGORIES[0].strip()
-    # Default endpoint (no category filter)
     url = f"{TRANSACTION_API_BASE.rstrip('/')}/transactions"
     headers = {"Accept": "application/json"}
     if TRANSACTION_API_KEY:
         headers["Authorization"] = f"Bearer {TRANSACTION_API_KEY}"
 
-    print(f"\n📡 Fetching transactions from: {url}")
+    print(f"\n📡 Syncing transactions from: {url}")
 
     try:
-        r = requests.get(url, headers=headers, timeout=30)
-        r.raise_for_status()
-        txns = r.json()
-
-        if not isinstance(txns, list):
-            print("⚠️ Unexpected response:", r.text)
-            return []
-
-        print(f"✅ Retrieved {len(txns)} total transactions from API.")
+        transaction_sync = TransactionSync(url, name="enrichment", headers=headers)
+        result = transaction_sync.sync(save=False)
+        print(f"✅ {result.summary()}")
+        txns = result.rows if ENRICH_FULL_SCAN else result.changed
 
         # 🔍 Optional local filter (since API doesn’t support ?category=)
         filtered = [t for t in txns if t.get("category") in ENRICH_CATEGORIES]
@@ -125,11 +173,6 @@ def fetch_transactions():
         print(f"❌ Unexpected error: {e}")
         return []
 
-    data = r.json()
-    if isinstance(data, dict) and "items" in data:
-        data = data["items"]
-    return data
-
 def get_known_merchants(conn):
     """Return set of normalized merchant names already in DB."""
     with conn.cursor() as cur:
@@ -154,26 +197,116 @@ def is_in_beta_region(address: str) -> bool:
 # ---------------------------------------------
 # 3. GOOGLE PLACES LOOKUP
 # ---------------------------------------------
+class TokenBucket:
+    """Blocking token bucket: `rate` calls/s on average, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+places_bucket = TokenBucket(PLACES_QPS, PLACES_BURST)
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Places API statuses worth retrying ("UNKNOWN_ERROR: may succeed if you try again")
+RETRY_PLACES_STATUS = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+
+
+class PlacesRetryable(Exception):
+    """Transient Places failure (quota or server error)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PlacesError(RuntimeError):
+    """Places answered with an error status (REQUEST_DENIED, INVALID_REQUEST, ...)."""
+
+
+def backoff_delay(attempt: int, retry_after=None) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After."""
+    delay = random.uniform(0, min(PLACES_BACKOFF_MAX, PLACES_BACKOFF_BASE * 2 ** attempt))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def places_request(params):
+    """GET the Places endpoint under the rate limit, retrying transient failures."""
+    for attempt in range(PLACES_MAX_RETRIES + 1):
+        places_bucket.acquire()
+        try:
+            # Own retry loop (rate-limited per attempt): no client-level retries
+            r = session("places", retries=0).get(PLACES_API_URL, params=params, timeout=10)
+            if r.status_code in RETRY_STATUS:
+                retry_after = r.headers.get("Retry-After")
+                raise PlacesRetryable(
+                    f"HTTP {r.status_code}",
+                    float(retry_after) if retry_after and retry_after.isdigit() else None,
+                )
+            r.raise_for_status()
+            data = r.json()
+            if data.get("status") in RETRY_PLACES_STATUS:
+                raise PlacesRetryable(data["status"])
+            return data
+        except (PlacesRetryable, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt == PLACES_MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt, getattr(e, "retry_after", None))
+            print(f"🔁 Places retry {attempt + 1}/{PLACES_MAX_RETRIES} in {delay:.2f}s ({e})")
+            time.sleep(delay)
+
+
+lookup_cache = LookupCache()
+
 def find_place(merchant_name, zip_code):
-    """Find merchant info using Google Places API."""
+    """Find merchant info using Google Places API (cached, misses included)."""
+    cached = lookup_cache.get("places", merchant_name, zip_code)
+    if cached is not MISS:
+        return cached
+
     query = f"{merchant_name} {zip_code}"
-    url = "https://maps.googleapis.com/maps/api/place/findplacefromtext/json"
     params = {
         "input": query,
         "inputtype": "textquery",
         "fields": "name,formatted_address,types,rating,place_id",
         "key": GOOGLE_API_KEY
     }
-    r = requests.get(url, params=params, timeout=10)
-    r.raise_for_status()
-    data = r.json()
+    data = places_request(params)
+    status = data.get("status")
+    if status == "ZERO_RESULTS":
+        # A real "no match": cached as a negative
+        lookup_cache.put("places", merchant_name, zip_code, raw={"status": status})
+        return None
+    if status != "OK":
+        # Key, quota or request problems are not answers: never cached
+        message = data.get("error_message")
+        raise PlacesError(f"Places status {status}" + (f": {message}" if message else ""))
     candidates = data.get("candidates", [])
     if not candidates:
         return None
     c = candidates[0]
     types = c.get("types", [])
     merchant_type, cuisine = derive_restaurant_type(types, merchant_name)
-    return {
+    rec = {
         "merchant_name": c.get("name", merchant_name),
         "normalized_name": normalize_name(c.get("name", merchant_name)),
         "merchant_address": c.get("formatted_address"),
@@ -183,6 +316,10 @@ def find_place(merchant_name, zip_code):
         "cuisine": cuisine,
         "enrichment_status": "enriched"
     }
+    # Non-restaurants are negative results: they expire on the shorter TTL
+    lookup_cache.put("places", merchant_name, zip_code, raw=c, result=rec,
+                     found=merchant_type == "Restaurant")
+    return rec
 
 def derive_restaurant_type(types, name):
     """Infer restaurant type/cuisine from name and Google 'types'."""
@@ -212,8 +349,7 @@ def derive_restaurant_type(types, name):
 # ---------------------------------------------
 # 4. UPSERT INTO DATABASE
 # ---------------------------------------------
-def upsert_merchant(conn, rec):
-    sql = """
+UPSERT_SQL = """
     INSERT INTO bian.merchants (
         merchant_name,
         normalized_name,
@@ -224,7 +360,7 @@ def upsert_merchant(conn, rec):
         enrichment_status,
         created_at
     )
-    VALUES (%s,%s,%s,%s,%s,%s,%s,NOW())
+    VALUES %s
     ON CONFLICT (normalized_name)
     DO UPDATE SET
         merchant_name = EXCLUDED.merchant_name,
@@ -233,76 +369,261 @@ def upsert_merchant(conn, rec):
         google_types = EXCLUDED.google_types,
         rating = EXCLUDED.rating,
         enrichment_status = EXCLUDED.enrichment_status;
+"""
+UPSERT_TEMPLATE = "(%s,%s,%s,%s,%s,%s,%s,NOW())"
+
+def merchant_row(rec):
+    return (
+        rec.get("merchant_name"),
+        rec.get("normalized_name"),
+        rec.get("merchant_type"),
+        rec.get("merchant_address"),
+        json.dumps(rec.get("google_types")),
+        rec.get("rating"),
+        rec.get("enrichment_status", "enriched"),
+    )
+
+class MerchantWriter:
+    """
+    Buffers merchant records and upserts them ENRICH_UPSERT_BATCH at a
+    time with execute_values (one round-trip per batch on the autocommit
+    connection). A batch that fails is split in halves and retried, so a
+    bad row costs a few extra statements and is reported on its own while
+    the rest of its batch is still written.
+
+    Works against any Postgres with a bian.merchants table (point DB_CONN
+    at a local one to try it).
     """
-    try:
-        with conn.cursor() as cur:
-            cur.execute(
-                sql,
-                (
-                    rec.get("merchant_name"),
-                    rec.get("normalized_name"),
-                    rec.get("merchant_type"),
-                    rec.get("merchant_address"),
-                    json.dumps(rec.get("google_types")),
-                    rec.get("rating"),
-                    rec.get("enrichment_status", "enriched"),
-                ),
-            )
-        conn.commit()
-        print(f"✅ DB commit confirmed for merchant: {rec.get('merchant_name')}")
 
-    except Exception as e:
-        conn.rollback()
-        print(f"❌ Error processing {rec.get('merchant_name')}: {e}")
-        print("🧾 Record content:", json.dumps(rec, indent=2, default=str))
+    def __init__(self, conn, batch_size: int = ENRICH_UPSERT_BATCH):
+        self.conn = conn
+        self.batch_size = max(1, batch_size)
+        self.buffer = {}        # normalized_name → record (last one wins)
+        self.written = 0
+        self.statements = 0
+        self.failed = []        # records that could not be written
+
+    def add(self, rec):
+        # A batch may not touch the same key twice (ON CONFLICT limitation)
+        self.buffer[rec.get("normalized_name")] = rec
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered."""
+        recs = list(self.buffer.values())
+        self.buffer = {}
+        if recs:
+            before = len(self.failed)
+            self._write(recs)
+            print(f"💾 Upserted {len(recs) - (len(self.failed) - before)}/{len(recs)} merchants "
+                  f"({self.statements} statements so far)")
+
+    def take_failed(self):
+        """Records that failed since the last call."""
+        failed, self.failed = self.failed, []
+        return failed
+
+    def _write(self, recs):
+        try:
+            with self.conn.cursor() as cur:
+                self.statements += 1
+                execute_values(cur, UPSERT_SQL, [merchant_row(r) for r in recs],
+                               template=UPSERT_TEMPLATE, page_size=len(recs))
+            self.written += len(recs)
+        except Exception as e:
+            if not self.conn.autocommit:
+                self.conn.rollback()
+            if len(recs) == 1:
+                self.failed.append(recs[0])
+                print(f"❌ Error processing {recs[0].get('merchant_name')}: {e}")
+                print("🧾 Record content:", json.dumps(recs[0], indent=2, default=str))
+                return
+            mid = len(recs) // 2
+            self._write(recs[:mid])
+            self._write(recs[mid:])
+
+def upsert_merchant(conn, rec):
+    """Write a single merchant immediately."""
+    writer = MerchantWriter(conn, batch_size=1)
+    writer.add(rec)
+    return not writer.take_failed()
 
 # ---------------------------------------------
-# 5. MAIN ENRICHMENT LOGIC
+# 5. CHECKPOINTS
 # ---------------------------------------------
+def load_checkpoint() -> set:
+    """Normalized names finished by an interrupted earlier run."""
+    try:
+        with open(ENRICH_CHECKPOINT, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return set()
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Ignoring unreadable checkpoint {ENRICH_CHECKPOINT}: {e}")
+        return set()
+    if data.get("zip") != ZIP_CODE:
+        print(f"⚠️ Ignoring checkpoint for ZIP {data.get('zip')} (running {ZIP_CODE}).")
+        return set()
+    done = set(data.get("done", []))
+    print(f"♻️ Resuming from checkpoint: {len(done)} merchants already processed.")
+    return done
+
+def save_checkpoint(done: set):
+    tmp = f"{ENRICH_CHECKPOINT}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"zip": ZIP_CODE, "updated": time.time(), "done": sorted(done)}, f)
+    os.replace(tmp, ENRICH_CHECKPOINT)
+
+def clear_checkpoint():
+    try:
+        os.remove(ENRICH_CHECKPOINT)
+    except FileNotFoundError:
+        pass
+
+# ---------------------------------------------
+# 6. MAIN ENRICHMENT LOGIC
+# ---------------------------------------------
+def apply_result(writer, name, rec) -> bool:
+    """Filter one lookup result and queue it for upsert; True when queued."""
+    if not rec:
+        print(f"⚠️  No Google match for {name}")
+        return False
+
+    # Beta region filter
+    if not is_in_beta_region(rec.get("merchant_address", "")):
+        print(f"🌐 Skipping {name} — outside beta ZIP region.")
+        return False
+
+    if rec["merchant_type"] == "Restaurant":
+        writer.add(rec)
+        print(f"✅ Added {rec['merchant_name']} ({rec.get('cuisine') or 'Unknown'})")
+        return True
+    print(f"⚠️  {name} not identified as restaurant.")
+    return False
+
+def group_by_merchant(txns, skip):
+    """
+    Distinct merchants to look up: merchant id → (display name,
+    transactions, normalized names of its spellings). Ids come from a
+    MerchantIndex over this run's descriptions. Merchants with any
+    spelling in `skip` (already in the DB or checkpointed) are dropped.
+    Returns the groups and the number of named transactions.
+    """
+    named = [txn for txn in txns if txn.get("description")]
+    index = MerchantIndex.build(txn["description"] for txn in named)
+    groups = {}
+    for txn in named:
+        mid = index.aliases[txn["description"]]
+        if mid not in groups:
+            groups[mid] = (index.names[mid], [], set())
+        groups[mid][1].append(txn)
+        groups[mid][2].add(normalize_name(txn["description"]))
+    return {mid: g for mid, g in groups.items() if not g[2] & skip}, len(named)
+
 def main():
     print("🚀 Starting Merchant Enrichment (Beta Mode)")
     print(f"🔹 Home ZIPs: {HOME_ZIPCODES}")
     print(f"🔹 Category: {ENRICH_CATEGORIES}")
+    print(f"🔹 Concurrency: {ENRICH_CONCURRENCY} | Places rate: {PLACES_QPS or 'unlimited'}/s")
     txns = fetch_transactions()
+    done = load_checkpoint()
 
-    with db() as conn:
+    # closing(), not "with conn": since psycopg2 2.9 that opens a transaction
+    # even in autocommit, and one failed upsert would abort every later one
+    with closing(db()) as conn:
         known = get_known_merchants(conn)
-        added = 0
+        added = failed = covered = 0
         print(f"💾 {len(known)} merchants already in DB.")
 
-        for txn in txns:
-            name = txn.get("description")
-            if not name:
-                continue
-            norm = normalize_name(name)
-            if norm in known:
-                continue
-
-            print(f"🔍 Searching Google for {name} ({ZIP_CODE})")
+        # One lookup per distinct merchant, however many transactions it has
+        groups, named = group_by_merchant(txns, known | done)
+        new_txns = sum(len(g[1]) for g in groups.values())
+        saved = new_txns - len(groups)
+        ratio = saved / new_txns if new_txns else 0.0
+        print(f"🧮 {new_txns} of {named} transactions need enrichment → {len(groups)} distinct merchants "
+              f"(dedup ratio {ratio:.1%}, {saved} lookups saved)")
+        print(f"🔍 {len(groups)} lookups to run against Places ({ZIP_CODE})")
+
+        # Lookups run in the pool; results are written from this thread
+        # in batches, so the connection is never shared between threads.
+        writer = MerchantWriter(conn)
+        queued = {}  # stored normalized name (Places' spelling) → merchant ids
+        records = {}  # merchant id → queued record
+        patched = 0
+        pool = ThreadPoolExecutor(max_workers=max(1, ENRICH_CONCURRENCY))
+        completed = False
+
+        def flush_writes():
+            # Rows that failed to write are not done: retried next run
+            nonlocal added, failed, covered, patched
+            writer.flush()
+            for rec in writer.take_failed():
+                for mid in queued.pop(rec.get("normalized_name"), ()):
+                    done.difference_update(groups[mid][2])
+                    records.pop(mid, None)
+                    added -= 1
+                    failed += 1
+                    covered -= len(groups[mid][1])
+            # Everything still queued is stored: publish it to retrievers,
+            # one patch per spelling
             try:
-                rec = find_place(name, ZIP_CODE)
-                if not rec:
-                    print(f"⚠️  No Google match for {name}")
-                    continue
-
-                # Beta region filter
-                if not is_in_beta_region(rec.get("merchant_address", "")):
-                    print(f"🌐 Skipping {name} — outside beta ZIP region.")
+                patched += append_patches(
+                    (norm, records[mid]) for mids in queued.values() for mid in mids
+                    for norm in sorted(groups[mid][2])
+                )
+            except OSError as e:
+                print(f"⚠️ Could not write merchant patches: {e}")
+            queued.clear()
+            records.clear()
+
+        try:
+            futures = {pool.submit(find_place, name, ZIP_CODE): mid for mid, (name, _, _) in groups.items()}
+            for i, future in enumerate(as_completed(futures), start=1):
+                mid = futures[future]
+                name, group, norms = groups[mid]
+                try:
+                    rec = future.result()
+                    if apply_result(writer, name, rec):
+                        queued.setdefault(rec["normalized_name"], []).append(mid)
+                        records[mid] = rec
+                        added += 1
+                        covered += len(group)
+                except Exception as e:
+                    # Not checkpointed: retried on the next run
+                    failed += 1
+                    print(f"❌ Error processing {name}: {e}")
                     continue
-
-                if rec["merchant_type"] == "Restaurant":
-                    upsert_merchant(conn, rec)
-                    added += 1
-                    print(f"✅ Added {rec['merchant_name']} ({rec.get('cuisine') or 'Unknown'})")
-                else:
-                    print(f"⚠️  {name} not identified as restaurant.")
-            except Exception as e:
-                print(f"❌ Error processing {name}: {e}")
-
-        print(f"\n✅ Completed enrichment — {added} merchants added/updated.")
+                done.update(norms)
+                if i % CHECKPOINT_EVERY == 0:
+                    flush_writes()
+                    save_checkpoint(done)
+                    print(f"📍 Checkpoint: {i}/{len(groups)} lookups done.")
+            completed = True
+        finally:
+            pool.shutdown(wait=completed, cancel_futures=not completed)
+            flush_writes()
+            if completed and not failed:
+                clear_checkpoint()
+                if transaction_sync is not None:
+                    transaction_sync.save()  # advance the watermark
+            else:
+                save_checkpoint(done)
+                print(f"📍 Progress saved to {ENRICH_CHECKPOINT}; rerun to resume.")
+
+        print(f"\n✅ Completed enrichment — {added} merchants added/updated ({covered} transactions), "
+              f"{failed} failed.")
+        print(f"🧮 Lookups: {len(groups)} for {new_txns} transactions ({saved} saved by dedup).")
+        print(f"💾 Upserts: {writer.written} merchants in {writer.statements} statements.")
+        print(f"🩹 Merchant patches published: {patched}")
+        print(lookup_cache.summary())
+        places = http_stats().get("places")
+        if places:
+            print(f"🔌 Places: {places['requests']} requests on {places['connections']} connections "
+                  f"(reuse {places['reuse_ratio']:.0%})")
 
 # ---------------------------------------------
-# 6. RUN SCRIPT
+# 7. RUN SCRIPT
 # ---------------------------------------------
 if __name__ == "__main__":
     main()
@@ -0,0 +1,154 @@
+"""
+stub_places.py
+-------------------------------------
+Local stand-in for the Google Places "Find Place from Text" endpoint, for
+exercising merchant_mcp.py without a key or quota:
+
+    python rag/enrichment/stub_places.py --port 8089 --latency 0.2 --error-rate 0.1 --qps 20
+    PLACES_API_URL=http://127.0.0.1:8089/maps/api/place/findplacefromtext/json \\
+        python rag/enrichment/merchant_mcp.py
+
+Answers are deterministic per input: names with a food word come back as
+restaurants, "NOMATCH" returns no candidates, and the address carries the
+ZIP from the query. --error-rate injects 429/503s and --qps answers
+OVER_QUERY_LIMIT above the quota, so retries and the rate limiter can be
+observed. GET /stats returns request counters.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIND_PLACE_PATH = "/maps/api/place/findplacefromtext/json"
+
+FOOD_WORDS = {
+    "pizza": "pizza_restaurant", "sushi": "japanese_restaurant", "thai": "thai_restaurant",
+    "taco": "mexican_restaurant", "burger": "hamburger_restaurant", "cafe": "cafe",
+    "coffee": "cafe", "grill": "restaurant", "kitchen": "restaurant", "bbq": "restaurant",
+    "restaurant": "restaurant", "diner": "restaurant", "bistro": "restaurant",
+}
+
+
+def candidate(text: str):
+    name, _, zip_code = text.rpartition(" ")
+    if not name:
+        name, zip_code = text, ""
+    lowered = name.lower()
+    if "nomatch" in lowered:
+        return None
+    types = ["point_of_interest", "establishment"]
+    for word, place_type in FOOD_WORDS.items():
+        if word in lowered:
+            types = [place_type, "restaurant", "food"] + types
+            break
+    else:
+        types = ["store"] + types
+    return {
+        "name": name.title(),
+        "formatted_address": f"1 Main St, Moorpark, CA {zip_code}, USA",
+        "types": types,
+        "rating": round(3.5 + (sum(map(ord, lowered)) % 15) / 10, 1),
+        "place_id": f"stub-{zlib.crc32(lowered.encode()):08x}",
+    }
+
+
+class StubState:
+    def __init__(self, latency: float, error_rate: float, qps: float):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.qps = qps
+        self.lock = threading.Lock()
+        self.window = []  # request times in the last second
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "over_limit": 0, "inputs": {}}
+
+    def over_quota(self) -> bool:
+        if self.qps <= 0:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            self.window = [t for t in self.window if now - t < 1.0]
+            self.window.append(now)
+            return len(self.window) > self.qps
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def _send(self, status, body, headers=None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/stats":
+                with state.lock:
+                    return self._send(200, state.stats)
+            if url.path != FIND_PLACE_PATH:
+                return self._send(404, {"status": "NOT_FOUND"})
+
+            text = (parse_qs(url.query).get("input") or [""])[0]
+            with state.lock:
+                state.stats["requests"] += 1
+                state.stats["inputs"][text] = state.stats["inputs"].get(text, 0) + 1
+            if state.latency:
+                time.sleep(state.latency)
+
+            if state.over_quota():
+                with state.lock:
+                    state.stats["over_limit"] += 1
+                return self._send(200, {"status": "OVER_QUERY_LIMIT", "candidates": []})
+            if random.random() < state.error_rate:
+                with state.lock:
+                    state.stats["errors"] += 1
+                if random.random() < 0.5:
+                    return self._send(429, {"status": "OVER_QUERY_LIMIT"}, {"Retry-After": "1"})
+                return self._send(503, {"status": "UNKNOWN_ERROR"})
+
+            c = candidate(text)
+            with state.lock:
+                state.stats["ok"] += 1
+            if c is None:
+                return self._send(200, {"status": "ZERO_RESULTS", "candidates": []})
+            return self._send(200, {"status": "OK", "candidates": [c]})
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(port: int = 8089, latency: float = 0.0, error_rate: float = 0.0, qps: float = 0.0):
+    """Start the stub in a background thread; returns the server (call .shutdown())."""
+    state = StubState(latency, error_rate, qps)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Stub Google Places server")
+    ap.add_argument("--port", type=int, default=8089)
+    ap.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction answered 429/503")
+    ap.add_argument("--qps", type=float, default=0.0, help="quota; above it → OVER_QUERY_LIMIT")
+    args = ap.parse_args()
+    server = serve(args.port, args.latency, args.error_rate, args.qps)
+    print(f"🧪 Stub Places on http://127.0.0.1:{args.port}{FIND_PLACE_PATH}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,229 @@
+"""
+Shared outbound HTTP clients.
+
+Every outbound call (Transaction API, Google Places, ...) goes through
+one of two process-wide clients instead of a bare requests.get, so TCP
+and TLS connections are kept alive and reused:
+
+    session()        requests.Session for blocking code (builder, enrichment)
+    async_client()   httpx.AsyncClient for async endpoints (MCP servers)
+
+Both have per-host connection limits, default timeouts and retries on
+connection errors and 429/5xx for idempotent methods (Retry-After
+honoured). Callers with their own retry policy ask for a session with
+retries=0.
+
+Connection reuse is counted per host: requests sent versus new
+connections opened. stats() returns it as a dict, render() as Prometheus
+text.
+"""
+
+import asyncio
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "10"))            # hosts kept pooled
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "16"))      # keep-alive connections per host
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))  # async client, all hosts
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))               # seconds, doubled per retry
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+METRIC_PREFIX = "finance_agent_http"
+
+
+# ---------------------------------------------------------------------
+# Reuse counters
+# ---------------------------------------------------------------------
+class _Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts: Dict[Tuple[str, str], list] = {}  # (client, host) → [requests, connections]
+
+    def add(self, client: str, host: str, requests_: int = 0, connections: int = 0) -> None:
+        with self._lock:
+            c = self._hosts.setdefault((client, host), [0, 0])
+            c[0] += requests_
+            c[1] += connections
+
+    def snapshot(self) -> Dict[Tuple[str, str], list]:
+        with self._lock:
+            return {k: list(v) for k, v in self._hosts.items()}
+
+
+_counters = _Counters()
+
+
+# ---------------------------------------------------------------------
+# Blocking client (requests)
+# ---------------------------------------------------------------------
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests and new connections per host."""
+
+    def __init__(self, name: str, **kwargs):
+        self.name = name
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        name = self.name
+
+        # Count socket connects (a pooled connection object reconnects in
+        # place when the server closed it, so counting objects undercounts)
+        def counting(pool_cls):
+            class Connection(pool_cls.ConnectionCls):
+                def connect(self):
+                    _counters.add(name, f"{self.host}:{self.port}", connections=1)
+                    return super().connect()
+
+            class Pool(pool_cls):
+                ConnectionCls = Connection
+            return Pool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: counting(cls) for scheme, cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        _counters.add(self.name, _host(url.scheme, url.hostname, url.port), requests_=1)
+        return super().send(request, **kwargs)
+
+
+class _Session(requests.Session):
+    """Session with a default (connect, read) timeout."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+        return super().request(method, url, **kwargs)
+
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def session(name: str = "default", retries: Optional[int] = None) -> requests.Session:
+    """
+    Process-wide pooled session. Sessions are shared by name; the first
+    caller's retries setting wins (retries=0 for callers that retry
+    themselves). Safe to use from several threads.
+    """
+    with _sessions_lock:
+        s = _sessions.get(name)
+        if s is not None:
+            return s
+        retry = Retry(
+            total=HTTP_MAX_RETRIES if retries is None else retries,
+            backoff_factor=HTTP_BACKOFF,
+            backoff_jitter=HTTP_BACKOFF,
+            status_forcelist=RETRY_STATUS,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = _CountingAdapter(
+            name,
+            pool_connections=HTTP_POOL_HOSTS,
+            pool_maxsize=HTTP_POOL_PER_HOST,
+            max_retries=retry,
+        )
+        s = _Session()
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        _sessions[name] = s
+        return s
+
+
+# ---------------------------------------------------------------------
+# Async client (httpx)
+# ---------------------------------------------------------------------
+_async_clients: Dict[int, Any] = {}  # id(event loop) → httpx.AsyncClient
+
+
+def async_client():
+    """Shared httpx.AsyncClient for the running event loop."""
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(id(loop))
+    if client is not None and not client.is_closed:
+        return client
+
+    async def on_request(request) -> None:
+        host = _host(request.url.scheme, request.url.host, request.url.port)
+        _counters.add("async", host, requests_=1)
+
+        # httpcore reports each new TCP connection through the trace hook
+        async def trace(event: str, info: Dict[str, Any]) -> None:
+            if event == "connection.connect_tcp.complete":
+                _counters.add("async", host, connections=1)
+        request.extensions["trace"] = trace
+
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_POOL_PER_HOST,
+        ),
+        # Retries connection failures only; httpx does not retry on status
+        transport=httpx.AsyncHTTPTransport(retries=HTTP_MAX_RETRIES),
+        event_hooks={"request": [on_request]},
+    )
+    _async_clients[id(loop)] = client
+    return client
+
+
+def _host(scheme: str, host: Optional[str], port: Optional[int]) -> str:
+    return f"{host}:{port or (443 if scheme == 'https' else 80)}"
+
+
+async def aclose_async_client() -> None:
+    """Close the running loop's client (call from the app's shutdown hook)."""
+    client = _async_clients.pop(id(asyncio.get_running_loop()), None)
+    if client is not None:
+        await client.aclose()
+
+
+# ---------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------
+def stats() -> Dict[str, Any]:
+    """Requests, new connections and reuse ratio per client and host."""
+    out: Dict[str, Any] = {}
+    for (client, host), (reqs, conns) in sorted(_counters.snapshot().items()):
+        c = out.setdefault(client, {"requests": 0, "connections": 0, "hosts": {}})
+        c["requests"] += reqs
+        c["connections"] += conns
+        c["hosts"][host] = {"requests": reqs, "connections": conns, "reuse_ratio": _reuse(reqs, conns)}
+    for c in out.values():
+        c["reuse_ratio"] = _reuse(c["requests"], c["connections"])
+    return out
+
+
+def _reuse(reqs: int, conns: int) -> float:
+    """Share of requests that went out on an already-open connection."""
+    return round(max(0.0, 1.0 - conns / reqs), 3) if reqs else 0.0
+
+
+def render() -> str:
+    """Prometheus text: request and new-connection counters per client/host."""
+    snapshot = sorted(_counters.snapshot().items())
+    lines = []
+    # Each family's HELP, TYPE and samples stay together (exposition format)
+    for name, help_text, field in (
+        ("requests_total", "Outbound HTTP requests sent.", 0),
+        ("connections_total", "Outbound HTTP connections opened.", 1),
+    ):
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (client, host), counts in snapshot:
+            lines.append(f'{metric}{{client="{client}",host="{host}"}} {counts[field]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,177 @@
+"""
+Merchant canonicalization index.
+
+Card descriptions spell one merchant many ways ("KROGER #569", "KROGER
+#587", "TARGET 00010587", "NETFLIX.COM" / "Netflix.com"). MerchantIndex
+maps every raw name to an integer merchant id, in two steps:
+
+  1. canonical_key(): letters only, store/terminal numbers and filler
+     words (STORE, INC, LLC, ...) dropped, so those variants share a key.
+  2. Fuzzy merge of the remaining keys: character-trigram MinHash
+     signatures, LSH banding (MERCHANT_MINHASH_BANDS x ..._ROWS) to find
+     candidate pairs, then exact trigram Jaccard >= MERCHANT_SIMILARITY.
+     Keys are clustered greedily, most frequent first, against cluster
+     leaders only, so similarity never chains across a cluster.
+
+Built once from the metadata at column-build time (ColumnStore) and
+saved next to the columns; merchant enrichment builds one per run to
+deduplicate lookups. Each id's display name is its most frequent raw
+spelling.
+"""
+
+import html
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+MERCHANT_SIMILARITY = float(os.getenv("MERCHANT_SIMILARITY", "0.8"))
+MERCHANT_MINHASH_BANDS = int(os.getenv("MERCHANT_MINHASH_BANDS", "8"))
+MERCHANT_MINHASH_ROWS = int(os.getenv("MERCHANT_MINHASH_ROWS", "4"))
+MIN_FUZZY_KEY = 5  # shorter keys only merge on exact match
+
+FILLER_WORDS = {"STORE", "STORES", "INC", "LLC", "LTD", "CO", "CORP", "NO"}
+
+# Hash family (a * h + b) mod p over 32-bit trigram hashes; a, b < 2^31
+# keep the product inside uint64. Fixed seed: signatures must be stable.
+_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, 1 << 31, size=MERCHANT_MINHASH_BANDS * MERCHANT_MINHASH_ROWS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 31, size=MERCHANT_MINHASH_BANDS * MERCHANT_MINHASH_ROWS, dtype=np.uint64)
+
+
+def canonical_key(name: str) -> str:
+    """"STARBUCKS #1234" / "STARBUCKS STORE 55" → "STARBUCKS"."""
+    text = html.unescape(name or "").upper().replace("'", "").replace("’", "")
+    text = re.sub(r"[^A-Z ]+", " ", text)
+    words = [w for w in text.split() if len(w) > 1 and w not in FILLER_WORDS]
+    return " ".join(words) or " ".join(text.split())
+
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def minhash(grams: Set[str]) -> np.ndarray:
+    """MinHash signature: per permutation, the smallest hash of any trigram."""
+    hashes = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+class MerchantIndex:
+    def __init__(self, names: List[str], aliases: Dict[str, int], leaders: List[str]):
+        self.names = names        # merchant id → display name
+        self.aliases = aliases    # raw name → merchant id
+        self.leaders = leaders    # merchant id → canonical key fuzzy matches compare against
+        self._keys: Optional[Dict[str, int]] = None
+        self._lsh: Optional[Dict[tuple, List[int]]] = None
+        self._leader_grams: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # -----------------------------------------------------------------
+    # Build
+    # -----------------------------------------------------------------
+    @classmethod
+    def build(cls, raw_names: Iterable[str], similarity: float = MERCHANT_SIMILARITY) -> "MerchantIndex":
+        """Index over raw names (one entry per occurrence: counts pick display names)."""
+        counts = Counter(raw_names)
+        key_counts: Counter = Counter()
+        for raw, n in counts.items():
+            key_counts[canonical_key(raw)] += n
+
+        index = cls([], {}, [])
+        index._keys, index._lsh = {}, {}
+        key_id: Dict[str, int] = {}
+        # Most frequent keys first, so they become the cluster leaders
+        for key, _ in key_counts.most_common():
+            mid = index._match(key, similarity)
+            if mid is None:
+                mid = len(index.names)
+                index.names.append("")
+                index.leaders.append(key)
+                index._add_leader(key, mid)
+            key_id[key] = mid
+            index._keys[key] = mid
+
+        # Ids are numbered by first appearance, so ties between merchants
+        # break in the order the raw names were seen
+        renumber: Dict[int, int] = {}
+        best: Dict[int, tuple] = {}
+        aliases: Dict[str, int] = {}
+        for raw, n in counts.items():
+            mid = renumber.setdefault(key_id[canonical_key(raw)], len(renumber))
+            aliases[raw] = mid
+            if mid not in best or n > best[mid][0]:  # first seen wins ties
+                best[mid] = (n, raw)
+        leaders = [""] * len(renumber)
+        for old, new in renumber.items():
+            leaders[new] = index.leaders[old]
+        return cls([best[mid][1] for mid in range(len(renumber))], aliases, leaders)
+
+    def _bands(self, grams: Set[str]):
+        sig = minhash(grams)
+        r = MERCHANT_MINHASH_ROWS
+        return [(b, *sig[b * r:(b + 1) * r].tolist()) for b in range(MERCHANT_MINHASH_BANDS)]
+
+    def _add_leader(self, key: str, mid: int) -> None:
+        if len(key) < MIN_FUZZY_KEY:
+            return
+        grams = trigrams(key)
+        self._leader_grams[mid] = grams
+        for band in self._bands(grams):
+            self._lsh.setdefault(band, []).append(mid)
+
+    def _match(self, key: str, similarity: float) -> Optional[int]:
+        """Id of the most similar cluster leader at or above the threshold."""
+        if len(key) < MIN_FUZZY_KEY or not self._lsh:
+            return None
+        grams = trigrams(key)
+        candidates = {mid for band in self._bands(grams) for mid in self._lsh.get(band, ())}
+        best, best_sim = None, similarity
+        for mid in sorted(candidates):
+            sim = jaccard(grams, self._leader_grams[mid])
+            if sim >= best_sim:
+                best, best_sim = mid, sim
+        return best
+
+    # -----------------------------------------------------------------
+    # Lookup
+    # -----------------------------------------------------------------
+    def lookup(self, name: str, similarity: float = MERCHANT_SIMILARITY) -> Optional[int]:
+        """Merchant id for a raw or normalized name, or None when unknown."""
+        mid = self.aliases.get(name)
+        if mid is not None:
+            return mid
+        if self._keys is None:
+            self._rebuild_lookup()
+        key = canonical_key(name)
+        mid = self._keys.get(key)
+        return mid if mid is not None else self._match(key, similarity)
+
+    def _rebuild_lookup(self) -> None:
+        # After from_dict(): exact keys from the aliases, LSH from the leaders
+        self._keys, self._lsh, self._leader_grams = {}, {}, {}
+        for raw, mid in self.aliases.items():
+            self._keys.setdefault(canonical_key(raw), mid)
+        for mid, key in enumerate(self.leaders):
+            self._add_leader(key, mid)
+
+    # -----------------------------------------------------------------
+    # Persist
+    # -----------------------------------------------------------------
+    def to_dict(self) -> Dict[str, Any]:
+        return {"names": self.names, "aliases": self.aliases, "leaders": self.leaders}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MerchantIndex":
+        return cls(list(data["names"]), {k: int(v) for k, v in data["aliases"].items()}, list(data["leaders"]))
@@ -0,0 +1,94 @@
+"""
+Merchant enrichment patches.
+
+Enrichment (rag/enrichment/merchant_mcp.py) classifies merchants long
+after the index was built. Instead of waiting for a full rebuild, every
+merchant it stores is also appended to a patch feed (JSON lines, one per
+merchant, keyed by normalized merchant name):
+
+    {"key": "JOES PIZZA", "merchant_name": "Joe's Pizza",
+     "merchant_type": "Restaurant", "cuisine": "Pizza", "at": 1760871000.0}
+
+Retrievers poll the feed (a stat every MERCHANT_PATCH_POLL seconds) and
+apply new entries to their merchant dictionary and restaurant / cuisine
+columns (ColumnStore.apply_merchant_patches); nothing is re-embedded.
+Patches are idempotent, so re-reading the whole feed (after a restart or
+a rebuild) is harmless. MERCHANT_PATCH_POLL < 0 disables polling.
+"""
+
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Iterable, Tuple
+
+MERCHANT_PATCH_PATH = os.getenv(
+    "MERCHANT_PATCH_PATH",
+    os.path.join(os.path.dirname(__file__), "cache", "merchant_patches.jsonl"))
+MERCHANT_PATCH_POLL = float(os.getenv("MERCHANT_PATCH_POLL", "2"))  # seconds
+
+
+def normalize_merchant(name: str) -> str:
+    """Normalized merchant key (punctuation stripped, upper-cased)."""
+    return re.sub(r"[^A-Za-z0-9 ]+", "", name or "").strip().upper()
+
+
+def append_patches(records: Iterable[Tuple[str, Dict[str, Any]]],
+                   path: str = MERCHANT_PATCH_PATH) -> int:
+    """Append (merchant key, enrichment record) pairs to the feed."""
+    now = time.time()
+    lines = [
+        json.dumps({
+            "key": key,
+            "merchant_name": rec.get("merchant_name"),
+            "merchant_type": rec.get("merchant_type"),
+            "cuisine": rec.get("cuisine"),
+            "at": now,
+        }) + "\n"
+        for key, rec in records
+    ]
+    if not lines:
+        return 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # One write per batch: readers never see half a line
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+    return len(lines)
+
+
+class PatchFeed:
+    """Incremental reader of the patch feed (tracks the byte offset read)."""
+
+    def __init__(self, path: str = MERCHANT_PATCH_PATH):
+        self.path = path
+        self.offset = 0
+        self.inode = None
+
+    def poll(self) -> Dict[str, Dict[str, Any]]:
+        """Entries appended since the last poll, last one per key wins."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return {}
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            # New or truncated file: read it from the start
+            self.inode, self.offset = st.st_ino, 0
+        if st.st_size == self.offset:
+            return {}
+
+        patches: Dict[str, Dict[str, Any]] = {}
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(st.st_size - self.offset)
+        # Only complete lines; a partial tail is picked up next time
+        end = data.rfind(b"\n") + 1
+        self.offset += end
+        for line in data[:end].splitlines():
+            try:
+                p = json.loads(line)
+            except ValueError:
+                print(f"[WARN] Skipping malformed merchant patch: {line[:80]!r}")
+                continue
+            if p.get("key"):
+                patches[p["key"]] = p
+        return patches
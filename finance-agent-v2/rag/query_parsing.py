@@ -0,0 +1,156 @@
+import re
+from typing import List, Optional, Tuple
+
+# ---------------------------------------------------------------------
+# Canonical categories and cuisine tokens
+# ---------------------------------------------------------------------
+CUISINE_KEYWORDS = [
+    "mexican", "italian", "indian", "japanese", "chinese", "thai",
+    "sushi", "korean", "mediterranean", "greek", "vietnamese",
+    "american", "pizza", "burger", "coffee", "bakery"
+]
+
+CATEGORY_MAP = {
+    "professional": "Professional Services",
+    "shopping": "Shopping",
+    "fee": "Fees & Adjustments",
+    "education": "Education",
+    "personal": "Personal",
+    "food": "Food & Drink",
+    "restaurant": "Food & Drink",
+    "dining": "Food & Drink",
+    "automotive": "Automotive",
+    "entertainment": "Entertainment",
+    "travel": "Travel",
+    "donation": "Gifts & Donations",
+    "gift": "Gifts & Donations",
+    "grocery": "Groceries",
+    "supermarket": "Groceries",
+    "gas": "Gas",
+    "fuel": "Gas",
+    "home": "Home",
+    "bill": "Bills & Utilities",
+    "utility": "Bills & Utilities",
+    "electric": "Bills & Utilities",
+    "water": "Bills & Utilities",
+    "health": "Health & Wellness",
+    "pharmacy": "Health & Wellness",
+    "wellness": "Health & Wellness",
+    "gym": "Health & Wellness",
+}
+
+MONTHS = {
+    "january": 1, "february": 2, "march": 3, "april": 4,
+    "may": 5, "june": 6, "july": 7, "august": 8,
+    "september": 9, "october": 10, "november": 11, "december": 12
+}
+
+MONTH_LABELS = {v: k.title() for k, v in MONTHS.items()}
+
+# Month names (full or abbreviated) and quarters, each with an optional year
+_PERIOD_RE = re.compile(
+    r"\b(?:(q[1-4])|(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|"
+    r"july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?))\b"
+    r"(?:\s*,?\s*(\d{4}))?"
+)
+
+
+# (?!\d) stops the number backtracking to a shorter one before the
+# percentile lookahead ("above 95th percentile" is not "above 9")
+_THRESHOLD_RE = re.compile(
+    r"(?:over|above|more than|greater than|larger than|bigger than|>)\s*\$?\s*(\d[\d,]*(?:\.\d+)?)(?!\d)(?!\s*(?:st|nd|rd|th)?\s*(?:percentile|pct))"
+)
+_PERCENTILE_RE = re.compile(r"(\d{1,2}(?:\.\d+)?)(?:st|nd|rd|th)?\s*(?:percentile|pct)")
+_COUNT_RE = re.compile(r"\b(?:top|largest|biggest)\s+(\d{1,3})\b|\b(\d{1,3})\s+(?:largest|biggest)\b")
+
+
+def ym_label(ym: int) -> str:
+    return f"{MONTH_LABELS[ym % 12 + 1]} {ym // 12}"
+
+
+class QueryParsingMixin:
+    """
+    Question parsing helpers shared by the in-process retriever and the
+    process-pool proxy. Pure functions of the question text — no index,
+    model or metadata required.
+    """
+
+    def _parse_month_year(self, text: str):
+        q = text.lower()
+        month = next((v for k, v in MONTHS.items() if k in q), None)
+
+        year = None
+        for tok in re.findall(r"\b\d{4}\b", q):
+            try:
+                year = int(tok)
+                break
+            except Exception:
+                pass
+
+        return month, year
+
+    def _is_ytd(self, text: str) -> bool:
+        q = text.lower()
+        return any(x in q for x in ["ytd", "year to date", "to date"])
+
+    def _requested_cuisines(self, text: str) -> List[str]:
+        q = text.lower()
+        return [c for c in CUISINE_KEYWORDS if c in q]
+
+    def _requested_periods(self, text: str,
+                           default_year: Optional[int] = None) -> List[Tuple[str, List[int]]]:
+        """
+        Months and quarters mentioned in the question, in order, as
+        (label, [ym, ...]) with ym = year * 12 + month - 1. A period
+        without its own year takes the first year in the question, else
+        default_year.
+        """
+        q = text.lower()
+        years = re.findall(r"\b\d{4}\b", q)
+        fallback_year = int(years[0]) if years else default_year
+
+        periods: List[Tuple[str, List[int]]] = []
+        seen = set()
+        for quarter, month, year in _PERIOD_RE.findall(q):
+            y = int(year) if year else fallback_year
+            if y is None:
+                continue
+            if quarter:
+                qn = int(quarter[1])
+                label = f"Q{qn} {y}"
+                yms = [y * 12 + (qn - 1) * 3 + i for i in range(3)]
+            else:
+                m = next(v for k, v in MONTHS.items() if k.startswith(month[:3]))
+                label = f"{MONTH_LABELS[m]} {y}"
+                yms = [y * 12 + m - 1]
+            if label not in seen:
+                seen.add(label)
+                periods.append((label, yms))
+
+        return periods
+
+    def _amount_threshold(self, text: str) -> Optional[float]:
+        """"above $500" / "over 1,000" → 500.0 / 1000.0"""
+        m = _THRESHOLD_RE.search(text.lower())
+        return float(m.group(1).replace(",", "")) if m else None
+
+    def _requested_percentile(self, text: str) -> Optional[float]:
+        """"over my 95th percentile" → 95.0"""
+        m = _PERCENTILE_RE.search(text.lower())
+        return float(m.group(1)) if m else None
+
+    def _requested_count(self, text: str) -> Optional[int]:
+        """"top 10" / "5 largest" → 10 / 5"""
+        m = _COUNT_RE.search(text.lower())
+        return int(m.group(1) or m.group(2)) if m else None
+
+    def _requested_categories(self, text: str) -> List[str]:
+        q = text.lower()
+        words = set(re.findall(r"\b\w+\b", q))
+        cats = set()
+
+        for k, v in CATEGORY_MAP.items():
+            if k in words or f"{k}s" in words:
+                cats.add(v)
+
+        return list(cats)
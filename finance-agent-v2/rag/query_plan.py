@@ -0,0 +1,67 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+
+from rag.dates import FISCAL_YEAR_START_MONTH, DateExpr, default_year, parse_window
+from rag.query_parsing import QueryParsingMixin
+
+# Plans kept per distinct question text
+QUERY_PLAN_CACHE_SIZE = int(os.getenv("QUERY_PLAN_CACHE_SIZE", "1024"))
+
+_parser = QueryParsingMixin()
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """
+    Everything the router, retriever and handlers need from a question,
+    parsed once. Immutable and picklable, so it can be cached and sent
+    to query-engine worker processes as is.
+
+    window is the time window (see rag.dates), compiled to a day range
+    by the retriever. periods are the months/quarters named, as
+    (label, (ym, ...)) with ym = year * 12 + month - 1; a month without
+    a year falls in the default fiscal year.
+    """
+    question: str
+    text: str
+    window: DateExpr
+    cuisines: Tuple[str, ...]
+    categories: Tuple[str, ...]
+    periods: Tuple[Tuple[str, Tuple[int, ...]], ...]
+    threshold: Optional[float]
+    percentile: Optional[float]
+    count: Optional[int]
+
+
+def _build_plan(question: str) -> QueryPlan:
+    text = question.lower()
+    return QueryPlan(
+        question=question,
+        text=text,
+        window=parse_window(text),
+        cuisines=tuple(_parser._requested_cuisines(text)),
+        categories=tuple(sorted(_parser._requested_categories(text))),
+        periods=tuple(
+            (label, tuple(yms))
+            for label, yms in _parser._requested_periods(
+                text, default_year=default_year(FISCAL_YEAR_START_MONTH))
+        ),
+        threshold=_parser._amount_threshold(text),
+        percentile=_parser._requested_percentile(text),
+        count=_parser._requested_count(text),
+    )
+
+
+@lru_cache(maxsize=QUERY_PLAN_CACHE_SIZE)
+def parse_plan(question: str) -> QueryPlan:
+    """QueryPlan for a question, memoized by its exact text."""
+    return _build_plan(question)
+
+
+def as_plan(question: Union[str, QueryPlan]) -> QueryPlan:
+    """Accept either a question or an already-parsed plan."""
+    if isinstance(question, QueryPlan):
+        return question
+    return parse_plan(question)
@@ -0,0 +1,106 @@
+import re
+from datetime import date
+from typing import Any, Dict, List
+
+import numpy as np
+
+# ---------------------------------------------------------------------
+# Cadences: (name, nominal days, min gap, max gap, min occurrences)
+# ---------------------------------------------------------------------
+CADENCES = [
+    ("weekly", 7, 6, 8, 4),
+    ("biweekly", 14, 12, 16, 3),
+    ("monthly", 30, 26, 35, 3),
+    ("quarterly", 91, 84, 98, 2),
+    ("annual", 365, 350, 380, 2),
+]
+
+# Maximum coefficient of variation for gaps and amounts
+MAX_GAP_CV = 0.25
+MAX_AMOUNT_CV = 0.35
+
+
+def merchant_key(name: str) -> str:
+    """Grouping key: letters only, so store numbers / ref ids don't split merchants."""
+    return " ".join(re.sub(r"[^A-Za-z ]+", " ", name or "").upper().split())
+
+
+def detect_recurring(cols) -> List[Dict[str, Any]]:
+    """
+    Recurring charges over the full history of a ColumnStore.
+
+    Debits are grouped by normalized merchant and ordered by date with one
+    lexsort; inter-arrival gaps and amount statistics per group come from
+    np.add.reduceat, so the cost is a couple of passes over the debits
+    regardless of how many merchants there are.
+    """
+    debit = (cols.day >= 0) & (cols.amount < 0)
+    pos = np.flatnonzero(debit)
+    if len(pos) < 2:
+        return []
+
+    # Merchant code → normalized merchant code
+    keys: Dict[str, int] = {}
+    names: List[str] = []
+    norm_of = np.empty(len(cols.merchants), dtype=np.int64)
+    for code, name in enumerate(cols.merchants):
+        k = merchant_key(name) or name
+        if k not in keys:
+            keys[k] = len(keys)
+            names.append(name)
+        norm_of[code] = keys[k]
+
+    group = norm_of[cols.merchant[pos]]
+    day = cols.day[pos].astype(np.int64)
+    spend = -cols.amount[pos]
+
+    order = np.lexsort((day, group))
+    group, day, spend = group[order], day[order], spend[order]
+
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    counts = np.diff(np.r_[starts, len(group)])
+
+    # Amount stats per group
+    amt_sum = np.add.reduceat(spend, starts)
+    amt_sq = np.add.reduceat(spend * spend, starts)
+    amt_mean = amt_sum / counts
+    amt_std = np.sqrt(np.maximum(amt_sq / counts - amt_mean ** 2, 0.0))
+
+    # Gap stats per group: gaps inside a group only (first row of each group has none)
+    gaps = np.diff(day).astype(np.float64)
+    same = group[1:] == group[:-1]
+    gaps = np.where(same, gaps, 0.0)
+    gap_cnt = counts - 1
+    gap_sum = np.add.reduceat(np.r_[gaps, 0.0], starts)
+    gap_sq = np.add.reduceat(np.r_[gaps * gaps, 0.0], starts)
+    # reduceat sums gaps[starts[i] : starts[i+1]], which includes the
+    # cross-group gap at the boundary — zeroed above, so totals are exact.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gap_mean = gap_sum / gap_cnt
+        gap_std = np.sqrt(np.maximum(gap_sq / gap_cnt - gap_mean ** 2, 0.0))
+        gap_cv = gap_std / gap_mean
+        amt_cv = amt_std / amt_mean
+
+    first_day = day[starts]
+    last_day = day[np.r_[starts[1:] - 1, len(day) - 1]]
+
+    results: List[Dict[str, Any]] = []
+    candidates = np.flatnonzero((gap_cnt >= 1) & (gap_cv <= MAX_GAP_CV) & (amt_cv <= MAX_AMOUNT_CV))
+    for i in candidates:
+        for cadence, nominal, lo, hi, min_n in CADENCES:
+            if counts[i] >= min_n and lo <= gap_mean[i] <= hi:
+                results.append({
+                    "merchant": names[group[starts[i]]],
+                    "cadence": cadence,
+                    "occurrences": int(counts[i]),
+                    "average_amount": round(float(amt_mean[i]), 2),
+                    "average_gap_days": round(float(gap_mean[i]), 1),
+                    "first_charge": date.fromordinal(int(first_day[i])).isoformat(),
+                    "last_charge": date.fromordinal(int(last_day[i])).isoformat(),
+                    "next_expected": date.fromordinal(int(round(last_day[i] + gap_mean[i]))).isoformat(),
+                    "annualized": round(float(amt_mean[i]) * 365.0 / nominal, 2),
+                })
+                break
+
+    results.sort(key=lambda r: r["annualized"], reverse=True)
+    return results
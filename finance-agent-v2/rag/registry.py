@@ -0,0 +1,193 @@
+"""
+Per-tenant retrievers.
+
+Each tenant (customer account) has its own index directory,
+TENANT_INDEX_ROOT/<tenant>/, holding faiss.index + metadata.json (flat
+or nested under index/). Retrievers are loaded on first use, or ahead
+of time by prefetch() when the user logs in, and kept in LRU order:
+once the resident total goes over TENANT_MEMORY_BUDGET_MB the least
+recently used tenants are dropped. The embedding model is shared by all
+tenants, so a tenant costs its columns and FAISS index only.
+
+Without TENANT_INDEX_ROOT (or when it has no directory for it) the
+default tenant is the built-in index under rag/.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+TENANT_INDEX_ROOT = os.getenv("TENANT_INDEX_ROOT", "")
+TENANT_MEMORY_BUDGET_MB = float(os.getenv("TENANT_MEMORY_BUDGET_MB", "2048"))
+TENANT_PREFETCH_WORKERS = int(os.getenv("TENANT_PREFETCH_WORKERS", "2"))
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+
+_TENANT_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+
+
+class UnknownTenant(LookupError):
+    """No index directory for the requested tenant (or an invalid id)."""
+
+
+def tenant_dir(tenant: Optional[str] = None) -> Optional[str]:
+    """Index directory of a tenant; None selects the built-in rag/ index."""
+    tenant = tenant or DEFAULT_TENANT
+    if not _TENANT_RE.match(tenant) or ".." in tenant:
+        raise UnknownTenant(f"Invalid tenant id: {tenant!r}")
+
+    if TENANT_INDEX_ROOT:
+        path = os.path.join(TENANT_INDEX_ROOT, tenant)
+        if os.path.isdir(path):
+            return path
+    if tenant == DEFAULT_TENANT:
+        return None
+    raise UnknownTenant(f"Unknown tenant: {tenant!r}")
+
+
+def resident_bytes(retriever: Any) -> int:
+    size = getattr(retriever, "resident_bytes", None)
+    return int(size()) if callable(size) else 0
+
+
+class RetrieverRegistry:
+    """
+    Tenant → retriever, loaded lazily and evicted LRU under a memory
+    budget. Concurrent requests for a tenant that is still loading wait
+    on the same load. The tenant being loaded is never evicted, so a
+    single tenant larger than the budget still gets served.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[Optional[str]], Any],
+        memory_budget_mb: float = TENANT_MEMORY_BUDGET_MB,
+        prefetch_workers: int = TENANT_PREFETCH_WORKERS,
+    ):
+        self.loader = loader
+        self.budget = int(memory_budget_mb * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._resident: "OrderedDict[str, tuple]" = OrderedDict()  # tenant → (retriever, bytes)
+        self._loading: Dict[str, Future] = {}
+        self._prefetcher = ThreadPoolExecutor(
+            max_workers=max(1, prefetch_workers),
+            thread_name_prefix="tenant-prefetch",
+        )
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    # -----------------------------------------------------------------
+    # Lookup / load
+    # -----------------------------------------------------------------
+    def get(self, tenant: Optional[str] = None):
+        tenant = tenant or DEFAULT_TENANT
+        with self._lock:
+            entry = self._resident.get(tenant)
+            if entry is not None:
+                self._resident.move_to_end(tenant)
+                self.hits += 1
+                return entry[0]
+
+            self.misses += 1
+            future = self._loading.get(tenant)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[tenant] = future
+
+        if owner:
+            self._load(tenant, future)
+        return future.result()
+
+    def _load(self, tenant: str, future: Future) -> None:
+        started = time.perf_counter()
+        try:
+            retriever = self.loader(tenant_dir(tenant))
+            size = resident_bytes(retriever)
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(tenant, None)
+                self.load_failures += 1
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._resident[tenant] = (retriever, size)
+            self._loading.pop(tenant, None)
+            self.loads += 1
+            self.load_seconds += time.perf_counter() - started
+            evicted = self._evict_over_budget(keep=tenant)
+
+        print(f"[INIT] Loaded retriever for tenant '{tenant}' ({size / 1e6:.1f} MB)")
+        for name in evicted:
+            print(f"[INIT] Evicted retriever for tenant '{name}' (memory budget)")
+        future.set_result(retriever)
+
+    def _evict_over_budget(self, keep: str):
+        """Drop LRU tenants until under budget (caller holds the lock)."""
+        total = sum(size for _, size in self._resident.values())
+        evicted = []
+        for name in list(self._resident):
+            if total <= self.budget:
+                break
+            if name == keep:
+                continue
+            _, size = self._resident.pop(name)
+            total -= size
+            self.evictions += 1
+            evicted.append(name)
+        return evicted
+
+    # -----------------------------------------------------------------
+    # Login-time warm-up
+    # -----------------------------------------------------------------
+    def prefetch(self, tenant: Optional[str] = None) -> bool:
+        """
+        Start loading a tenant in the background (e.g. when its user logs
+        in). Returns False when it is already resident or loading.
+        """
+        tenant = tenant or DEFAULT_TENANT
+        tenant_dir(tenant)  # validate now, not in the background
+        with self._lock:
+            if tenant in self._resident or tenant in self._loading:
+                return False
+
+        def warm():
+            try:
+                self.get(tenant)
+            except Exception as e:
+                print(f"[WARN] Prefetch failed for tenant '{tenant}':", e)
+
+        self._prefetcher.submit(warm)
+        return True
+
+    # -----------------------------------------------------------------
+    # Metrics / lifecycle
+    # -----------------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tenants = [{"tenant": t, "bytes": size} for t, (_, size) in self._resident.items()]
+            return {
+                "budget_bytes": self.budget,
+                "resident_bytes": sum(t["bytes"] for t in tenants),
+                "resident": tenants,  # least recently used first
+                "loading": list(self._loading),
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "load_failures": self.load_failures,
+                "evictions": self.evictions,
+                "load_seconds": round(self.load_seconds, 3),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._prefetcher.shutdown(wait=wait)
@@ -1,410 +1,670 @@
 import os
-import re
 import json
-from datetime import datetime
-from typing import List, Dict, Any
-from collections import defaultdict
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import List, Dict, Any, Optional, Union
 
 import numpy as np
-import faiss
 from sentence_transformers import SentenceTransformer
 
-# ---------------------------------------------------------------------
-# Fiscal year configuration
-# ---------------------------------------------------------------------
-FY25_YEAR = 2025
-FY25_MONTH_START = 1
-FY25_MONTH_END = 10
-
-# ---------------------------------------------------------------------
-# Canonical categories and cuisine tokens
-# ---------------------------------------------------------------------
-CUISINE_KEYWORDS = [
-    "mexican", "italian", "indian", "japanese", "chinese", "thai",
-    "sushi", "korean", "mediterranean", "greek", "vietnamese",
-    "american", "pizza", "burger", "coffee", "bakery"
-]
-
-CATEGORY_MAP = {
-    "professional": "Professional Services",
-    "shopping": "Shopping",
-    "fee": "Fees & Adjustments",
-    "education": "Education",
-    "personal": "Personal",
-    "food": "Food & Drink",
-    "restaurant": "Food & Drink",
-    "dining": "Food & Drink",
-    "automotive": "Automotive",
-    "entertainment": "Entertainment",
-    "travel": "Travel",
-    "donation": "Gifts & Donations",
-    "gift": "Gifts & Donations",
-    "grocery": "Groceries",
-    "supermarket": "Groceries",
-    "gas": "Gas",
-    "fuel": "Gas",
-    "home": "Home",
-    "bill": "Bills & Utilities",
-    "utility": "Bills & Utilities",
-    "electric": "Bills & Utilities",
-    "water": "Bills & Utilities",
-    "health": "Health & Wellness",
-    "pharmacy": "Health & Wellness",
-    "wellness": "Health & Wellness",
-    "gym": "Health & Wellness",
+from rag.query_parsing import (  # noqa: F401  (re-exported for older imports)
+    CUISINE_KEYWORDS,
+    CATEGORY_MAP,
+    MONTHS,
+    QueryParsingMixin,
+    ym_label,
+)
+from rag.dates import anchor_from_env
+from rag.query_plan import QueryPlan, as_plan
+from rag.columns import (
+    ColumnStore,
+    column_cache_dir,
+    cuisine_bits,
+    is_restaurant,
+    matches_cuisine,
+    resolve_index_paths,
+    top_rows,
+)
+from rag.merchant_patches import MERCHANT_PATCH_POLL, PatchFeed, normalize_merchant
+from rag.recurrence import detect_recurring
+from rag.shards import ShardSet, read_index  # noqa: F401  (read_index re-exported)
+from rag.timing import span, timed
+
+# Group-by dimensions understood by aggregate() → label for missing values
+DIMENSION_DEFAULTS = {
+    "merchant": "Unknown",
+    "category": "Uncategorized",
+    "cuisine": "",
 }
 
-MONTHS = {
-    "january": 1, "february": 2, "march": 3, "april": 4,
-    "may": 5, "june": 6, "july": 7, "august": 8,
-    "september": 9, "october": 10, "november": 11, "december": 12
-}
+# Cap on individual purchases listed by large_purchases
+MAX_LISTED_PURCHASES = 50
+
+# FAISS candidate lists kept per (question, top_k) so batch prefetches and
+# repeated questions skip the encode + search step.
+CANDIDATE_CACHE_SIZE = int(os.getenv("CANDIDATE_CACHE_SIZE", "512"))
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+_shared_model = None
+_shared_model_lock = threading.Lock()
+
+
+def shared_model() -> SentenceTransformer:
+    """One embedding model per process, shared by every tenant's retriever."""
+    global _shared_model
+    with _shared_model_lock:
+        if _shared_model is None:
+            _shared_model = SentenceTransformer(EMBEDDING_MODEL)
+        return _shared_model
 
 
-class RAGRetriever:
+class RAGRetriever(QueryParsingMixin):
     """
     Final production retriever_v2.
 
     Uses the existing FAISS index + metadata.json that already
     include merchant enrichment (restaurantType, merchantName, etc.).
-    """
-
-    def __init__(self):
-        base_dir = os.path.dirname(os.path.abspath(__file__))
 
-        # Support both flat and nested index layouts
-        flat_index = os.path.join(base_dir, "faiss.index")
-        flat_meta = os.path.join(base_dir, "metadata.json")
-        nested_index = os.path.join(base_dir, "index", "faiss.index")
-        nested_meta = os.path.join(base_dir, "index", "metadata.json")
+    Filtering and aggregation run over a date-sorted ColumnStore derived
+    from metadata.json; the raw records are only loaded on demand.
+    With mmap=True both the columns and (where the index type supports
+    it) the FAISS index are memory-mapped so several worker processes
+    can share them. index_dir selects a tenant's index directory
+    (default: the built-in one under rag/). When the directory holds a
+    shard manifest, searches only touch the shards overlapping the
+    question's window (see rag/shards.py). Merchant enrichment that lands
+    after the build is patched into the columns as it arrives (see
+    rag/merchant_patches.py).
+    """
 
-        self.index_path = flat_index if os.path.exists(flat_index) else nested_index
-        self.meta_path = flat_meta if os.path.exists(flat_meta) else nested_meta
+    def __init__(self, index_dir: Optional[str] = None, mmap: bool = False,
+                 model: Optional[SentenceTransformer] = None):
+        self.index_path, self.meta_path = resolve_index_paths(index_dir)
+        data_dir = os.path.dirname(self.meta_path)
 
-        if not os.path.exists(self.index_path) or not os.path.exists(self.meta_path):
+        if not ShardSet.exists(data_dir, self.index_path) or not os.path.exists(self.meta_path):
             raise FileNotFoundError(
                 f"Missing FAISS index or metadata file.\n"
                 f"Index: {self.index_path}\nMeta: {self.meta_path}"
             )
 
-        with open(self.meta_path, "r", encoding="utf-8") as f:
-            self.metadata: List[Dict[str, Any]] = json.load(f)
-
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        self.index = faiss.read_index(self.index_path)
-
-    # -----------------------------------------------------------------
-    # Parsing helpers
-    # -----------------------------------------------------------------
-    def _parse_month_year(self, text: str):
-        q = text.lower()
-        month = next((v for k, v in MONTHS.items() if k in q), None)
-
-        year = None
-        for tok in re.findall(r"\b\d{4}\b", q):
-            try:
-                year = int(tok)
-                break
-            except Exception:
-                pass
-
-        return month, year
-
-    def _is_ytd(self, text: str) -> bool:
-        q = text.lower()
-        return any(x in q for x in ["ytd", "year to date", "to date"])
-
-    def _requested_cuisines(self, text: str) -> List[str]:
-        q = text.lower()
-        return [c for c in CUISINE_KEYWORDS if c in q]
-
-    def _requested_categories(self, text: str) -> List[str]:
-        q = text.lower()
-        words = set(re.findall(r"\b\w+\b", q))
-        cats = set()
-
-        for k, v in CATEGORY_MAP.items():
-            if k in words or f"{k}s" in words:
-                cats.add(v)
-
-        return list(cats)
+        self._metadata: List[Dict[str, Any]] = None
+        self._columns = ColumnStore.load_or_build(
+            self.meta_path,
+            column_cache_dir(self.index_path),
+            mmap=mmap,
+        )
+
+        self.model = model or shared_model()
+        self.shards = ShardSet.open(data_dir, self.index_path, mmap=mmap)
+
+        self._candidates: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._candidates_lock = threading.Lock()
+        self._restaurant_rows: Optional[tuple] = None
+        self._recurring: Optional[tuple] = None
+
+        self._patch_feed = PatchFeed()
+        self._patch_lock = threading.Lock()
+        self._patch_due = 0.0
+        self._merchant_patches: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def columns(self) -> ColumnStore:
+        """Column store, with any newly arrived merchant patches applied."""
+        if MERCHANT_PATCH_POLL >= 0 and time.monotonic() >= self._patch_due:
+            self.refresh_merchant_patches()
+        return self._columns
+
+    def refresh_merchant_patches(self) -> int:
+        """Apply merchant patches appended since the last check; returns rows patched."""
+        if not self._patch_lock.acquire(blocking=False):
+            return 0  # another thread is applying them
+        try:
+            self._patch_due = time.monotonic() + max(MERCHANT_PATCH_POLL, 0)
+            patches = self._patch_feed.poll()
+            if not patches:
+                return 0
+            store, rows = self._columns.apply_merchant_patches(patches)
+            self._columns = store
+            self._merchant_patches.update(patches)
+            if self._metadata is not None:
+                self._patch_records(self._metadata, patches)
+            print(f"[INIT] Applied {len(patches)} merchant patches ({rows} rows).")
+            return rows
+        finally:
+            self._patch_lock.release()
+
+    @staticmethod
+    def _patch_records(records: List[Dict[str, Any]], patches: Dict[str, Dict[str, Any]]) -> None:
+        for r in records:
+            p = patches.get(normalize_merchant(r.get("merchantName") or r.get("description") or "Unknown"))
+            if p is None:
+                continue
+            if p.get("merchant_name"):
+                r["merchantName"] = p["merchant_name"]
+            if p.get("cuisine") and not r.get("restaurantType"):
+                r["restaurantType"] = p["cuisine"]
+
+    @property
+    def metadata(self) -> List[Dict[str, Any]]:
+        """Raw transaction records (lazy: the hot path only uses columns)."""
+        if self._metadata is None:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                metadata = json.load(f)
+            self._patch_records(metadata, self._merchant_patches)
+            self._metadata = metadata
+        return self._metadata
+
+    def resident_bytes(self) -> int:
+        """Approximate memory held by this retriever (model excluded: it is shared)."""
+        size = sum(np.asarray(getattr(self.columns, name)).nbytes for name in ColumnStore.ARRAYS)
+        size += self.shards.nbytes()
+        if self._metadata is not None:
+            # Parsed JSON is several times its file size
+            size += 4 * os.path.getsize(self.meta_path)
+        return size
 
     # -----------------------------------------------------------------
     # Restaurant detection
     # -----------------------------------------------------------------
     def _is_restaurant(self, record: Dict[str, Any]) -> bool:
-        desc = (record.get("description") or "").lower()
-        cat = (record.get("category") or "").lower()
-
-        # Category-based
-        if "food" in cat or "drink" in cat:
-            return True
-
-        # Enriched merchantType (from merchant table)
-        rt = record.get("restaurantType")
-        if isinstance(rt, list) and rt:
-            return True
-        if isinstance(rt, str) and rt.strip():
-            return True
-
-        # Fallback keyword sniffing on description
-        restaurant_terms = [
-            "restaurant", "cafe", "bar", "grill", "taco", "pizza",
-            "pizzeria", "kitchen", "eatery", "burger", "bbq",
-            "brunch", "bistro", "brew", "donut", "doughnut"
-        ]
-        return any(t in desc for t in restaurant_terms)
+        return is_restaurant(record)
 
     # -----------------------------------------------------------------
     # Cuisine check
     # -----------------------------------------------------------------
     def _matches_cuisine(self, record: Dict[str, Any], cuisines: List[str]) -> bool:
-        if not cuisines:
-            return True
-
-        desc = (record.get("description") or "").lower()
-        rt = record.get("restaurantType")
-
-        if any(c in desc for c in cuisines):
-            return True
+        return matches_cuisine(record, cuisines)
 
-        if isinstance(rt, str):
-            rts = [rt.lower()]
-        elif isinstance(rt, list):
-            rts = [str(x).lower() for x in rt]
-        else:
-            rts = []
+    # -----------------------------------------------------------------
+    # FAISS candidates (single + batched)
+    # -----------------------------------------------------------------
+    def _search(self, questions: List[str], top_k: int) -> List[np.ndarray]:
+        """
+        One encode for all questions → row ids each. With shards, questions
+        are grouped by window and each group searches only its shards.
+        """
+        n = len(self.columns)
+        with span("encode"):
+            q_emb = self.model.encode(questions)
+            q_emb = np.array(q_emb).astype("float32")
 
-        for c in cuisines:
-            if any(c in t for t in rts):
-                return True
+        groups: Dict[Optional[tuple], List[int]] = {}
+        for i, q in enumerate(questions):
+            window = self._window_days(as_plan(q)) if len(self.shards.shards) > 1 else None
+            groups.setdefault(window, []).append(i)
+
+        out: List[np.ndarray] = [None] * len(questions)
+        with span("search"):
+            for window, idx in groups.items():
+                I = self.shards.search(q_emb[idx], min(top_k, n), window)
+                for i, ids in zip(idx, I):
+                    out[i] = ids[(ids >= 0) & (ids < n)]
+        return out
+
+    def _remember(self, key: tuple, ids: np.ndarray) -> None:
+        with self._candidates_lock:
+            self._candidates[key] = ids
+            self._candidates.move_to_end(key)
+            while len(self._candidates) > CANDIDATE_CACHE_SIZE:
+                self._candidates.popitem(last=False)
+
+    def _candidate_ids(self, question: str, top_k: int) -> np.ndarray:
+        key = (question, top_k)
+        with self._candidates_lock:
+            ids = self._candidates.get(key)
+            if ids is not None:
+                self._candidates.move_to_end(key)
+                return ids
+
+        ids = self._search([question], top_k)[0]
+        self._remember(key, ids)
+        return ids
+
+    def prefetch(self, questions: List[str], top_k: int = 300) -> None:
+        """
+        Batch the semantic search for several questions so subsequent
+        query() calls for them hit the candidate cache.
+        """
+        with self._candidates_lock:
+            todo = list(dict.fromkeys(
+                q for q in questions if (q, top_k) not in self._candidates
+            ))
+        if not todo:
+            return
+
+        for question, ids in zip(todo, self._search(todo, top_k)):
+            self._remember((question, top_k), ids)
+
+    def _restaurant_positions(self) -> np.ndarray:
+        """Positions of every restaurant row (shared by all restaurant scans)."""
+        cols = self.columns
+        cached = self._restaurant_rows
+        if cached is None or cached[0] is not cols:
+            cached = (cols, np.flatnonzero(cols.restaurant))
+            self._restaurant_rows = cached
+        return cached[1]
 
-        return False
+    # -----------------------------------------------------------------
+    # Time windows → contiguous slices of the date-sorted columns
+    # -----------------------------------------------------------------
+    def _anchor_day(self) -> int:
+        """"Today" for relative windows: AS_OF_DATE, else the last transaction date."""
+        anchor = anchor_from_env()
+        if anchor is not None:
+            return anchor
+        day = self.columns.day
+        return int(day[-1]) if len(day) and day[-1] >= 0 else date.today().toordinal()
+
+    def _window_days(self, plan: QueryPlan):
+        """[start_day, end_day) of the plan's window."""
+        return plan.window.compile(self._anchor_day())
+
+    def _window_slice(self, plan: QueryPlan):
+        """Column positions [lo, hi) covering the plan's window (undated rows sort first, below any start)."""
+        start, end = self._window_days(plan)
+        lo, hi = np.searchsorted(self.columns.day, [max(start, 0), end], side="left")
+        return int(lo), int(hi)
 
     # -----------------------------------------------------------------
-    # Core filtering iterator
+    # Core filtering (vectorized over the column store)
     # -----------------------------------------------------------------
-    def _iter_filtered_records(
+    @timed("filter")
+    def _select_positions(
         self,
-        question: str,
+        question: Union[str, QueryPlan],
         top_k: int = 300,
         restaurant_only: bool = False,
-    ):
+    ) -> np.ndarray:
         """
-        Core iterator that applies:
-          - FY25 window (Jan–Oct 2025)
-          - optional month/year filter from question
-          - optional YTD logic
+        Column positions that pass:
+          - the question's time window (default: the default fiscal year),
+            as one contiguous slice of the date-sorted columns
           - restaurant-only filter for restaurant queries
           - category/cuisine filters for non-restaurant queries
 
         IMPORTANT:
           • For restaurant_only=True we DO NOT use FAISS to prefilter.
-            We scan all metadata so counts match your SQL exactly.
+            We scan all rows so counts match your SQL exactly.
         """
 
-        q_lower = question.lower()
-        month, year = self._parse_month_year(q_lower)
-        ytd = self._is_ytd(q_lower)
-        cuisines = self._requested_cuisines(q_lower)
-        cats = self._requested_categories(q_lower)
+        plan = as_plan(question)
+        cuisines, cats = plan.cuisines, plan.categories
+        lo, hi = self._window_slice(plan)
 
-        # If only month mentioned, assume FY25
-        if month and not year:
-            year = FY25_YEAR
+        cols = self.columns
 
         # -------------------------------------------------------------
         # Candidate set
         # -------------------------------------------------------------
         if restaurant_only:
-            # Hard accuracy requirement → scan everything
-            candidate_indices = range(len(self.metadata))
+            # Hard accuracy requirement → every restaurant row in the window
+            rest = self._restaurant_positions()
+            pos = rest[np.searchsorted(rest, lo):np.searchsorted(rest, hi)]
+            mask = np.ones(len(pos), dtype=bool)
         else:
             # Use FAISS for general spend/category queries
-            q_emb = self.model.encode([question])
-            q_emb = np.array(q_emb).astype("float32")
-            top_k = min(top_k, len(self.metadata))
-            _, I = self.index.search(q_emb, top_k)
-            candidate_indices = I[0]
+            pos = cols.position[self._candidate_ids(plan.question, top_k)]
+            mask = (pos >= lo) & (pos < hi)
 
         # -------------------------------------------------------------
         # Apply filters
         # -------------------------------------------------------------
-        for i in candidate_indices:
-            if not (0 <= i < len(self.metadata)):
-                continue
-
-            r = self.metadata[i]
+        # Category filter for non-restaurant queries
+        if not restaurant_only and cats:
+            mask &= np.isin(cols.category[pos], cols.category_codes(cats))
 
-            date_raw = r.get("transactionDate")
-            if not date_raw:
-                continue
-
-            try:
-                d = datetime.strptime(date_raw.split("T")[0], "%Y-%m-%d")
-            except Exception:
-                continue
+        # Cuisine filter
+        if cuisines:
+            mask &= (cols.cuisine_mask[pos] & np.uint32(cuisine_bits(cuisines))) != 0
 
-            # FY25 window
-            if not (
-                d.year == FY25_YEAR
-                and FY25_MONTH_START <= d.month <= FY25_MONTH_END
-            ):
-                continue
-
-            # Month-specific vs YTD
-            if month and not ytd and d.month != month:
-                continue
-
-            if year and d.year != year:
-                continue
+        return pos[mask]
 
-            # Restaurant-only filter
-            if restaurant_only and not self._is_restaurant(r):
-                continue
-
-            # Category filter for non-restaurant queries
-            if not restaurant_only and cats:
-                rec_cat = (r.get("category") or "").lower()
-                if not any(c.lower() in rec_cat for c in cats):
-                    continue
-
-            # Cuisine filter
-            if cuisines and not self._matches_cuisine(r, cuisines):
-                continue
+    def _iter_filtered_records(
+        self,
+        question: Union[str, QueryPlan],
+        top_k: int = 300,
+        restaurant_only: bool = False,
+    ):
+        """Raw metadata records for the rows selected by _select_positions."""
+        metadata = self.metadata
+        for p in self._select_positions(question, top_k, restaurant_only):
+            yield metadata[self.columns.row_id[p]]
 
-            yield r
+    # -----------------------------------------------------------------
+    # Declarative aggregation over selected rows
+    # -----------------------------------------------------------------
+    def _debits(self, pos: np.ndarray):
+        """Keep spending rows only: (positions, positive spend amounts)."""
+        amt = self.columns.amount[pos]
+        # Negative amounts represent spending (NaN never passes)
+        debit = amt < 0
+        return pos[debit], -amt[debit]
+
+    def _dimension(self, dim: str, pos: np.ndarray, spend: np.ndarray):
+        cols = self.columns
+        if dim == "merchant":
+            return cols.merchant[pos], spend, cols.merchants
+        if dim == "category":
+            return cols.category[pos], spend, cols.categories
+        if dim == "cuisine":
+            codes, weights = cols.rtype_pairs(pos, spend)
+            return codes, weights, cols.rtypes
+        raise ValueError(f"Unknown group-by dimension: {dim}")
+
+    def aggregate(
+        self,
+        question: Union[str, QueryPlan],
+        groups: Optional[Dict[str, str]] = None,
+        measures: tuple = ("total_spend", "matches"),
+        group_measures: tuple = ("total_spend",),
+        top_n: int = 5,
+        restaurant_only: bool = False,
+        top_k: int = 300,
+    ) -> Dict[str, Any]:
+        """
+        Spend aggregation for the rows the question selects.
+
+        groups maps output keys to dimensions ("merchant", "category",
+        "cuisine"); each becomes a list of the top_n groups as rounded
+        dicts, e.g. groups={"top_categories": "category"} →
+        {"top_categories": [{"category": "Travel", "total_spend": 12.5}]}.
+        measures picks the overall figures ("total_spend", "matches",
+        "average_spend"); group_measures the per-group ones.
+        """
+        plan = as_plan(question)
+        pos, spend = self._debits(
+            self._select_positions(plan, top_k=top_k, restaurant_only=restaurant_only)
+        )
+        with span("aggregate"):
+            return self._aggregate_rows(plan, pos, spend, groups, measures, group_measures, top_n)
+
+    def _aggregate_rows(self, plan, pos, spend, groups, measures, group_measures, top_n):
+        total = float(spend.sum())
+        count = int(len(pos))
+
+        out: Dict[str, Any] = {"query": plan.question}
+        for m in measures:
+            if m == "total_spend":
+                out[m] = round(total, 2)
+            elif m == "matches":
+                out[m] = count
+            elif m == "average_spend":
+                out[m] = round(total / count, 2) if count else 0.0
+
+        for key, dim in (groups or {}).items():
+            codes, weights, labels = self._dimension(dim, pos, spend)
+            out[key] = top_rows(
+                codes, weights, labels, dim, top_n,
+                DIMENSION_DEFAULTS[dim], group_measures,
+            )
+        return out
 
     # -----------------------------------------------------------------
     # Restaurant spend (public)
     # -----------------------------------------------------------------
-    def get_restaurant_spend(self, question: str) -> Dict[str, Any]:
-        total = 0.0
-        count = 0
-        by_restaurant = defaultdict(float)
-        by_category = defaultdict(float)
-        by_cuisine = defaultdict(float)
-
-        # Iterate through all records with restaurant_only=True
-        for r in self._iter_filtered_records(question, restaurant_only=True):
-            amt_raw = r.get("amount", 0)
-            try:
-                amt = float(amt_raw)
-            except Exception:
-                continue
-
-            # Negative amounts represent spending
-            if amt >= 0:
-                continue
-            amt = -amt
-
-            total += amt
-            count += 1
-
-            name = r.get("merchantName") or r.get("description") or "Unknown"
-            by_restaurant[name] += amt
-
-            category = r.get("category") or "Uncategorized"
-            by_category[category] += amt
-
-            rt = r.get("restaurantType")
-            if isinstance(rt, list):
-                for t in rt:
-                    by_cuisine[str(t)] += amt
-            elif isinstance(rt, str) and rt.strip():
-                by_cuisine[rt] += amt
-
-        # Convert tuples → dicts
-        top_restaurants = [
-            {"merchant": name, "total_spend": round(amt, 2)}
-            for name, amt in sorted(
-                by_restaurant.items(), key=lambda x: x[1], reverse=True
-            )[:5]
-        ]
-
-        top_categories = [
-            {"category": name, "total_spend": round(amt, 2)}
-            for name, amt in sorted(
-                by_category.items(), key=lambda x: x[1], reverse=True
-            )[:5]
-        ]
-
-        top_cuisines = [
-            {"cuisine": name, "total_spend": round(amt, 2)}
-            for name, amt in sorted(
-                by_cuisine.items(), key=lambda x: x[1], reverse=True
-            )[:5]
-        ]
+    def get_restaurant_spend(self, question: Union[str, QueryPlan]) -> Dict[str, Any]:
+        data = self.aggregate(
+            question,
+            groups={
+                "top_restaurants": "merchant",
+                "top_categories": "category",
+                "top_cuisines": "cuisine",
+            },
+            restaurant_only=True,
+        )
 
         # Final normalized return object
         return {
-            "query": question,
+            "query": data["query"],
 
             # legacy fields
-            "matches": count,
-            "total": round(total, 2),
+            "matches": data["matches"],
+            "total": data["total_spend"],
 
             # new normalized fields for UI
-            "total_restaurant_spend": round(total, 2),
-            "total_visits": count,
+            "total_restaurant_spend": data["total_spend"],
+            "total_visits": data["matches"],
 
-            "top_restaurants": top_restaurants,
-            "top_categories": top_categories,
-            "top_cuisines": top_cuisines,
+            "top_restaurants": data["top_restaurants"],
+            "top_categories": data["top_categories"],
+            "top_cuisines": data["top_cuisines"],
         }
 
     # -----------------------------------------------------------------
     # Generic query (debug / non-restaurant)
     # -----------------------------------------------------------------
-    def query(self, question: str, top_k: int = 300) -> Dict[str, Any]:
-        total = 0.0
-        count = 0
-        by_merchant = defaultdict(float)
-        by_category = defaultdict(float)
-        by_cuisine = defaultdict(float)
-
-        for r in self._iter_filtered_records(
-            question, top_k=top_k, restaurant_only=False
-        ):
-            amt_raw = r.get("amount", 0)
-            try:
-                amt = float(amt_raw)
-            except Exception:
-                continue
+    def query(self, question: Union[str, QueryPlan], top_k: int = 300) -> Dict[str, Any]:
+        """Legacy shape: top lists as (name, amount) pairs."""
+        data = self.aggregate(
+            question,
+            groups={
+                "top_merchants": "merchant",
+                "top_categories": "category",
+                "top_cuisines": "cuisine",
+            },
+            top_k=top_k,
+        )
+
+        for key, dim in (("top_merchants", "merchant"),
+                         ("top_categories", "category"),
+                         ("top_cuisines", "cuisine")):
+            data[key] = [(row[dim], row["total_spend"]) for row in data[key]]
+        return data
 
-            if amt >= 0:
-                continue
-            amt = -amt
+    # -----------------------------------------------------------------
+    # Period comparison (monthly rollups)
+    # -----------------------------------------------------------------
+    @timed("aggregate")
+    def compare_periods(self, question: Union[str, QueryPlan], top_n: int = 5) -> Dict[str, Any]:
+        """
+        Totals per requested month/quarter plus category and merchant
+        deltas between the first and last period, read from the monthly
+        rollup: O(months x groups), no row scan and no FAISS search.
+
+        With a single period it is compared to the one before it; with
+        none, the two most recent months with data are compared. A
+        category named in the question restricts totals and category
+        deltas to it (merchant deltas are then omitted).
+        """
+        plan = as_plan(question)
+        cols = self.columns
+        rollup = cols.monthly_rollup()
+
+        periods = [(label, list(yms)) for label, yms in plan.periods]
+        if len(periods) == 1:
+            label, yms = periods[0]
+            n_months = len(yms)
+            prev = [ym - n_months for ym in yms]
+            prev_label = ym_label(prev[0]) if n_months == 1 else f"Q{prev[0] % 12 // 3 + 1} {prev[0] // 12}"
+            periods = [(prev_label, prev), (label, yms)]
+        elif not periods:
+            recent = rollup.months[-2:].tolist()
+            periods = [(ym_label(ym), [ym]) for ym in recent]
+
+        cats = list(plan.categories)
+        cat_codes = cols.category_codes(cats) if cats else None
+
+        summaries = []
+        cat_vectors = []
+        merch_vectors = []
+        for label, yms in periods:
+            rows = rollup.rows(yms)
+            by_cat = rollup.by_category[rows].sum(axis=0)
+            if cat_codes is not None:
+                keep = np.zeros(len(by_cat), dtype=bool)
+                keep[cat_codes] = True
+                by_cat = np.where(keep, by_cat, 0.0)
+                total = float(by_cat.sum())
+                count = int(rollup.count_by_category[rows][:, cat_codes].sum())
+            else:
+                total = float(rollup.total[rows].sum())
+                count = int(rollup.count[rows].sum())
+                merch_vectors.append(rollup.by_merchant[rows].sum(axis=0))
+            cat_vectors.append(by_cat)
+            summaries.append({
+                "period": label,
+                "total_spend": round(total, 2),
+                "matches": count,
+            })
+
+        def deltas(vectors, labels, key, default=""):
+            if len(vectors) < 2:
+                return []
+            first, last = vectors[0], vectors[-1]
+            diff = last - first
+            changed = np.flatnonzero(np.abs(diff) >= 0.005)
+            order = changed[np.argsort(-np.abs(diff[changed]), kind="stable")][:top_n]
+            return [
+                {
+                    key: labels[i] or default,
+                    "from": round(float(first[i]), 2),
+                    "to": round(float(last[i]), 2),
+                    "delta": round(float(diff[i]), 2),
+                }
+                for i in order
+            ]
+
+        first_total = summaries[0]["total_spend"] if summaries else 0.0
+        last_total = summaries[-1]["total_spend"] if summaries else 0.0
+        delta = round(last_total - first_total, 2)
 
-            total += amt
-            count += 1
+        return {
+            "query": plan.question,
+            "periods": summaries,
+            "categories": cats,
+            "delta": delta,
+            "pct_change": round(delta / first_total * 100, 1) if first_total else None,
+            "category_deltas": deltas(cat_vectors, cols.categories, "category", "Uncategorized"),
+            "merchant_deltas": deltas(merch_vectors, cols.merchants, "merchant"),
+        }
 
-            merchant = r.get("merchantName") or r.get("description") or "Unknown"
-            by_merchant[merchant] += amt
+    # -----------------------------------------------------------------
+    # Large purchases (amount-sorted index)
+    # -----------------------------------------------------------------
+    @staticmethod
+    def _whole_months(start: int, end: int) -> Optional[List[int]]:
+        """ym keys when [start, end) is made of whole months, else None."""
+        s, e = date.fromordinal(start), date.fromordinal(end)
+        if s.day != 1 or e.day != 1:
+            return None
+        return list(range(s.year * 12 + s.month - 1, e.year * 12 + e.month - 1))
+
+    def _ranked_debits(self, lo: int, hi: int, n: Optional[int] = None) -> np.ndarray:
+        """Debit positions in [lo, hi), largest first (only the n largest when given)."""
+        amt = self.columns.amount[lo:hi]
+        pos = np.flatnonzero(amt < 0) + lo
+        spend = -self.columns.amount[pos]
+        if n is not None and len(pos) > n:
+            keep = np.argpartition(-spend, n - 1)[:n]
+            pos, spend = pos[keep], spend[keep]
+        return pos[np.argsort(-spend, kind="stable")]
+
+    @timed("aggregate")
+    def large_purchases(self, question: Union[str, QueryPlan], top_n: int = 10) -> Dict[str, Any]:
+        """
+        Largest debits in the window, in one of three modes:
+          - "threshold":  everything above an amount ("over $500")
+          - "percentile": everything above the window's p-th percentile
+          - "top":        the N largest ("top 10", default top_n)
+        """
+        plan = as_plan(question)
+        cols = self.columns
+        start, end = self._window_days(plan)
+        yms = self._whole_months(start, end)
+
+        threshold = plan.threshold
+        pct = plan.percentile
+        n = plan.count or top_n
+
+        if yms is None:
+            # Partial months (e.g. "last 30 days", "to date"): rank the
+            # window's slice directly instead of the per-month index.
+            lo, hi = self._window_slice(plan)
+            if pct is not None:
+                mode = "percentile"
+                ranked = self._ranked_debits(lo, hi)
+                spend = -cols.amount[ranked]
+                threshold = float(np.percentile(spend, pct)) if len(spend) else None
+                pos = ranked[spend > threshold] if threshold is not None else ranked[:0]
+            elif threshold is not None:
+                mode = "threshold"
+                ranked = self._ranked_debits(lo, hi)
+                pos = ranked[-cols.amount[ranked] > threshold]
+            else:
+                mode = "top"
+                pos = self._ranked_debits(lo, hi, n)
+        elif pct is not None:
+            amounts = cols.amount_index()
+            mode = "percentile"
+            threshold = amounts.percentile(yms, pct)
+            pos = amounts.above(yms, threshold) if threshold is not None else np.empty(0, dtype=np.int64)
+        elif threshold is not None:
+            mode = "threshold"
+            pos = cols.amount_index().above(yms, threshold)
+        else:
+            mode = "top"
+            pos = cols.amount_index().top(yms, n)
+
+        spend = -cols.amount[pos]
+        listed = pos[:MAX_LISTED_PURCHASES]
+
+        purchases = [
+            {
+                "date": date.fromordinal(int(cols.day[p])).isoformat(),
+                "merchant": cols.raw_merchants[cols.merchant_raw[p]],
+                "category": cols.categories[cols.category[p]] or "Uncategorized",
+                "amount": round(float(-cols.amount[p]), 2),
+            }
+            for p in listed
+        ]
 
-            category = r.get("category") or "Uncategorized"
-            by_category[category] += amt
+        return {
+            "query": plan.question,
+            "mode": mode,
+            "window": [plan.window.label],
+            "start": date.fromordinal(start).isoformat(),
+            "end": date.fromordinal(end - 1).isoformat(),
+            "threshold": round(threshold, 2) if threshold is not None else None,
+            "percentile": pct,
+            "matches": int(len(pos)),
+            "total_spend": round(float(spend.sum()), 2),
+            "purchases": purchases,
+        }
+
+    # -----------------------------------------------------------------
+    # Recurring charges / subscriptions
+    # -----------------------------------------------------------------
+    def _recurring_all(self) -> List[Dict[str, Any]]:
+        """Detector output for the whole history, cached per data version."""
+        version = self.columns.version
+        cached = self._recurring
+        if cached is None or cached[0] != version:
+            cached = (version, detect_recurring(self.columns))
+            self._recurring = cached
+        return cached[1]
+
+    @timed("aggregate")
+    def recurring_merchants(self, question: Union[str, QueryPlan]) -> Dict[str, Any]:
+        """
+        Recurring merchants, optionally limited to those active (first to
+        last charge) during the window named in the question.
+        """
+        plan = as_plan(question)
+        found = self._recurring_all()
 
-            rt = r.get("restaurantType")
-            if isinstance(rt, list):
-                for t in rt:
-                    by_cuisine[str(t)] += amt
-            elif isinstance(rt, str) and rt.strip():
-                by_cuisine[rt] += amt
+        if not plan.window.default:
+            start, end = (date.fromordinal(d).isoformat() for d in self._window_days(plan))
+            found = [r for r in found if r["first_charge"] < end and r["last_charge"] >= start]
 
         return {
-            "query": question,
-            "matches": count,
-            "total_spend": round(total, 2),
-            "top_merchants": sorted(
-                by_merchant.items(), key=lambda x: x[1], reverse=True
-            )[:5],
-            "top_categories": sorted(
-                by_category.items(), key=lambda x: x[1], reverse=True
-            )[:5],
-            "top_cuisines": sorted(
-                by_cuisine.items(), key=lambda x: x[1], reverse=True
-            )[:5],
+            "query": plan.question,
+            "matches": len(found),
+            "total_monthly": round(sum(r["annualized"] for r in found) / 12.0, 2),
+            "recurring": found,
         }
 
 
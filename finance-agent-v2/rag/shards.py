@@ -0,0 +1,194 @@
+"""
+Time-partitioned FAISS shards.
+
+The builder can write one shard per year or per quarter instead of a
+single faiss.index:
+
+    <index dir>/metadata.json          all rows, shard by shard (columns source)
+    <index dir>/shards/manifest.json   shard list, in time order
+    <index dir>/shards/<key>/faiss.index
+    <index dir>/shards/<key>/metadata.json
+
+Shard i holds rows [offset, offset + rows) of the combined metadata.json,
+so a FAISS id maps to a global row id by adding the shard offset. Shards
+that lie entirely before the current partition are sealed: later builds
+reuse them as-is and only re-encode the current one.
+
+At query time the retriever searches only the shards overlapping the
+question's [start_day, end_day) window, in parallel threads (FAISS
+releases the GIL), and merges the per-shard top-k by distance.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+SHARDS_DIR = "shards"
+SHARD_MANIFEST = "manifest.json"
+SHARDS_FORMAT = 1
+UNDATED_SHARD = "undated"
+
+SHARD_SEARCH_THREADS = int(os.getenv("SHARD_SEARCH_THREADS", str(min(4, os.cpu_count() or 1))))
+
+
+# ---------------------------------------------------------------------
+# Partitioning
+# ---------------------------------------------------------------------
+def partition_key(day: int, partition: str) -> str:
+    """"2025" (year) or "2025-Q3" (quarter) for a date ordinal; undated → "undated"."""
+    if day < 0:
+        return UNDATED_SHARD
+    d = date.fromordinal(day)
+    if partition == "quarter":
+        return f"{d.year}-Q{(d.month - 1) // 3 + 1}"
+    return str(d.year)
+
+
+def partition_bounds(key: str) -> Tuple[Optional[int], Optional[int]]:
+    """[start_day, end_day) of a partition key (None, None for undated)."""
+    if key == UNDATED_SHARD:
+        return None, None
+    if "-Q" in key:
+        year, q = key.split("-Q")
+        first = (int(q) - 1) * 3 + 1
+        start = date(int(year), first, 1)
+        end = date(int(year) + (first + 3 > 12), (first + 2) % 12 + 1, 1)
+        return start.toordinal(), end.toordinal()
+    year = int(key)
+    return date(year, 1, 1).toordinal(), date(year + 1, 1, 1).toordinal()
+
+
+def shards_root(index_dir: str) -> str:
+    return os.path.join(index_dir, SHARDS_DIR)
+
+
+def read_manifest(index_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(shards_root(index_dir), SHARD_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SHARDS_FORMAT:
+        print(f"[WARN] Ignoring shard manifest with format {manifest.get('format')}: {path}")
+        return None
+    return manifest
+
+
+def write_manifest(index_dir: str, manifest: Dict[str, Any]) -> None:
+    path = os.path.join(shards_root(index_dir), SHARD_MANIFEST)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def read_index(path: str, mmap: bool = False):
+    """Read a FAISS index, memory-mapping it when requested and supported."""
+    if mmap:
+        flag = getattr(faiss, "IO_FLAG_MMAP", None)
+        if flag is not None:
+            try:
+                return faiss.read_index(path, flag | getattr(faiss, "IO_FLAG_READ_ONLY", 0))
+            except RuntimeError as e:
+                print(f"[WARN] FAISS mmap not supported for {path} ({e}); reading into RAM.")
+    return faiss.read_index(path)
+
+
+# ---------------------------------------------------------------------
+# Query side
+# ---------------------------------------------------------------------
+@dataclass
+class Shard:
+    key: str
+    start: Optional[int]
+    end: Optional[int]
+    offset: int
+    index: Any
+    path: str
+
+    def overlaps(self, start: int, end: int) -> bool:
+        if self.start is None:
+            # Unpartitioned index covers everything; undated rows never
+            # fall inside a window.
+            return self.key != UNDATED_SHARD
+        return self.start < end and start < self.end
+
+
+class ShardSet:
+    """
+    The FAISS side of a retriever: one or more shards searched as one.
+    A plain faiss.index is a single shard that covers every window.
+    """
+
+    def __init__(self, shards: List[Shard]):
+        self.shards = shards
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, SHARD_SEARCH_THREADS),
+            thread_name_prefix="shard-search",
+        ) if len(shards) > 1 else None
+
+    @classmethod
+    def open(cls, index_dir: str, index_path: str, mmap: bool = False) -> "ShardSet":
+        """Shards from index_dir's manifest, else the single index at index_path."""
+        manifest = read_manifest(index_dir)
+        if manifest is None:
+            return cls([Shard("all", None, None, 0, read_index(index_path, mmap=mmap), index_path)])
+
+        root = shards_root(index_dir)
+        shards = []
+        for entry in manifest["shards"]:
+            path = os.path.join(root, entry["key"], "faiss.index")
+            start, end = partition_bounds(entry["key"])
+            shards.append(Shard(entry["key"], start, end, int(entry["offset"]),
+                                read_index(path, mmap=mmap), path))
+        print(f"[INIT] FAISS shards: {len(shards)} ({manifest.get('partition')})")
+        return cls(shards)
+
+    @staticmethod
+    def exists(index_dir: str, index_path: str) -> bool:
+        return read_manifest(index_dir) is not None or os.path.exists(index_path)
+
+    def nbytes(self) -> int:
+        return sum(os.path.getsize(s.path) for s in self.shards)
+
+    def search(self, q_emb: np.ndarray, top_k: int,
+               window: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        Global row ids of the top_k nearest rows per query (-1 padded),
+        searching only the shards overlapping window.
+        """
+        shards = [s for s in self.shards if window is None or s.overlaps(*window)]
+        if not shards:
+            return np.full((len(q_emb), 0), -1, dtype=np.int64)
+
+        def one(shard: Shard):
+            k = min(top_k, shard.index.ntotal)
+            if k <= 0:
+                return None
+            D, I = shard.index.search(q_emb, k)
+            return D, np.where(I >= 0, I + shard.offset, -1)
+
+        if len(shards) == 1 or self._pool is None:
+            parts = [one(s) for s in shards]
+        else:
+            parts = list(self._pool.map(one, shards))
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return np.full((len(q_emb), 0), -1, dtype=np.int64)
+        if len(parts) == 1:
+            return parts[0][1]
+
+        # Merge: top_k smallest distances across shards, per query
+        D = np.concatenate([p[0] for p in parts], axis=1)
+        I = np.concatenate([p[1] for p in parts], axis=1)
+        D = np.where(I >= 0, D, np.inf)
+        k = min(top_k, D.shape[1])
+        best = np.argpartition(D, k - 1, axis=1)[:, :k]
+        order = np.take_along_axis(D, best, axis=1).argsort(axis=1, kind="stable")
+        return np.take_along_axis(I, np.take_along_axis(best, order, axis=1), axis=1)
@@ -0,0 +1,167 @@
+"""
+Per-request stage timings.
+
+Each API request gets a Trace; the retriever, handlers and orchestrator
+record spans into it ("queue", "retriever", "plan", "route", "handler",
+"filter", "encode", "search", "aggregate", "serialize"). The API returns
+them as a Server-Timing header, optionally as a _timings field, and feeds
+them into per-intent histograms served at /metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# ---------------------------------------------------------------------
+# Per-request traces
+# ---------------------------------------------------------------------
+# span()/timed() record into whichever trace is active in the thread —
+# a no-op when there is none, so the retriever and handlers can be
+# instrumented unconditionally.
+#
+# Spans nest: "handler" contains "filter", which contains "encode" and
+# "search". Stages that run several times (batch) are summed.
+_current: ContextVar[Optional["Trace"]] = ContextVar("finance_agent_trace", default=None)
+
+
+class Trace:
+    def __init__(self):
+        self.created = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.spans.append((stage, seconds))
+
+    def extend(self, spans: List[Tuple[str, float]]) -> None:
+        self.spans.extend(spans)
+
+    def totals(self) -> Dict[str, float]:
+        """Seconds per stage, in first-seen order."""
+        out: Dict[str, float] = {}
+        for stage, seconds in self.spans:
+            out[stage] = out.get(stage, 0.0) + seconds
+        return out
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milliseconds per stage (the optional _timings field)."""
+        return {stage: round(s * 1000.0, 3) for stage, s in self.totals().items()}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.created
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Server-Timing header value: "route;dur=0.12, search;dur=3.40, ..."."""
+        stages = self.totals()
+        if total is not None:
+            stages["total"] = total
+        return ", ".join(f"{stage};dur={s * 1000.0:.2f}" for stage, s in stages.items())
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextmanager
+def activate(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Make trace the active one in this thread."""
+    if trace is None:
+        yield None
+        return
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def call_with_trace(trace: Optional[Trace], fn, *args, **kwargs):
+    """
+    Run fn with trace active, recording the time since the trace was
+    created as "queue". For executor threads, which don't inherit context.
+    """
+    if trace is not None:
+        trace.add("queue", time.perf_counter() - trace.created)
+    with activate(trace):
+        return fn(*args, **kwargs)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.perf_counter() - started)
+
+
+def timed(stage: str):
+    """Decorator form of span()."""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+# ---------------------------------------------------------------------
+# Per-intent, per-stage histograms (Prometheus text format)
+# ---------------------------------------------------------------------
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_NAME = "finance_agent_stage_seconds"
+
+
+class StageHistograms:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # (intent, stage) → [bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, str], List[int]] = {}
+        self._sums: Dict[Tuple[str, str], float] = {}
+
+    def observe(self, intent: str, trace: Trace, total: Optional[float] = None) -> None:
+        stages = trace.totals()
+        if total is not None:
+            stages["total"] = total
+        with self._lock:
+            for stage, seconds in stages.items():
+                key = (intent or "unknown", stage)
+                counts = self._counts.get(key)
+                if counts is None:
+                    counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                    self._sums[key] = 0.0
+                for i, le in enumerate(self.buckets):
+                    if seconds <= le:
+                        counts[i] += 1
+                counts[-1] += 1
+                self._sums[key] += seconds
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent per request stage, by intent.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            for (intent, stage), counts in sorted(self._counts.items()):
+                labels = f'intent="{_escape(intent)}",stage="{_escape(stage)}"'
+                for le, n in zip(self.buckets, counts):
+                    lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{le:g}"}} {n}')
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {counts[-1]}')
+                lines.append(f"{METRIC_NAME}_sum{{{labels}}} {self._sums[(intent, stage)]:.6f}")
+                lines.append(f"{METRIC_NAME}_count{{{labels}}} {counts[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_histograms = StageHistograms()
@@ -0,0 +1,215 @@
+"""
+Incremental transaction sync.
+
+Consumers of the Transaction API used to download the full history on
+every run. TransactionSync keeps a local snapshot per API URL
+(TXN_SNAPSHOT_DIR) with the response validators and a watermark (max
+id, max postDate), and on each sync:
+
+  * sends If-None-Match / If-Modified-Since, so an unchanged history
+    costs a 304 and no payload;
+  * with TXN_DELTA_PARAM=since_id asks for ?since_id=<max id>, with
+    TXN_DELTA_PARAM=since for ?since=<max postDate - TXN_SINCE_DAYS>
+    (late-posting rows are re-read); otherwise fetches the full list;
+  * merges the response into the snapshot by transaction id and reports
+    which rows are new or changed (and, for full fetches, removed).
+
+SyncResult.rows is the full, merged history; SyncResult.changed is what
+downstream stages that only need new work (enrichment) should process.
+Each consumer names its own snapshot, so one consumer advancing its
+watermark never hides changes from another. A consumer that must finish
+its work before the watermark moves syncs with save=False and calls
+save() once it has.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from rag.http_client import async_client, session
+
+TXN_SNAPSHOT_DIR = os.getenv("TXN_SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "cache"))
+TXN_DELTA_PARAM = os.getenv("TXN_DELTA_PARAM", "")        # "since_id" | "since" | "" (full)
+TXN_SINCE_DAYS = int(os.getenv("TXN_SINCE_DAYS", "7"))    # overlap for since= deltas
+TXN_SYNC_MIN_INTERVAL = float(os.getenv("TXN_SYNC_MIN_INTERVAL", "0"))  # seconds
+TXN_SYNC_TIMEOUT = float(os.getenv("TXN_SYNC_TIMEOUT", "120"))  # full export; host may cold-start
+
+SNAPSHOT_FORMAT = 1
+
+
+@dataclass
+class SyncResult:
+    rows: List[Dict[str, Any]]
+    changed: List[Dict[str, Any]] = field(default_factory=list)
+    removed: int = 0
+    not_modified: bool = False
+    delta: bool = False
+    fetched: int = 0
+
+    def summary(self) -> str:
+        if self.not_modified:
+            return f"Transactions unchanged ({len(self.rows)} in snapshot)."
+        mode = "delta" if self.delta else "full"
+        return (f"Fetched {self.fetched} transactions ({mode}): {len(self.changed)} new/changed, "
+                f"{self.removed} removed, {len(self.rows)} total.")
+
+
+def row_key(t: Dict[str, Any]) -> str:
+    tid = t.get("id")
+    if tid is not None:
+        return str(tid)
+    return "|".join(str(t.get(k, "")) for k in ("transactionDate", "description", "amount"))
+
+
+def post_date(t: Dict[str, Any]) -> str:
+    return str(t.get("postDate") or t.get("transactionDate") or t.get("date") or "")[:10]
+
+
+def _as_rows(data: Any) -> List[Dict[str, Any]]:
+    if isinstance(data, dict) and "items" in data:
+        data = data["items"]
+    if not isinstance(data, list):
+        raise ValueError("Unexpected response from Transaction API")
+    return data
+
+
+class TransactionSync:
+    def __init__(
+        self,
+        url: str,
+        name: str = "default",
+        headers: Optional[Dict[str, str]] = None,
+        snapshot_dir: str = TXN_SNAPSHOT_DIR,
+        delta_param: str = TXN_DELTA_PARAM,
+        since_days: int = TXN_SINCE_DAYS,
+        min_interval: float = TXN_SYNC_MIN_INTERVAL,
+    ):
+        self.url = url
+        self.headers = dict(headers or {})
+        self.delta_param = delta_param
+        self.since_days = since_days
+        self.min_interval = min_interval
+        digest = hashlib.sha1(url.encode()).hexdigest()[:12]
+        self.path = os.path.join(snapshot_dir, f"transactions_{name}_{digest}.json")
+        self._lock = threading.Lock()
+        self._alock: Optional[asyncio.Lock] = None
+        self._state = self._load()
+
+    # -----------------------------------------------------------------
+    # Snapshot
+    # -----------------------------------------------------------------
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("format") == SNAPSHOT_FORMAT and state.get("url") == self.url:
+                return state
+            print(f"[WARN] Ignoring incompatible transaction snapshot: {self.path}")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring unreadable transaction snapshot {self.path}: {e}")
+        return {"format": SNAPSHOT_FORMAT, "url": self.url, "rows": []}
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.path)
+
+    @property
+    def rows(self) -> List[Dict[str, Any]]:
+        return self._state["rows"]
+
+    def watermark(self) -> Tuple[Optional[int], str]:
+        ids = [t["id"] for t in self.rows if isinstance(t.get("id"), int)]
+        return (max(ids) if ids else None), max((post_date(t) for t in self.rows), default="")
+
+    # -----------------------------------------------------------------
+    # Request / merge (shared by the blocking and async paths)
+    # -----------------------------------------------------------------
+    def _fresh(self) -> bool:
+        return bool(self.rows) and time.time() - self._state.get("synced_at", 0) < self.min_interval
+
+    def _request(self) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        headers = dict(self.headers)
+        params: Dict[str, Any] = {}
+        if not self.rows:
+            return params, headers
+        if self._state.get("etag"):
+            headers["If-None-Match"] = self._state["etag"]
+        if self._state.get("last_modified"):
+            headers["If-Modified-Since"] = self._state["last_modified"]
+
+        max_id, max_post = self.watermark()
+        if self.delta_param == "since_id" and max_id is not None:
+            params["since_id"] = max_id
+        elif self.delta_param == "since" and max_post:
+            since = date.fromisoformat(max_post) - timedelta(days=self.since_days)
+            params["since"] = since.isoformat()
+        return params, headers
+
+    def _apply(self, status: int, headers, data: Any, delta: bool, save: bool = True) -> SyncResult:
+        self._state["synced_at"] = time.time()
+        if status == 304:
+            if save:
+                self.save()
+            return SyncResult(rows=self.rows, not_modified=True, delta=delta)
+
+        incoming = _as_rows(data)
+        current = {row_key(t): t for t in self.rows}
+        changed = [t for t in incoming if current.get(row_key(t)) != t]
+
+        removed = 0
+        if delta:
+            for t in changed:
+                current[row_key(t)] = t
+            rows = list(current.values())
+        else:
+            removed = len(current.keys() - {row_key(t) for t in incoming})
+            rows = incoming
+
+        self._state["rows"] = rows
+        self._state["etag"] = headers.get("ETag")
+        self._state["last_modified"] = headers.get("Last-Modified")
+        max_id, max_post = self.watermark()
+        self._state["watermark"] = {"max_id": max_id, "max_post_date": max_post}
+        if save:
+            self.save()
+        return SyncResult(rows=rows, changed=changed, removed=removed, delta=delta, fetched=len(incoming))
+
+    # -----------------------------------------------------------------
+    # Sync
+    # -----------------------------------------------------------------
+    def sync(self, save: bool = True) -> SyncResult:
+        """Bring the snapshot up to date (blocking); save=False defers persisting it."""
+        with self._lock:
+            if self._fresh():
+                return SyncResult(rows=self.rows, not_modified=True)
+            params, headers = self._request()
+            r = session().get(self.url, params=params or None, headers=headers, timeout=TXN_SYNC_TIMEOUT)
+            if r.status_code != 304:
+                r.raise_for_status()
+            data = None if r.status_code == 304 else r.json()
+            return self._apply(r.status_code, r.headers, data, bool(params), save)
+
+    async def async_sync(self) -> SyncResult:
+        """Bring the snapshot up to date without blocking the event loop."""
+        if self._alock is None:
+            self._alock = asyncio.Lock()
+        async with self._alock:
+            if self._fresh():
+                return SyncResult(rows=self.rows, not_modified=True)
+            params, headers = self._request()
+            r = await async_client().get(self.url, params=params or None, headers=headers, timeout=TXN_SYNC_TIMEOUT)
+            if r.status_code != 304:
+                r.raise_for_status()
+            data = None if r.status_code == 304 else await asyncio.to_thread(r.json)
+            return await asyncio.to_thread(self._apply, r.status_code, r.headers, data, bool(params))
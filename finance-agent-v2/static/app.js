@@ -194,7 +194,11 @@ function renderDetails(response) {
     categories.slice(0, 5).forEach((c) => {
       const name = c.category ?? c[0];
       const amt = c.total_spend ?? c[1];
-      lines.push(` • ${name}: $${amt.toFixed(2)}`);
+      const change =
+        typeof c.delta === "number"
+          ? ` (${c.delta >= 0 ? "+" : "-"}$${Math.abs(c.delta).toFixed(2)})`
+          : "";
+      lines.push(` • ${name}: $${amt.toFixed(2)}${change}`);
     });
   }
 
@@ -234,6 +238,87 @@ function renderDetails(response) {
 // --------------------------------------------------
 // Backend call
 // --------------------------------------------------
+
+// Apply one NDJSON event from /ask/stream to the partial response
+function applyStreamEvent(response, event) {
+  switch (event.event) {
+    case "intent":
+      response.intent = event.intent;
+      renderSummary({ intent: event.intent, answer: "Working on it..." });
+      setStatus("loading", `Intent: ${event.intent}`);
+      break;
+    case "answer":
+    case "error":
+      response.intent = event.intent;
+      response.answer = event.answer;
+      if (event.details) response.details = event.details;
+      renderSummary(response);
+      break;
+    case "details":
+      response.details = event.details;
+      renderDetails(response);
+      break;
+    case "chart":
+      response.chart = event.chart;
+      renderChart(response);
+      break;
+    case "data":
+      response.data = event.data;
+      renderDetails(response);
+      if (!response.chart) renderChart(response);
+      break;
+  }
+}
+
+async function askAgentStream(question) {
+  const res = await fetch("/ask/stream?view=slim", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ question }),
+  });
+
+  if (!res.ok || !res.body || !res.body.getReader) {
+    return null;
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  const response = { details: {}, chart: null, data: {} };
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    let newline;
+    while ((newline = buffer.indexOf("\n")) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) applyStreamEvent(response, JSON.parse(line));
+    }
+  }
+
+  if (buffer.trim()) applyStreamEvent(response, JSON.parse(buffer));
+  return response;
+}
+
+async function askAgentJson(question) {
+  const res = await fetch("/ask?view=slim", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ question }),
+  });
+
+  const payload = await res.json();
+
+  renderSummary(payload);
+  renderDetails(payload);
+  renderChart(payload);
+
+  return payload;
+}
+
 async function askAgent(question) {
   if (!question) return;
 
@@ -241,20 +326,12 @@ async function askAgent(question) {
   askButton.disabled = true;
 
   try {
-    const res = await fetch("/ask", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ question }),
-    });
-
-    const payload = await res.json();
+    // Progressive rendering when streaming is available, plain JSON otherwise
+    const payload =
+      (await askAgentStream(question)) || (await askAgentJson(question));
     console.log("API response:", payload);
 
-    renderSummary(payload);
-    renderDetails(payload);
-    renderChart(payload);
-
-    setStatus("success", "Done");
+    setStatus(payload.intent === "error" ? "error" : "success", "Done");
   } catch (err) {
     console.error(err);
     setStatus("error", "Backend error");
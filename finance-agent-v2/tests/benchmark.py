@@ -0,0 +1,315 @@
+"""
+Finance-Agent Latency Benchmark
+-------------------------------
+Replays the questions in FinanceAgent_FY25_TestSuite.csv (Test Question 1
+and 2 of every row) and reports, per phase:
+
+- throughput (requests/s) and error count
+- p50 / p95 / p99 latency overall and per intent
+- per-stage p50 / p95 (from the agent's stage timings)
+
+The first pass over the suite is "cold" (fresh plan/candidate caches, and
+in-process also the FinanceAgent start-up); the following --rounds passes
+are "warm". Results are written as JSON so runs can be compared between
+commits (--compare).
+
+Usage:
+  In-process, against FinanceAgent.analyze:
+        python tests/benchmark.py --concurrency 4
+  Over HTTP, against a running API:
+        uvicorn app:app --workers 1
+        python tests/benchmark.py --mode http --url http://127.0.0.1:8000/ask --rate 20
+  Compare with an earlier run:
+        python tests/benchmark.py --compare tests/results/bench_20250101_120000.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# ===================== CONFIG =====================
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+TEST_SUITE_PATH = Path(os.environ.get(
+    "BENCH_SUITE", BASE_DIR / "rag-agent-ui" / "FinanceAgent_FY25_TestSuite.csv"))
+API_URL = os.environ.get("FINANCE_AGENT_API_URL", "http://127.0.0.1:8000/ask")
+API_KEY = os.environ.get("FINANCE_AGENT_API_KEY", "")  # needed for non-default tenants
+RESULTS_DIR = BASE_DIR / "tests" / "results"
+
+REQUEST_TIMEOUT = 60      # seconds (HTTP mode)
+PERCENTILES = (50, 95, 99)
+
+# ==================================================
+
+
+def load_questions(path: Path):
+    """(expected intent, question) for both test questions of every row."""
+    if not path.exists():
+        raise FileNotFoundError(f"Test suite CSV not found at: {path}")
+    out = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            expected = (row.get("Intent Category") or "").strip()
+            for col in ("Test Question 1", "Test Question 2"):
+                q = (row.get(col) or "").strip()
+                if q:
+                    out.append((expected, q))
+    return out
+
+
+def parse_server_timing(header: str):
+    """{"route": 0.00012, ...} in seconds from a Server-Timing header."""
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.startswith("dur="):
+            try:
+                stages[name] = float(params[4:]) / 1000.0
+            except ValueError:
+                pass
+    return stages
+
+
+# ---------------------------------------------------------------------
+# Targets: one call → (intent, ok, {stage: seconds})
+# ---------------------------------------------------------------------
+class InProcessTarget:
+    def __init__(self, tenant=None):
+        from orchestrator.orchestrator import FinanceAgent
+        from rag.timing import Trace, call_with_trace
+
+        self._trace = Trace
+        self._call = call_with_trace
+        self.tenant = tenant
+        started = time.perf_counter()
+        self.agent = FinanceAgent()
+        self.startup_seconds = time.perf_counter() - started
+
+    def __call__(self, question):
+        trace = self._trace()
+        result = self._call(trace, self.agent.analyze, question, self.tenant)
+        intent = result.get("intent") if isinstance(result, dict) else "answer"
+        return intent, intent != "error", trace.totals()
+
+    def close(self):
+        self.agent.retrievers.shutdown(wait=False)
+
+
+class HttpTarget:
+    def __init__(self, url, tenant=None, timeout=REQUEST_TIMEOUT):
+        import requests
+
+        self._requests = requests
+        self.url = url
+        self.headers = {"X-Tenant-Id": tenant} if tenant else {}
+        if API_KEY:
+            self.headers["Authorization"] = f"Bearer {API_KEY}"
+        self.timeout = timeout
+        self.startup_seconds = None
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        return session
+
+    def __call__(self, question):
+        try:
+            resp = self._session().post(
+                self.url, json={"question": question}, headers=self.headers, timeout=self.timeout)
+        except Exception:
+            return "request_error", False, {}
+        stages = parse_server_timing(resp.headers.get("Server-Timing"))
+        stages.pop("total", None)
+        if not resp.ok:
+            return f"http_{resp.status_code}", False, stages
+        try:
+            intent = resp.json().get("intent")
+        except ValueError:
+            return "invalid_json", False, stages
+        return intent, intent != "error", stages
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------
+def run_phase(target, questions, concurrency, rate):
+    """
+    Send every question once with up to `concurrency` in flight. With a
+    rate (requests/s) the start times are paced on a fixed schedule, so a
+    slow response does not lower the offered load.
+    """
+    samples = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    interval = 1.0 / rate if rate else 0.0
+
+    def one(i, question):
+        if interval:
+            delay = started + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        t0 = time.perf_counter()
+        intent, ok, stages = target(question)
+        latency = time.perf_counter() - t0
+        with lock:
+            samples.append({"intent": intent or "unknown", "ok": ok,
+                            "latency": latency, "stages": stages})
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for f in [pool.submit(one, i, q) for i, (_, q) in enumerate(questions)]:
+            f.result()
+    return samples, time.perf_counter() - started
+
+
+def _ms(values):
+    arr = np.asarray(values, dtype=float) * 1000.0
+    out = {f"p{p}": round(float(np.percentile(arr, p)), 3) for p in PERCENTILES}
+    out["mean"] = round(float(arr.mean()), 3)
+    out["max"] = round(float(arr.max()), 3)
+    return out
+
+
+def summarize(samples, wall):
+    by_intent = defaultdict(list)
+    stages = defaultdict(list)
+    for s in samples:
+        by_intent[s["intent"]].append(s["latency"])
+        for stage, seconds in s["stages"].items():
+            stages[stage].append(seconds)
+
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for s in samples if not s["ok"]),
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+        "latency_ms": _ms([s["latency"] for s in samples]) if samples else {},
+        "by_intent": {
+            intent: {"count": len(v), **_ms(v)} for intent, v in sorted(by_intent.items())
+        },
+        "stages_ms": {stage: _ms(v) for stage, v in stages.items()},
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+# ---------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------
+def print_phase(name, phase):
+    lat = phase["latency_ms"]
+    print(f"\n== {name}: {phase['requests']} requests, {phase['errors']} errors, "
+          f"{phase['throughput_rps']} req/s")
+    if lat:
+        print(f"   all                    p50 {lat['p50']:>9.2f}  p95 {lat['p95']:>9.2f}  p99 {lat['p99']:>9.2f} ms")
+    for intent, s in phase["by_intent"].items():
+        print(f"   {intent:<22} p50 {s['p50']:>9.2f}  p95 {s['p95']:>9.2f}  p99 {s['p99']:>9.2f} ms  (n={s['count']})")
+
+
+def print_compare(report, baseline):
+    print(f"\n== vs {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    for phase in ("cold", "warm"):
+        new, old = report.get(phase), baseline.get(phase)
+        if not new or not old:
+            continue
+        rows = [("all", new["latency_ms"], old["latency_ms"])]
+        rows += [(i, s, old["by_intent"][i]) for i, s in new["by_intent"].items() if i in old["by_intent"]]
+        for name, n, o in rows:
+            deltas = "  ".join(
+                f"p{p} {n[f'p{p}'] - o[f'p{p}']:+9.2f}" for p in PERCENTILES if f"p{p}" in n and f"p{p}" in o)
+            print(f"   {phase:<4} {name:<22} {deltas} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay the FY25 test suite and report latency.")
+    ap.add_argument("--mode", choices=("inproc", "http"), default="inproc")
+    ap.add_argument("--url", default=API_URL)
+    ap.add_argument("--tenant", default=None)
+    ap.add_argument("--suite", default=str(TEST_SUITE_PATH))
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--rate", type=float, default=0.0, help="requests/s (0 = as fast as possible)")
+    ap.add_argument("--rounds", type=int, default=3, help="warm passes after the cold one")
+    ap.add_argument("--out", default=None, help="JSON report path (default tests/results/bench_<ts>.json)")
+    ap.add_argument("--compare", default=None, help="earlier JSON report to diff against")
+    args = ap.parse_args()
+
+    questions = load_questions(Path(args.suite))
+    if not questions:
+        raise ValueError("Test suite CSV has no questions.")
+
+    target = InProcessTarget(args.tenant) if args.mode == "inproc" else HttpTarget(args.url, args.tenant)
+    where = "FinanceAgent.analyze" if args.mode == "inproc" else args.url
+    print(f"\n🚀 {len(questions)} questions × (1 cold + {args.rounds} warm) against {where} "
+          f"(concurrency={args.concurrency}, rate={args.rate or 'max'})")
+
+    try:
+        cold, cold_wall = run_phase(target, questions, args.concurrency, args.rate)
+        warm, warm_wall = [], 0.0
+        for _ in range(args.rounds):
+            samples, wall = run_phase(target, questions, args.concurrency, args.rate)
+            warm += samples
+            warm_wall += wall
+    finally:
+        target.close()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "mode": args.mode,
+            "target": where,
+            "tenant": args.tenant,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "rounds": args.rounds,
+            "questions": len(questions),
+            "python": platform.python_version(),
+            "query_engine": os.environ.get("QUERY_ENGINE", "inline") if args.mode == "inproc" else None,
+        },
+        "startup_seconds": round(target.startup_seconds, 3) if target.startup_seconds is not None else None,
+        "cold": summarize(cold, cold_wall),
+        "warm": summarize(warm, warm_wall) if warm else None,
+    }
+
+    print_phase("cold", report["cold"])
+    if report["warm"]:
+        print_phase("warm", report["warm"])
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_compare(report, json.load(f))
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Benchmark report → {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+# Interactive REPL (python tests/test_agent.py), not a pytest module
+collect_ignore = ["test_agent.py"]
+
+ENRICHMENT_DIR = BASE_DIR / "rag" / "enrichment"
+
+
+@pytest.fixture(scope="session")
+def merchant_mcp():
+    """rag/enrichment/merchant_mcp.py, imported with placeholder settings."""
+    # Required at import; tests patch the DB and the APIs themselves
+    os.environ.setdefault("DB_CONN", "postgresql://localhost/enrichment_test")
+    os.environ.setdefault("TRANSACTION_API_BASE", "http://127.0.0.1:9/api")
+    os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+    os.environ.setdefault("ENRICH_CACHE_DISABLED", "1")  # no sqlite file in the repo
+    sys.path.insert(0, str(ENRICHMENT_DIR))
+    import merchant_mcp
+    return merchant_mcp
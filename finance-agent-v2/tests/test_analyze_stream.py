@@ -0,0 +1,79 @@
+"""FinanceAgent.analyze_stream event order and handle_stream failures."""
+
+from types import SimpleNamespace
+
+import pytest
+
+from orchestrator.orchestrator import FinanceAgent
+
+FULL = {
+    "intent": "demo",
+    "answer": "You spent $120.00.",
+    "details": {"total_spend": 120.0, "matches": 3},
+    "chart": None,
+    "data": {"total_spend": 120.0},
+}
+
+
+def make_agent(streamer, calls):
+    def handle(question, intent_name, metadata, retriever, plan):
+        calls.append("handle")
+        return dict(FULL)
+
+    agent = FinanceAgent.__new__(FinanceAgent)
+    retriever = SimpleNamespace(metadata=[])
+    agent.retrievers = SimpleNamespace(get=lambda tenant: retriever)
+    agent.router = SimpleNamespace(
+        detect=lambda question, plan: "demo",
+        handlers={"demo": handle},
+        streamers={"demo": streamer},
+    )
+    return agent
+
+
+def events(agent):
+    return list(agent.analyze_stream("how much did i spend in june"))
+
+
+def test_headline_then_full_result():
+    def stream(question, intent_name, metadata, retriever, plan):
+        yield {"intent": "demo", "answer": "You spent $120.00."}
+        yield dict(FULL)
+
+    calls = []
+    out = events(make_agent(stream, calls))
+    assert [e["event"] for e in out] == ["intent", "answer", "details", "chart", "data", "done"]
+    assert out[1]["answer"] == FULL["answer"]
+    assert out[2]["details"]["total_spend"] == 120.0
+    assert calls == []
+
+
+def test_failure_after_headline_ends_with_error():
+    def stream(question, intent_name, metadata, retriever, plan):
+        yield {"intent": "demo", "answer": "You spent $120.00."}
+        raise RuntimeError("group-by failed")
+
+    calls = []
+    out = events(make_agent(stream, calls))
+    assert [e["event"] for e in out] == ["intent", "answer", "error"]
+    assert out[-1]["details"] == {"error": "group-by failed"}
+    # No second run behind the streamed headline
+    assert calls == []
+
+
+@pytest.mark.parametrize("fail_on_call", [True, False], ids=["on-call", "before-yield"])
+def test_failure_before_headline_falls_back_to_handle(fail_on_call):
+    def stream(question, intent_name, metadata, retriever, plan):
+        if fail_on_call:
+            raise RuntimeError("no columns")
+
+        def parts():
+            raise RuntimeError("no columns")
+            yield {}
+        return parts()
+
+    calls = []
+    out = events(make_agent(stream, calls))
+    assert [e["event"] for e in out] == ["intent", "answer", "details", "chart", "data", "done"]
+    assert out[1]["answer"] == FULL["answer"]
+    assert calls == ["handle"]
@@ -0,0 +1,135 @@
+"""ColumnStore (rag.columns): build, on-disk cache, rollups and patches."""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from rag.columns import ColumnStore
+
+METADATA = [
+    {"transactionDate": "2025-03-10", "amount": -42.5, "merchantName": "KROGER #569", "category": "Groceries"},
+    {"transactionDate": "2025-01-05", "amount": -12.0, "merchantName": "JOES PIZZA", "category": "Food & Drink",
+     "restaurantType": "Pizza"},
+    {"transactionDate": "2025-02-14", "amount": 2500.0, "merchantName": "ACME PAYROLL", "category": "Income"},
+    {"transactionDate": "2025-01-20", "amount": -80.0, "merchantName": "KROGER #587", "category": "Groceries"},
+    {"transactionDate": None, "amount": -5.0, "merchantName": "MYSTERY", "category": "Other"},
+    {"transactionDate": "2025-03-02T09:30:00", "amount": -300.0, "merchantName": "DELTA AIR", "category": "Travel"},
+    {"transactionDate": "2025-01-25", "amount": -18.0, "description": "TACO TRUCK 12", "category": "Shopping"},
+]
+
+JAN, MAR = 2025 * 12, 2025 * 12 + 2
+
+
+@pytest.fixture(scope="module")
+def cols():
+    return ColumnStore.build(METADATA, {"path": "metadata.json", "size": 1, "mtime_ns": 1})
+
+
+def test_rows_sorted_by_date_with_row_mapping(cols):
+    # Undated rows sort first (day -1)
+    assert cols.day[0] == -1
+    assert np.all(np.diff(cols.day) >= 0)
+    assert np.array_equal(cols.position[cols.row_id], np.arange(len(cols)))
+    amounts = [METADATA[i]["amount"] for i in cols.row_id]
+    assert np.array_equal(cols.amount, amounts)
+    assert cols.ym[0] == -1
+
+
+def test_merchant_variants_share_an_id(cols):
+    kroger = [p for p in range(len(cols)) if cols.raw_merchants[cols.merchant_raw[p]].startswith("KROGER")]
+    assert len(kroger) == 2
+    assert len({int(cols.merchant[p]) for p in kroger}) == 1
+    assert len({int(cols.merchant_raw[p]) for p in kroger}) == 2
+
+
+def test_restaurant_and_cuisine_flags(cols):
+    flagged = {METADATA[i].get("merchantName") or METADATA[i]["description"]
+               for i in cols.row_id[cols.restaurant]}
+    # Category, restaurantType and description keywords all count
+    assert flagged == {"JOES PIZZA", "TACO TRUCK 12"}
+    codes = cols.category_codes(["groceries", "TRAVEL"])
+    assert sorted(cols.categories[c] for c in codes) == ["Groceries", "Travel"]
+
+
+def test_save_load_round_trip(cols, tmp_path):
+    cols.save(str(tmp_path))
+    loaded = ColumnStore.load(str(tmp_path), mmap=True)
+    assert isinstance(loaded.amount, np.memmap)
+    for name in ColumnStore.ARRAYS:
+        assert np.array_equal(getattr(loaded, name), getattr(cols, name), equal_nan=True)
+    assert loaded.merchants == cols.merchants
+    assert loaded.version == cols.version
+    assert loaded.merchant_index.lookup("KROGER #600") == cols.merchant_index.lookup("KROGER #569")
+
+
+def test_load_or_build_reuses_cache_until_source_changes(tmp_path, capsys):
+    meta = tmp_path / "metadata.json"
+    cache = tmp_path / "columns"
+    meta.write_text(json.dumps(METADATA))
+
+    first = ColumnStore.load_or_build(str(meta), str(cache))
+    assert "Building column store" in capsys.readouterr().out
+    again = ColumnStore.load_or_build(str(meta), str(cache))
+    assert "Building column store" not in capsys.readouterr().out
+    assert again.version == first.version
+
+    meta.write_text(json.dumps(METADATA[:3]))
+    os.utime(meta, ns=(1, 1))
+    rebuilt = ColumnStore.load_or_build(str(meta), str(cache))
+    assert "Building column store" in capsys.readouterr().out
+    assert len(rebuilt) == 3
+
+
+def test_monthly_rollup(cols):
+    rollup = cols.monthly_rollup()
+    assert rollup is cols.monthly_rollup()
+    assert rollup.months.tolist() == [JAN, MAR]  # February only has a credit
+    assert rollup.total.tolist() == [110.0, 342.5]
+    assert rollup.count.tolist() == [3, 2]
+    # A month without data is skipped, not mapped onto the next one
+    assert rollup.rows([MAR, JAN + 1]).tolist() == [1]
+    assert rollup.rows([JAN + 5]).size == 0
+
+    groceries = cols.categories.index("Groceries")
+    assert rollup.by_category[:, groceries].tolist() == [80.0, 42.5]
+
+
+def test_amount_index(cols):
+    idx = cols.amount_index()
+    spend = lambda positions: (-cols.amount[positions]).tolist()
+
+    assert spend(idx.top([JAN, MAR], 3)) == [300.0, 80.0, 42.5]
+    assert spend(idx.top([JAN], 10)) == [80.0, 18.0, 12.0]
+    assert spend(idx.above([JAN, MAR], 40.0)) == [300.0, 80.0, 42.5]
+    assert spend(idx.above([JAN, MAR], 300.0)) == []
+    assert idx.top([JAN + 1], 3).size == 0
+    # February has no debits; March must not be listed twice
+    assert spend(idx.top([JAN, JAN + 1, MAR], 10)) == [300.0, 80.0, 42.5, 18.0, 12.0]
+    assert spend(idx.above([JAN + 1, MAR], 1.0)) == [300.0, 42.5]
+
+    assert idx.percentile([JAN], 50) == pytest.approx(18.0)
+    assert idx.percentile([JAN, MAR], 100) == pytest.approx(300.0)
+    assert idx.percentile([JAN + 1], 50) is None
+
+
+def test_merchant_patches(cols):
+    patched, rows = cols.apply_merchant_patches({
+        "KROGER": {"merchant_name": "Kroger", "merchant_type": "Restaurant", "cuisine": "Deli"},
+        "NOT A MERCHANT": {"merchant_name": "Nobody"},
+    })
+    assert rows == 2
+    assert patched.patches == 1
+    assert patched.version.endswith("+p1")
+    assert "Kroger" in patched.merchants
+
+    kroger = np.flatnonzero(patched.merchant == patched.merchants.index("Kroger"))
+    assert patched.restaurant[kroger].all()
+    for p in kroger:
+        lo, hi = patched.rtype_offsets[p], patched.rtype_offsets[p + 1]
+        assert [patched.rtypes[c] for c in patched.rtype_codes[lo:hi]] == ["Deli"]
+
+    # The original store is untouched
+    assert not cols.restaurant[kroger].any()
+    assert cols.apply_merchant_patches({"NOT A MERCHANT": {}}) == (cols, 0)
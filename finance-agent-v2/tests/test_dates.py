@@ -0,0 +1,81 @@
+"""Date expression parsing (rag.dates) → [start, end) day ranges."""
+
+from datetime import date
+
+import pytest
+
+from rag import dates
+from rag.dates import parse_window
+from rag.query_plan import parse_plan
+
+# "Today" for relative windows: Thursday 15 May 2025
+ANCHOR = date(2025, 5, 15).toordinal()
+
+
+def window(text):
+    start, end = parse_window(text).compile(ANCHOR)
+    return date.fromordinal(start), date.fromordinal(end)
+
+
+@pytest.mark.parametrize("text, label, start, end", [
+    # relative to the anchor; the current unit stops at today
+    ("this quarter", "this quarter", date(2025, 4, 1), date(2025, 5, 16)),
+    ("last quarter", "last quarter", date(2025, 1, 1), date(2025, 4, 1)),
+    ("this month", "this month", date(2025, 5, 1), date(2025, 5, 16)),
+    ("last month", "last month", date(2025, 4, 1), date(2025, 5, 1)),
+    ("last week", "last week", date(2025, 5, 5), date(2025, 5, 12)),
+    ("yesterday", "yesterday", date(2025, 5, 14), date(2025, 5, 15)),
+    # trailing windows end today
+    ("last 3 months", "the last 3 months", date(2025, 2, 16), date(2025, 5, 16)),
+    ("past two weeks", "the last 2 weeks", date(2025, 5, 2), date(2025, 5, 16)),
+    ("last 30 days", "the last 30 days", date(2025, 4, 16), date(2025, 5, 16)),
+    # fiscal years, optionally to date
+    ("so far in fy25", "FY25 to date", date(2025, 1, 1), date(2025, 5, 16)),
+    ("total fy25 spend", "FY25", date(2025, 1, 1), date(2026, 1, 1)),
+    ("fiscal year 2024", "FY24", date(2024, 1, 1), date(2025, 1, 1)),
+    ("ytd", "this fiscal year to date", date(2025, 1, 1), date(2025, 5, 16)),
+    # explicit ranges
+    ("2025-03-01 to 2025-04-15", "2025-03-01 – 2025-04-15", date(2025, 3, 1), date(2025, 4, 16)),
+    ("between may and july 2025", "May 2025 – July 2025", date(2025, 5, 1), date(2025, 8, 1)),
+    ("november 2024 to february 2025", "November 2024 – February 2025", date(2024, 11, 1), date(2025, 3, 1)),
+    ("since march", "since March 2025", date(2025, 3, 1), date(2025, 5, 16)),
+    # named months, quarters and seasons
+    ("spend in june", "June 2025", date(2025, 6, 1), date(2025, 7, 1)),
+    ("january and february 2025", "January 2025 – February 2025", date(2025, 1, 1), date(2025, 3, 1)),
+    ("q2 2025", "Q2 2025", date(2025, 4, 1), date(2025, 7, 1)),
+    ("q1 vs q2 2025", "Q1 2025 – Q2 2025", date(2025, 1, 1), date(2025, 7, 1)),
+    ("second quarter of 2024", "Q2 2024", date(2024, 4, 1), date(2024, 7, 1)),
+    ("winter 2025", "winter 2025", date(2024, 12, 1), date(2025, 3, 1)),
+    ("last summer", "last summer", date(2024, 6, 1), date(2024, 9, 1)),
+    ("in the fall of 2024", "fall 2024", date(2024, 9, 1), date(2024, 12, 1)),
+    ("last fall", "last fall", date(2024, 9, 1), date(2024, 12, 1)),
+    # "fall" the verb is not a season
+    ("did my dining spend fall in march 2025?", "March 2025", date(2025, 3, 1), date(2025, 4, 1)),
+    ("why did spending fall in july?", "July 2025", date(2025, 7, 1), date(2025, 8, 1)),
+    ("in 2024", "2024", date(2024, 1, 1), date(2025, 1, 1)),
+])
+def test_parse_window(text, label, start, end):
+    assert parse_window(text).label == label
+    assert window(text) == (start, end)
+
+
+def test_no_period_uses_default_fiscal_year():
+    expr = parse_window("how much did i spend on groceries")
+    assert expr.default
+    assert window("how much did i spend on groceries") == (date(2025, 1, 1), date(2026, 1, 1))
+
+
+@pytest.mark.parametrize("text", [
+    "2025-02-30 to 2025-03-10",
+    "2025-13-01 - 2025-12-01",
+])
+def test_invalid_iso_range_is_ignored(text):
+    # Not a date: the range is skipped rather than failing the question
+    assert parse_window(text).default
+    assert parse_plan(f"spend {text} in june").window.label == "June 2025"
+
+
+def test_fiscal_year_start_month(monkeypatch):
+    monkeypatch.setattr(dates, "FISCAL_YEAR_START_MONTH", 10)
+    assert window("fy25") == (date(2024, 10, 1), date(2025, 10, 1))
+    assert window("this fiscal year") == (date(2024, 10, 1), date(2025, 5, 16))
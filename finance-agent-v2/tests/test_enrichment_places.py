@@ -0,0 +1,199 @@
+"""
+Merchant enrichment against the stub Places server (rag/enrichment/stub_places.py):
+concurrent lookups, backoff on OVER_QUERY_LIMIT / 429 / 503, and resuming
+an interrupted run from its checkpoint. Postgres is replaced by a fake
+connection that records the upserted rows.
+"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from rag.merchant_patches import normalize_merchant
+
+RESTAURANTS = [
+    "PIZZA ROMA", "SUSHI ZEN", "TACO FIESTA", "BURGER BARN",
+    "THAI ORCHID", "CAFE LUNA", "BBQ SMOKEHOUSE", "BISTRO VERDE",
+]
+
+
+class FakeConn:
+    """Autocommit connection stand-in: cursors do nothing, execute_values records rows."""
+    autocommit = True
+
+    def __init__(self):
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    def close(self):
+        pass
+
+    def execute_values(self, cur, sql, argslist, template=None, page_size=100):
+        self.rows.extend(argslist)
+
+    def stored(self):
+        return {row[1] for row in self.rows}  # normalized_name
+
+
+class Faults:
+    """Scripted stub failures: `over_limit` OVER_QUERY_LIMIT answers, then `errors` 429/503s."""
+
+    def __init__(self, over_limit=0, errors=0):
+        self.over_limit = over_limit
+        self.errors = errors
+        self.draws = []
+        self.lock = threading.Lock()
+
+    def over_quota(self):
+        with self.lock:
+            if self.over_limit:
+                self.over_limit -= 1
+                return True
+            return False
+
+    def random(self):
+        # stub_places draws once per request (< error_rate → error), then
+        # once more to pick 429 (< 0.5) or 503
+        with self.lock:
+            if self.draws:
+                return self.draws.pop()
+            if self.errors:
+                self.errors -= 1
+                self.draws.append(0.0 if self.errors % 2 else 0.9)
+                return 0.0
+            return 1.0
+
+
+@pytest.fixture
+def stub(merchant_mcp, monkeypatch):
+    import stub_places
+
+    server = stub_places.serve(0, latency=0.0)
+    port = server.server_address[1]
+    monkeypatch.setattr(merchant_mcp, "PLACES_API_URL", f"http://127.0.0.1:{port}{stub_places.FIND_PLACE_PATH}")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def enrich(merchant_mcp, monkeypatch, tmp_path):
+    """main() wired to a fake DB, fixed transactions and files under tmp_path."""
+    m = merchant_mcp
+    conn = FakeConn()
+    txns = [{"description": name, "category": "Food & Drink"} for name in RESTAURANTS for _ in range(2)]
+    monkeypatch.setattr(m, "db", lambda: conn)
+    monkeypatch.setattr(m, "execute_values", conn.execute_values)
+    monkeypatch.setattr(m, "get_known_merchants", lambda c: set())
+    monkeypatch.setattr(m, "fetch_transactions", lambda: list(txns))
+    monkeypatch.setattr(m, "append_patches", lambda records: sum(1 for _ in records))
+    monkeypatch.setattr(m, "lookup_cache", m.LookupCache(enabled=False))
+    monkeypatch.setattr(m, "ENRICH_CHECKPOINT", str(tmp_path / "checkpoint.json"))
+    monkeypatch.setattr(m, "ZIP_CODE", "93021")
+    monkeypatch.setattr(m, "HOME_ZIPCODES", ["93021"])
+    monkeypatch.setattr(m, "ENRICH_CONCURRENCY", 8)
+    monkeypatch.setattr(m, "places_bucket", m.TokenBucket(0, 1))  # unlimited
+    monkeypatch.setattr(m, "PLACES_BACKOFF_BASE", 0.05)
+    return conn
+
+
+def stub_inputs(server):
+    with server.state.lock:
+        return dict(server.state.stats["inputs"])
+
+
+def test_lookups_run_concurrently(merchant_mcp, stub, enrich):
+    stub.state.latency = 0.3
+
+    started = time.monotonic()
+    merchant_mcp.main()
+    elapsed = time.monotonic() - started
+
+    # 8 lookups of 0.3s each: ~0.3s in parallel, 2.4s one after another
+    assert elapsed < 1.2
+    assert sorted(stub_inputs(stub)) == sorted(f"{name} 93021" for name in RESTAURANTS)
+    assert enrich.stored() == {normalize_merchant(n.title()) for n in RESTAURANTS}
+
+
+def test_backoff_on_over_query_limit_and_429(merchant_mcp, stub, enrich, monkeypatch):
+    import stub_places
+
+    faults = Faults(over_limit=3, errors=4)
+    monkeypatch.setattr(stub.state, "over_quota", faults.over_quota)
+    monkeypatch.setattr(stub.state, "error_rate", 0.5)
+    monkeypatch.setattr(stub_places, "random", faults)
+
+    merchant_mcp.main()
+
+    stats = stub.state.stats
+    assert stats["over_limit"] == 3
+    assert stats["errors"] == 4
+    # Every failure was retried until it succeeded
+    assert stats["requests"] == len(RESTAURANTS) + 3 + 4
+    assert enrich.stored() == {normalize_merchant(n.title()) for n in RESTAURANTS}
+    assert not os.path.exists(merchant_mcp.ENRICH_CHECKPOINT)
+
+
+def test_retries_exhausted_is_not_checkpointed(merchant_mcp, stub, enrich, monkeypatch):
+    faults = Faults(over_limit=10 ** 6)
+    monkeypatch.setattr(stub.state, "over_quota", faults.over_quota)
+    monkeypatch.setattr(merchant_mcp, "PLACES_MAX_RETRIES", 1)
+    monkeypatch.setattr(merchant_mcp, "PLACES_BACKOFF_BASE", 0.01)
+
+    merchant_mcp.main()
+
+    assert stub.state.stats["requests"] == 2 * len(RESTAURANTS)
+    assert enrich.rows == []
+    with open(merchant_mcp.ENRICH_CHECKPOINT) as f:
+        assert json.load(f)["done"] == []
+
+
+def test_resume_after_interrupted_run(merchant_mcp, stub, enrich, monkeypatch):
+    m = merchant_mcp
+    monkeypatch.setattr(m, "CHECKPOINT_EVERY", 2)
+    monkeypatch.setattr(m, "ENRICH_CONCURRENCY", 2)
+
+    # Ctrl-C while the 5th result is being handled
+    apply_result = m.apply_result
+    handled = []
+
+    def interrupt(writer, name, rec):
+        if len(handled) == 4:
+            raise KeyboardInterrupt
+        handled.append(name)
+        return apply_result(writer, name, rec)
+
+    monkeypatch.setattr(m, "apply_result", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        m.main()
+
+    with open(m.ENRICH_CHECKPOINT) as f:
+        checkpoint = json.load(f)
+    assert checkpoint["zip"] == "93021"
+    assert sorted(checkpoint["done"]) == sorted(normalize_merchant(n) for n in handled)
+    # Stored before the interrupt (the final flush), so safe to skip next time
+    assert enrich.stored() == {normalize_merchant(n.title()) for n in handled}
+    first_run = stub_inputs(stub)
+
+    monkeypatch.setattr(m, "apply_result", apply_result)
+    enrich.rows.clear()
+    m.main()
+
+    remaining = [n for n in RESTAURANTS if n not in handled]
+    assert enrich.stored() == {normalize_merchant(n.title()) for n in remaining}
+    inputs = stub_inputs(stub)
+    for name in handled:
+        # Checkpointed merchants are not looked up again
+        assert inputs[f"{name} 93021"] == first_run[f"{name} 93021"] == 1
+    assert not os.path.exists(m.ENRICH_CHECKPOINT)
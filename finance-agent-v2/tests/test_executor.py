@@ -0,0 +1,107 @@
+"""BoundedExecutor (orchestrator.executor): admission control and stats."""
+
+import threading
+import time
+
+import pytest
+
+from orchestrator.executor import BoundedExecutor, ExecutorSaturated
+
+
+@pytest.fixture
+def executor():
+    ex = BoundedExecutor(max_workers=2, max_queue=1, name="test")
+    yield ex
+    ex.shutdown(wait=True)
+
+
+def blocked(executor, n, release):
+    """Submit n jobs that hold their slot until release is set."""
+    started = threading.Semaphore(0)
+
+    def job():
+        started.release()
+        release.wait(5)
+        return "done"
+
+    futures = [executor.submit(job) for _ in range(n)]
+    return futures, started
+
+
+def settle(executor, timeout=5.0):
+    """Wait for done-callbacks: Future.result() can return before they run."""
+    deadline = time.monotonic() + timeout
+    while executor.stats()["inflight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return executor.stats()
+
+
+def test_rejects_beyond_workers_plus_queue(executor):
+    release = threading.Event()
+    futures, started = blocked(executor, 3, release)
+    for _ in range(2):
+        assert started.acquire(timeout=5)
+
+    stats = executor.stats()
+    assert stats["running"] == 2
+    assert stats["queue_depth"] == 1
+    assert stats["inflight"] == 3
+
+    with pytest.raises(ExecutorSaturated):
+        executor.submit(lambda: None)
+    assert executor.stats()["rejected"] == 1
+
+    release.set()
+    assert [f.result(timeout=5) for f in futures] == ["done"] * 3
+
+
+def test_slots_are_released_after_completion(executor):
+    release = threading.Event()
+    futures, _ = blocked(executor, 3, release)
+    release.set()
+    for f in futures:
+        f.result(timeout=5)
+    settle(executor)
+
+    # Full capacity is available again
+    more, _ = blocked(executor, 3, release)
+    for f in more:
+        f.result(timeout=5)
+
+    stats = settle(executor)
+    assert stats["submitted"] == 6
+    assert stats["completed"] == 6
+    assert stats["inflight"] == 0
+    assert stats["rejected"] == 0
+
+
+def test_failures_are_counted_and_release_their_slot(executor):
+    def boom():
+        raise ValueError("bad query")
+
+    futures = [executor.submit(boom) for _ in range(3)]
+    for f in futures:
+        with pytest.raises(ValueError):
+            f.result(timeout=5)
+    settle(executor)
+
+    assert executor.submit(lambda: 42).result(timeout=5) == 42
+    stats = settle(executor)
+    assert stats["failed"] == 3
+    assert stats["completed"] == 1
+    assert stats["inflight"] == 0
+
+
+def test_zero_queue_only_admits_running_jobs():
+    ex = BoundedExecutor(max_workers=1, max_queue=0, name="tight")
+    release = threading.Event()
+    try:
+        futures, started = blocked(ex, 1, release)
+        assert started.acquire(timeout=5)
+        with pytest.raises(ExecutorSaturated):
+            ex.submit(lambda: None)
+        release.set()
+        futures[0].result(timeout=5)
+    finally:
+        release.set()
+        ex.shutdown(wait=True)
@@ -0,0 +1,27 @@
+"""Keyword routing (orchestrator.intent_router) of questions to intents."""
+
+import pytest
+
+from orchestrator.intent_router import IntentRouter
+from rag.query_plan import parse_plan
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter()
+
+
+@pytest.mark.parametrize("question, intent", [
+    # merchant rankings stay with top_merchants
+    ("What are my largest merchants in FY25?", "top_merchants"),
+    ("Who are my biggest merchants?", "top_merchants"),
+    ("Top merchants last quarter", "top_merchants"),
+    # individual purchases
+    ("What were my largest transactions in May 2025?", "large_purchases"),
+    ("What were my biggest purchases last month?", "large_purchases"),
+    ("Show purchases above $500 in FY25.", "large_purchases"),
+    ("Purchases over my 95th percentile in Q2 2025", "large_purchases"),
+    ("List subscriptions between May and July 2025.", "recurring_merchants"),
+])
+def test_detect(router, question, intent):
+    assert router.detect(question, parse_plan(question)) == intent
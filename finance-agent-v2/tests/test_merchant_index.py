@@ -0,0 +1,68 @@
+"""Merchant canonicalization (rag.merchant_index)."""
+
+import json
+
+import pytest
+
+from rag.merchant_index import MerchantIndex, canonical_key
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("STARBUCKS #1234", "STARBUCKS"),
+    ("STARBUCKS STORE 55", "STARBUCKS"),
+    ("KROGER #569", "KROGER"),
+    ("TARGET 00010587", "TARGET"),
+    ("NETFLIX.COM", "NETFLIX COM"),
+    ("Netflix.com", "NETFLIX COM"),
+    ("Tony's Pizza", "TONYS PIZZA"),        # apostrophes don't split words
+    ("Joe&#39;s Cafe", "JOES CAFE"),         # HTML entities from the feed
+    ("DOORDASH*CHIPOTLE", "DOORDASH CHIPOTLE"),
+    ("ACME LLC", "ACME"),
+    ("#1234", ""),
+])
+def test_canonical_key(raw, key):
+    assert canonical_key(raw) == key
+
+
+def build():
+    return MerchantIndex.build([
+        "KROGER #569", "KROGER #587", "KROGER #569",
+        "DOORDASH*CHIPOTLE", "DOORDASH*SUBWAY",
+        "NETFLIX.COM", "Netflix.com", "Netflix.com",
+        "SOUTHWEST AIRLINES", "SOUTHWEST AIRLINES", "SOUTHWEST AIRLINE",
+    ])
+
+
+def test_spellings_share_an_id():
+    index = build()
+    assert index.aliases["KROGER #569"] == index.aliases["KROGER #587"]
+    assert index.aliases["NETFLIX.COM"] == index.aliases["Netflix.com"]
+    # Fuzzy: trigram Jaccard 0.85 with the more frequent spelling
+    assert index.aliases["SOUTHWEST AIRLINE"] == index.aliases["SOUTHWEST AIRLINES"]
+    # Same platform, different merchants
+    assert index.aliases["DOORDASH*CHIPOTLE"] != index.aliases["DOORDASH*SUBWAY"]
+    assert len(index) == 5
+
+
+def test_ids_and_display_names():
+    index = build()
+    # Numbered by first appearance; display name is the most frequent spelling
+    assert index.names == ["KROGER #569", "DOORDASH*CHIPOTLE", "DOORDASH*SUBWAY",
+                           "Netflix.com", "SOUTHWEST AIRLINES"]
+
+
+def test_lookup_unseen_names():
+    index = build()
+    assert index.lookup("KROGER #587") == 0               # known alias
+    assert index.lookup("KROGER STORE 1001") == 0          # same canonical key
+    assert index.lookup("Southwest Airline") == 4          # fuzzy match
+    assert index.lookup("TRADER JOES") is None
+
+
+def test_round_trip_keeps_lookups():
+    index = build()
+    restored = MerchantIndex.from_dict(json.loads(json.dumps(index.to_dict())))
+    assert restored.names == index.names
+    assert restored.aliases == index.aliases
+    for name in ("Netflix.com", "KROGER #12", "SOUTHWEST AIRLINE", "DOORDASH*SUBWAY", "TRADER JOES"):
+        assert restored.lookup(name) == index.lookup(name)
@@ -0,0 +1,113 @@
+"""
+MerchantWriter batching against a real Postgres: a bad row is isolated by
+splitting its batch in halves, the rest of the batch is stored, and the
+enrichment run keeps the failed merchant out of its checkpoint and patch
+feed. Runs only when DATABASE_URL points at a database it may write to
+(it creates bian.merchants if missing and removes its own rows).
+"""
+
+import json
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL not set")
+
+PREFIX = "ZZ WRITER TEST"
+
+SCHEMA = """
+CREATE SCHEMA IF NOT EXISTS bian;
+CREATE TABLE IF NOT EXISTS bian.merchants (
+    id SERIAL PRIMARY KEY,
+    merchant_name TEXT,
+    normalized_name TEXT UNIQUE NOT NULL,
+    merchant_type TEXT,
+    merchant_address TEXT,
+    google_types JSONB,
+    rating NUMERIC,
+    enrichment_status TEXT,
+    created_at TIMESTAMP
+);
+"""
+
+
+@pytest.fixture
+def conn(merchant_mcp, monkeypatch):
+    monkeypatch.setattr(merchant_mcp, "DB_CONN", DATABASE_URL)
+    c = merchant_mcp.db()
+    with c.cursor() as cur:
+        cur.execute(SCHEMA)
+        cur.execute("DELETE FROM bian.merchants WHERE normalized_name LIKE %s", (PREFIX + "%",))
+    yield c
+    with c.cursor() as cur:
+        cur.execute("DELETE FROM bian.merchants WHERE normalized_name LIKE %s", (PREFIX + "%",))
+    c.close()
+
+
+def stored(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT normalized_name FROM bian.merchants WHERE normalized_name LIKE %s",
+                    (PREFIX + "%",))
+        return {r["normalized_name"] for r in cur.fetchall()}
+
+
+def record(m, name, rating=4.5):
+    return {
+        "merchant_name": name,
+        "normalized_name": m.normalize_name(name),
+        "merchant_address": "1 Main St, Moorpark, CA 93021, USA",
+        "google_types": ["restaurant", "food"],
+        "rating": rating,
+        "merchant_type": "Restaurant",
+        "cuisine": None,
+        "enrichment_status": "enriched",
+    }
+
+
+def test_bad_row_is_isolated_from_its_batch(merchant_mcp, conn):
+    m = merchant_mcp
+    recs = [record(m, f"{PREFIX} {i}") for i in range(8)]
+    recs[5]["rating"] = "not-a-number"  # numeric column: fails the whole statement
+
+    writer = m.MerchantWriter(conn, batch_size=8)
+    for rec in recs:
+        writer.add(rec)  # the 8th add flushes
+
+    assert stored(conn) == {r["normalized_name"] for i, r in enumerate(recs) if i != 5}
+    assert [r["normalized_name"] for r in writer.take_failed()] == [recs[5]["normalized_name"]]
+    assert writer.take_failed() == []
+    assert writer.written == 7
+    # 8 → 4 + 4, 4 → 2 + 2, 2 → 1 + 1: the bad row costs 6 extra statements
+    assert writer.statements == 7
+
+
+def test_failed_write_is_rolled_back_from_the_run(merchant_mcp, conn, monkeypatch, tmp_path, capsys):
+    m = merchant_mcp
+    # Distinct enough not to be merged by the merchant index
+    names = [f"{PREFIX} {kind}" for kind in
+             ("PIZZERIA", "SUSHI BAR", "TAQUERIA", "BURGER JOINT", "NOODLE HOUSE", "BAGEL SHOP")]
+    bad = names[3]
+    monkeypatch.setattr(m, "fetch_transactions", lambda: [
+        {"description": n, "category": "Food & Drink"} for n in names for _ in range(2)])
+    monkeypatch.setattr(m, "find_place", lambda name, zip_code: record(
+        m, name, rating="not-a-number" if name == bad else 4.0))
+    monkeypatch.setattr(m, "get_known_merchants", lambda c: set())
+    patches = []
+    monkeypatch.setattr(m, "append_patches", lambda records: patches.extend(records) or 0)
+    monkeypatch.setattr(m, "ENRICH_CHECKPOINT", str(tmp_path / "checkpoint.json"))
+    monkeypatch.setattr(m, "CHECKPOINT_EVERY", 4)  # one flush mid-run, one at the end
+    monkeypatch.setattr(m, "ZIP_CODE", "93021")
+    monkeypatch.setattr(m, "HOME_ZIPCODES", ["93021"])
+
+    m.main()
+
+    good = {m.normalize_name(n) for n in names if n != bad}
+    assert stored(conn) == good
+    # The failed merchant is neither done nor published: the next run retries it
+    with open(m.ENRICH_CHECKPOINT) as f:
+        assert set(json.load(f)["done"]) == good
+    assert {key for key, _ in patches} == good
+    assert "5 merchants added/updated (10 transactions), 1 failed" in capsys.readouterr().out
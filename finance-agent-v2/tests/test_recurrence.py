@@ -0,0 +1,111 @@
+"""Recurring-charge detection (rag.recurrence) over a ColumnStore."""
+
+from datetime import date, timedelta
+
+import pytest
+
+from rag.columns import ColumnStore
+from rag.recurrence import detect_recurring, merchant_key
+
+START = date(2025, 1, 3)
+
+
+def charges(merchant, amounts, gaps, category="Entertainment", start=START):
+    """Debits of the given amounts, each `gaps[i]` days after the previous."""
+    rows, day = [], start
+    for i, amount in enumerate(amounts):
+        if i:
+            day += timedelta(days=gaps[(i - 1) % len(gaps)])
+        rows.append({
+            "transactionDate": day.isoformat(),
+            "amount": -amount,
+            "merchantName": merchant,
+            "category": category,
+        })
+    return rows
+
+
+def detect(*groups):
+    return {r["merchant"]: r for r in detect_recurring(ColumnStore.build([r for g in groups for r in g]))}
+
+
+@pytest.mark.parametrize("name, key", [
+    ("NETFLIX.COM", "NETFLIX COM"),
+    ("SPOTIFY 1234 ref 99", "SPOTIFY REF"),
+    ("", ""),
+])
+def test_merchant_key(name, key):
+    assert merchant_key(name) == key
+
+
+def test_cadences():
+    found = detect(
+        charges("NETFLIX.COM", [15.49] * 6, [31, 28, 31, 30, 31]),
+        charges("CITY PARKING", [10.0, 10.0, 12.0, 10.0, 10.0], [7]),
+        charges("AMAZON PRIME", [139.0, 139.0], [365]),
+    )
+    assert {m: r["cadence"] for m, r in found.items()} == {
+        "NETFLIX.COM": "monthly",
+        "CITY PARKING": "weekly",
+        "AMAZON PRIME": "annual",
+    }
+
+    netflix = found["NETFLIX.COM"]
+    assert netflix["occurrences"] == 6
+    assert netflix["average_amount"] == 15.49
+    assert netflix["average_gap_days"] == 30.2
+    assert netflix["first_charge"] == "2025-01-03"
+    assert netflix["last_charge"] == "2025-06-03"
+    assert netflix["next_expected"] == "2025-07-03"
+    assert netflix["annualized"] == round(15.49 * 365 / 30, 2)
+
+
+def test_sorted_by_annualized_cost():
+    found = detect_recurring(ColumnStore.build(
+        charges("NETFLIX.COM", [15.49] * 4, [30])
+        + charges("GYM MEMBERSHIP", [49.0] * 4, [30])
+        + charges("AMAZON PRIME", [139.0] * 2, [365])
+    ))
+    assert [r["merchant"] for r in found] == ["GYM MEMBERSHIP", "NETFLIX.COM", "AMAZON PRIME"]
+
+
+def test_store_numbers_group_together():
+    rows = charges("SPOTIFY", [11.99] * 4, [30])
+    for i, r in enumerate(rows):
+        r["merchantName"] = f"SPOTIFY {1000 + i}"
+    found = detect_recurring(ColumnStore.build(rows))
+    assert len(found) == 1
+    assert found[0]["occurrences"] == 4
+
+
+@pytest.mark.parametrize("rows", [
+    # irregular gaps
+    charges("SHELL OIL", [40.0] * 6, [3, 19, 9, 30, 5]),
+    # regular gaps, amounts all over the place
+    charges("AMAZON MKTP", [5.0, 80.0, 20.0, 150.0], [30]),
+    # too few occurrences for a monthly cadence
+    charges("HULU", [7.99] * 2, [30]),
+    # gap between cadences
+    charges("WATER UTILITY", [60.0] * 4, [45]),
+], ids=["irregular", "amounts", "too-few", "no-cadence"])
+def test_not_recurring(rows):
+    assert detect_recurring(ColumnStore.build(rows)) == []
+
+
+def test_credits_and_undated_rows_ignored():
+    payroll = charges("ACME PAYROLL", [-2500.0] * 6, [14], category="Income")
+    undated = charges("NETFLIX.COM", [15.49] * 4, [30])
+    for r in undated:
+        r["transactionDate"] = None
+    assert detect_recurring(ColumnStore.build(payroll + undated)) == []
+
+
+def test_other_merchants_do_not_break_groups():
+    noise = [
+        {"transactionDate": (START + timedelta(days=d)).isoformat(), "amount": -float(d + 1),
+         "merchantName": f"CORNER STORE {chr(65 + d % 26)}{chr(65 + d // 26)}", "category": "Shopping"}
+        for d in range(0, 150, 4)
+    ]
+    found = detect(noise, charges("NETFLIX.COM", [15.49] * 5, [30]))
+    assert list(found) == ["NETFLIX.COM"]
+    assert found["NETFLIX.COM"]["occurrences"] == 5